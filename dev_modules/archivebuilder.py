@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+from modules.assets import ARCHIVE_MAGIC, ARCHIVE_HEADER, DEFAULT_ARCHIVE_PATH
+
+"""
+* =============================================================== *
+* Packs the assets/ directory into a single indexed archive,      *
+* which the game memory-maps at startup instead of opening each   *
+* file separately. See modules/assets.py for the file layout.     *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.archivebuilder [--source assets] [--output assets.pak]
+
+setup.py runs this before freezing the game, and ships the archive next to the executable, where frozen
+builds look for it. To run the game from the archive during development, set TOWER_ASSET_ARCHIVE to its
+path, and rebuild it after changing any of the loose files.
+"""
+
+# Source art and OS metadata that the game never loads
+EXCLUDED_SUFFIXES = (".aseprite", ".DS_Store")
+
+# Every file starts on a multiple of this many bytes
+ALIGNMENT = 16
+
+
+def collect_files(source_directory: str) -> list:
+    """Returns the paths of all files to pack, relative to the working directory, with forward slashes"""
+    paths = []
+    for directory, subdirectories, filenames in os.walk(source_directory):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if filename.startswith(".") or filename.endswith(EXCLUDED_SUFFIXES):
+                continue
+            paths.append(os.path.normpath(os.path.join(directory, filename)).replace(os.sep, "/"))
+    return paths
+
+
+def build_archive(source_directory: str, output_path: str) -> int:
+    """Writes the archive and returns the number of files packed into it"""
+    paths = collect_files(source_directory)
+    sizes = [os.path.getsize(path) for path in paths]
+
+    # The offsets depend on the length of the index, which in turn depends on the offsets,
+    # so the layout is repeated until the index fits in front of the data
+    def layout(data_start):
+        index = {}
+        offset = data_start
+        for path, size in zip(paths, sizes):
+            offset += -offset % ALIGNMENT
+            index[path] = [offset, size]
+            offset += size
+        return index
+
+    data_start = 0
+    while True:
+        index_bytes = json.dumps(layout(data_start), separators=(",", ":")).encode("utf-8")
+        required_start = ARCHIVE_HEADER.size + len(index_bytes)
+        if required_start <= data_start:
+            break
+        data_start = required_start
+    index = layout(data_start)
+    index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+
+    with open(output_path, "wb") as archive:
+        archive.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, len(index_bytes)))
+        archive.write(index_bytes)
+        for path in paths:
+            offset = index[path][0]
+            archive.write(b"\0" * (offset - archive.tell()))
+            with open(path, "rb") as f:
+                archive.write(f.read())
+
+    return len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packs the game assets into a single archive")
+    parser.add_argument("--source", default="assets", help="directory to pack")
+    parser.add_argument("--output", default=DEFAULT_ARCHIVE_PATH, help="path of the archive to write")
+    arguments = parser.parse_args()
+
+    file_count = build_archive(arguments.source, arguments.output)
+    print("Packed %d files into %s (%.1f MB)" % (file_count, arguments.output,
+                                                 os.path.getsize(arguments.output) / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import os
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+from modules.assets import (AssetPreloader, IMAGE_SUFFIXES, SOUND_SUFFIXES, clear_caches, load_image, load_sound,
+                            mount_archive, normalise_path)
+from modules.runtime import init_audio
+
+"""
+* =============================================================== *
+* Startup benchmark comparing serial and parallel decoding of     *
+* every image and sound under assets/.                            *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.assetbenchmark [--workers 4] [--repeats 5] [--archive]
+
+With --archive, assets are read from assets.pak instead of the loose files. The speed-up depends on the
+number of cores, as decoding only runs in parallel where PyGame releases the GIL.
+"""
+
+
+def collect_assets(root="assets") -> list:
+    paths = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(IMAGE_SUFFIXES + SOUND_SUFFIXES):
+                paths.append(normalise_path(os.path.join(directory, filename)))
+    return paths
+
+
+def load_serially(paths):
+    for path in paths:
+        if path.endswith(IMAGE_SUFFIXES):
+            load_image(path)
+        else:
+            load_sound(path)
+
+
+def load_in_parallel(paths, workers):
+    preloader = AssetPreloader(workers)
+    preloader.preload(paths)
+    preloader.join()
+
+
+def measure(load, repeats) -> list:
+    timings = []
+    for _ in range(repeats):
+        clear_caches()
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares serial and parallel asset decoding")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="size of the worker pool")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--archive", action="store_true", help="read from assets.pak instead of loose files")
+    arguments = parser.parse_args()
+
+    if arguments.archive and not mount_archive():
+        parser.error("assets.pak has not been built")
+    pg.display.init()
+    init_audio()
+
+    paths = collect_assets()
+    print("%d files, %d workers, %d cores" % (len(paths), arguments.workers, os.cpu_count()))
+
+    serial_timings = measure(lambda: load_serially(paths), arguments.repeats)
+    parallel_timings = measure(lambda: load_in_parallel(paths, arguments.workers), arguments.repeats)
+
+    best_serial = min(serial_timings) * 1000
+    best_parallel = min(parallel_timings) * 1000
+    print("serial:   best %8.1f ms, mean %8.1f ms" % (best_serial, sum(serial_timings) / len(serial_timings) * 1000))
+    print("parallel: best %8.1f ms, mean %8.1f ms" % (best_parallel,
+                                                      sum(parallel_timings) / len(parallel_timings) * 1000))
+    print("speed-up: %.2fx" % (best_serial / best_parallel))
+
+
+if __name__ == "__main__":
+    main()
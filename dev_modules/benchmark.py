@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+from modules.assets import mount_archive, asset_exists
+from modules.runtime import init_display, init_audio
+from modules.libraries import Library
+from modules.leveljson import LevelManager
+from modules.gamescene import GameScene, WINDOW_SIZE
+from modules.entities import Player
+from modules.entitystate import GameEvent
+from modules.sound import music_player
+from modules.inputstate import InputState, input_state
+from modules.quality import quality_governor, QUALITY_TIERS
+
+"""
+* =============================================================== *
+* Performance benchmark over every level of the game. Each level  *
+* is loaded and played with scripted inputs for a fixed number of *
+* ticks, with the SDL dummy video and audio drivers.              *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.benchmark [--ticks 600] [--levels 1-24] [--output benchmark.json]
+                                    [--compare baseline.json] [--threshold 0.15] [--archive]
+                                    [--quality high]
+
+Levels are played at the high quality tier of modules/quality.py, or at the tier given by --quality,
+without adjusting it to the frame times, so that runs are comparable.
+
+For each level, the following are recorded:
+    load_ms                         ->      time taken by LevelManager.load_level()
+    update_mean_ms, update_p95_ms   ->      time taken by GameScene.update() per tick
+    render_mean_ms, render_p95_ms   ->      time taken by GameScene.render() per tick, including the final scale
+    peak_memory_kb                  ->      peak of the memory allocated by Python while loading the level and
+                                            playing it for MEMORY_TICKS ticks, measured by tracemalloc
+    deaths                          ->      number of times the player died, each of which restarts the level.
+                                            Not compared, but a change means the runs are not comparable.
+
+Memory is measured in a separate pass, as tracemalloc slows down everything it traces. Memory allocated by
+SDL, such as the pixels of surfaces, is not included.
+
+COMPARISON
+-------------------------
+With --compare, every metric is compared against the same metric in a stored result file. A metric that
+is worse by more than the threshold, given as a fraction, and by more than NOISE_FLOOR in absolute terms,
+is reported as a regression, and the exit status is 1. To store a baseline, run the benchmark with
+--output on the known-good build.
+
+SCRIPTED INPUTS
+-------------------------
+The player runs right, then left, jumping at regular intervals, following INPUT_SCRIPT. The keyboard is
+replaced as the source of the input state of modules/inputstate.py, which is sampled before every update
+as in the game, so the inputs are the same on every run. Before the levels are played, the script is
+checked to be seen by the input state as scripted, with every press reported exactly once.
+"""
+
+# Each entry holds the keys held down from that tick of every INPUT_PERIOD ticks until the next entry
+INPUT_PERIOD = 240
+INPUT_SCRIPT = ((0, (pg.K_RIGHT,)),
+                (40, (pg.K_RIGHT, pg.K_SPACE)),
+                (50, (pg.K_RIGHT,)),
+                (120, (pg.K_LEFT,)),
+                (160, (pg.K_LEFT, pg.K_SPACE)),
+                (170, (pg.K_LEFT,)),
+                (220, ()))
+
+TICK_TIME = 1 / 60
+MEMORY_TICKS = 60
+
+# Absolute differences below these amounts are never reported as regressions
+NOISE_FLOOR = {"load_ms": 1.0,
+               "update_mean_ms": 0.05,
+               "update_p95_ms": 0.1,
+               "render_mean_ms": 0.05,
+               "render_p95_ms": 0.1,
+               "peak_memory_kb": 64}
+
+
+class HeldKeys:
+    """The keys held down during a tick, which never changes once sampled"""
+    __slots__ = ("keys",)
+
+    def __init__(self, keys):
+        self.keys = frozenset(keys)
+
+    def __getitem__(self, key) -> bool:
+        return key in self.keys
+
+
+class ScriptedKeys:
+    """Stands in for the keyboard, holding down the keys of the current tick"""
+
+    def __init__(self):
+        self.held_keys = HeldKeys(())
+
+    def set_tick(self, tick: int):
+        tick %= INPUT_PERIOD
+        for start, keys in INPUT_SCRIPT:
+            if tick >= start:
+                held_keys = keys
+        # A new state every tick, so that the input state can compare it against the state of the previous tick
+        self.held_keys = HeldKeys(held_keys)
+
+    def get_pressed(self) -> HeldKeys:
+        return self.held_keys
+
+
+def check_input_script():
+    """Plays INPUT_SCRIPT through an InputState of its own, and returns a description of every tick at which
+    the keys reported as pressed are not those pressed by the script, so each press fires exactly once"""
+    keys = ScriptedKeys()
+    state = InputState(keys.get_pressed)
+    script_keys = {key for _, held_keys in INPUT_SCRIPT for key in held_keys}
+    errors = []
+    previous_keys = frozenset()
+    for tick in range(INPUT_PERIOD * 2):
+        keys.set_tick(tick)
+        state.sample()
+        expected_keys = keys.held_keys.keys - previous_keys
+        pressed_keys = {key for key in script_keys if state.was_pressed(key)}
+        if pressed_keys != expected_keys:
+            errors.append("tick %d: pressed %s, expected %s" % (
+                tick, sorted(pg.key.name(key) for key in pressed_keys),
+                sorted(pg.key.name(key) for key in expected_keys)))
+        previous_keys = keys.held_keys.keys
+    return errors
+
+
+def get_percentile(sorted_values: list, percentile: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(percentile / 100 * len(sorted_values)))]
+
+
+def parse_levels(text: str, level_count: int) -> list:
+    """Parses a selection of levels, such as "1-24" or "3,5,7-9" """
+    levels = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        levels.extend(range(int(first), int(last or first) + 1))
+    return [level for level in levels if 1 <= level <= level_count]
+
+
+def count_levels() -> int:
+    level_count = 0
+    while asset_exists(LevelManager.get_level_filepath(level_count + 1)):
+        level_count += 1
+    return level_count
+
+
+def play_level(scene: GameScene, window: pg.Surface, keys: ScriptedKeys, level_num: int, ticks: int):
+    """Plays the loaded level and returns the time taken by every update and every render, and the number
+    of times the player died"""
+    update_times = []
+    render_times = []
+    deaths = 0
+    for tick in range(ticks):
+        keys.set_tick(tick)
+        input_state.sample()
+
+        start = time.perf_counter()
+        scene.update(TICK_TIME)
+        update_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        scene.render(window)
+        render_times.append(time.perf_counter() - start)
+
+        # Level switches are not followed, so that every level is played for the full length.
+        # When the player dies, the level is restarted outside of the timings.
+        if pg.event.get(GameEvent.GAME_OVER.value):
+            deaths += 1
+            scene.player = Player(scene.level_manager.level.starting_position)
+            scene.player_sprite_group = pg.sprite.GroupSingle(scene.player)
+            load_level(scene, level_num)
+        pg.event.clear()
+    return update_times, render_times, deaths
+
+
+def load_level(scene: GameScene, level_num: int) -> float:
+    start = time.perf_counter()
+    scene.level_manager.load_level(level_num, scene.player, scene.camera)
+    return time.perf_counter() - start
+
+
+def benchmark_level(scene: GameScene, window: pg.Surface, keys: ScriptedKeys, level_num: int, ticks: int) -> dict:
+    load_time = load_level(scene, level_num)
+    update_times, render_times, deaths = play_level(scene, window, keys, level_num, ticks)
+
+    tracemalloc.start()
+    load_level(scene, level_num)
+    play_level(scene, window, keys, level_num, MEMORY_TICKS)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    update_times.sort()
+    render_times.sort()
+    return {"load_ms": load_time * 1000,
+            "update_mean_ms": sum(update_times) / len(update_times) * 1000,
+            "update_p95_ms": get_percentile(update_times, 95) * 1000,
+            "render_mean_ms": sum(render_times) / len(render_times) * 1000,
+            "render_p95_ms": get_percentile(render_times, 95) * 1000,
+            "peak_memory_kb": peak_memory / 1024,
+            "deaths": deaths}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns a description of every metric that regressed beyond the threshold"""
+    regressions = []
+    for level, metrics in results["levels"].items():
+        baseline_metrics = baseline["levels"].get(level)
+        if baseline_metrics is None:
+            continue
+        for metric, value in metrics.items():
+            baseline_value = baseline_metrics.get(metric)
+            if metric not in NOISE_FLOOR or baseline_value is None:
+                continue
+            if value > baseline_value * (1 + threshold) and value - baseline_value > NOISE_FLOOR[metric]:
+                regressions.append("%s %s: %.2f -> %.2f (+%.0f%%)" % (level, metric, baseline_value, value,
+                                                                     (value / baseline_value - 1) * 100))
+    return regressions
+
+
+def print_results(results: dict):
+    columns = ("load_ms", "update_mean_ms", "update_p95_ms", "render_mean_ms", "render_p95_ms", "peak_memory_kb")
+    print("%-8s" % "level" + "".join("%16s" % column for column in columns) + "%8s" % "deaths")
+    for level, metrics in results["levels"].items():
+        print("%-8s" % level + "".join("%16.2f" % metrics[column] for column in columns) + "%8d" % metrics["deaths"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks every level of the game")
+    parser.add_argument("--ticks", type=int, default=600, help="ticks to play each level for")
+    parser.add_argument("--levels", default="1-24", help="levels to benchmark, e.g. 1-24 or 3,5,7-9")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown, as a fraction")
+    parser.add_argument("--archive", action="store_true", help="read from assets.pak instead of loose files")
+    parser.add_argument("--quality", default=QUALITY_TIERS[0].name, choices=[tier.name for tier in QUALITY_TIERS],
+                        help="quality tier to play at")
+    arguments = parser.parse_args()
+
+    if arguments.archive and not mount_archive():
+        parser.error("assets.pak has not been built")
+    window = init_display(WINDOW_SIZE, "The Tower - Benchmark")
+    init_audio()
+    pg.init()
+    Library.load()
+
+    script_errors = check_input_script()
+    if script_errors:
+        print("The scripted inputs are not seen as scripted:\n" + "\n".join(script_errors), file=sys.stderr)
+        sys.exit(1)
+
+    keys = ScriptedKeys()
+    input_state.set_source(keys.get_pressed)
+
+    quality_governor.select_tier(quality_governor.get_tier_index(arguments.quality))
+    scene = GameScene()
+    music_player.join()
+
+    results = {"python": platform.python_version(),
+               "pygame": pg.version.ver,
+               "platform": platform.platform(),
+               "ticks": arguments.ticks,
+               "quality": arguments.quality,
+               "levels": {}}
+    for level_num in parse_levels(arguments.levels, count_levels()):
+        results["levels"]["level%d" % level_num] = benchmark_level(scene, window, keys, level_num, arguments.ticks)
+        print("level%d done" % level_num, file=sys.stderr)
+
+    print_results(results)
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if arguments.compare:
+        with open(arguments.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, arguments.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions beyond %.0f%% against %s" % (arguments.threshold * 100, arguments.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+from modules.block import Block
+from modules.leveljson import CHUNK_MANIFEST_FILENAME, get_chunk_filename
+
+"""
+* =============================================================== *
+* Splits a level JSON file into fixed-size chunks on disk, which  *
+* are streamed in by StreamingMap as the camera approaches them.  *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.chunkbuilder assets/levels/level24.json assets/levels/level24 [--chunk-size 16]
+
+The --repeat option tiles the level horizontally and vertically before chunking it, which is useful
+to produce a very large map for measurements, e.g. --repeat 10x10 gives a map 100 times the area.
+"""
+
+LAYERS = ("background", "decorations", "terrain")
+EMPTY_CODE = "  "
+
+
+def repeat_level(data: dict, columns: int, rows: int) -> dict:
+    """Returns a copy of the level tiled the given number of times in each direction"""
+    map_dict = data["map"]
+    height = len(map_dict["terrain"])
+    width = len(map_dict["terrain"][0])
+
+    repeated_map = {}
+    for layer in LAYERS:
+        repeated_rows = [row * columns for row in map_dict[layer]]
+        repeated_map[layer] = [list(row) for _ in range(rows) for row in repeated_rows]
+
+    repeated_enemies = []
+    for i in range(columns):
+        for j in range(rows):
+            for enemy in data["enemies"]:
+                repeated_enemies.append({"type": enemy["type"],
+                                         "coordinates": [enemy["coordinates"][0] + i * width * Block.BLOCK_SIZE,
+                                                         enemy["coordinates"][1] + j * height * Block.BLOCK_SIZE]})
+
+    return {"enemies": repeated_enemies,
+            "map": repeated_map,
+            "starting_position": data["starting_position"]}
+
+
+def get_chunk_enemies(enemies: list, chunk_size: int, chunk_columns: int, chunk_rows: int) -> dict:
+    """Returns the enemies of the level by the (column, row) of the chunk that holds their coordinates"""
+    chunk_pixels = chunk_size * Block.BLOCK_SIZE
+    chunk_enemies = {}
+    for enemy in enemies:
+        x, y = enemy["coordinates"]
+        chunk = (min(max(int(x) // chunk_pixels, 0), chunk_columns - 1),
+                 min(max(int(y) // chunk_pixels, 0), chunk_rows - 1))
+        chunk_enemies.setdefault(chunk, []).append(enemy)
+    return chunk_enemies
+
+
+def build_chunks(data: dict, output_directory: str, chunk_size: int):
+    """Writes the manifest and the chunks of the level that have tiles or enemies into the output directory"""
+    map_dict = data["map"]
+    rows = len(map_dict["terrain"])
+    columns = len(map_dict["terrain"][0])
+    chunk_rows = (rows + chunk_size - 1) // chunk_size
+    chunk_columns = (columns + chunk_size - 1) // chunk_size
+    chunk_enemies = get_chunk_enemies(data["enemies"], chunk_size, chunk_columns, chunk_rows)
+    os.makedirs(output_directory, exist_ok=True)
+
+    stored_chunks = []
+    for chunk_row in range(chunk_rows):
+        for chunk_column in range(chunk_columns):
+            chunk = {}
+            for layer in LAYERS:
+                chunk[layer] = [row[chunk_column * chunk_size:(chunk_column + 1) * chunk_size]
+                                for row in map_dict[layer][chunk_row * chunk_size:(chunk_row + 1) * chunk_size]]
+            enemies = chunk_enemies.get((chunk_column, chunk_row))
+            if enemies:
+                chunk["enemies"] = enemies
+
+            is_empty = all(code == EMPTY_CODE for layer in LAYERS for row in chunk[layer] for code in row)
+            if is_empty and not enemies:
+                continue
+
+            stored_chunks.append([chunk_column, chunk_row])
+            with open(os.path.join(output_directory, get_chunk_filename(chunk_column, chunk_row)), "w") as f:
+                json.dump(chunk, f, separators=(",", ":"))
+
+    manifest = {"chunk_size": chunk_size,
+                "columns": columns,
+                "rows": rows,
+                "chunks": stored_chunks,
+                "starting_position": data["starting_position"]}
+    with open(os.path.join(output_directory, CHUNK_MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    return len(stored_chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Splits a level into chunks for streaming")
+    parser.add_argument("level", help="path to the level JSON file")
+    parser.add_argument("output", help="directory to write the chunked level into")
+    parser.add_argument("--chunk-size", type=int, default=16, help="width and height of a chunk in tiles")
+    parser.add_argument("--repeat", default="1x1", help="tile the level COLUMNSxROWS times before chunking")
+    arguments = parser.parse_args()
+
+    with open(arguments.level) as f:
+        data = json.load(f)
+
+    repeat_columns, repeat_rows = (int(count) for count in arguments.repeat.lower().split("x"))
+    if (repeat_columns, repeat_rows) != (1, 1):
+        data = repeat_level(data, repeat_columns, repeat_rows)
+
+    chunk_count = build_chunks(data, arguments.output, arguments.chunk_size)
+    print("Wrote %d chunks of %dx%d tiles to %s" % (chunk_count, arguments.chunk_size, arguments.chunk_size,
+                                                     arguments.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,7 @@
 import pygame as pg
 import json
 from modules.block import Block
-from modules.textureset import TextureSet
-from modules.leveljson import Map
+from modules.leveljson import Map, TILEMAP_LAYERS, EMPTY_CODE
 from modules.entities import Player, PinkGuy, TrashMonster, ToothWalker
 from modules.entitystate import EntityState
 
@@ -57,9 +56,9 @@ class EditorLevel:
     def serialise_to_dict(self):
         starting_position = self.player.rect.topleft
         map = {
-            "background": self.map.bg_array,
-            "decorations": self.map.decorations_array,
-            "terrain": self.map.terrain_array
+            "background": self.map.tilemap.get_layer_codes("background"),
+            "decorations": self.map.tilemap.get_layer_codes("decorations"),
+            "terrain": self.map.tilemap.get_layer_codes("terrain")
         }
         enemies = self.enemies.serialise_to_list()
 
@@ -77,123 +76,46 @@ class EditorLevel:
 
 
 class EditorMap(Map):
-    """Essentially the same as the original Map, but Update() has been reworked to use different arguments"""
+    """Essentially the same as the original Map, but every code of the terrain layer is kept in the tilemap,
+    as the editor neither updates nor collides with interactive objects"""
     def __init__(self, map_dict):
         super().__init__(map_dict)
-        self.bg_array = map_dict["background"]
-        self.decorations_array = map_dict["decorations"]
-        self.terrain_array = map_dict["terrain"]
 
         self.bg_on = True
         self.decorations_on = True
         self.terrain_on = True
 
-        self.texture_set = TextureSet()
+        # basically layer 1 is bg, layer 2 is decorations, and layer 3 is the terrain layer of the tilemap.
+        # The level is saved straight from the tilemap.
+        self.layer_names = {1: "background",
+                            2: "decorations",
+                            3: "terrain"
+                            }
 
-        # basically layer 0 is bg, layer 1 is decorations, and layer 2 is terrain array.
-        # bg controls the bg terrain group, deco controls the mg terrain group, and terrain controls the
-        # collideable and interactive terrain groups
+    def add_layers(self, map_dict, column_offset=0, row_offset=0, include_interactive_objects=True) -> list:
+        for layer in TILEMAP_LAYERS:
+            self.tilemap.set_layer(layer, map_dict[layer], column_offset, row_offset)
+        return []
 
     def add(self, coordinates, layer, code: str):
         # input has already been validated
         row = int(coordinates[1] / Block.BLOCK_SIZE)
         col = int(coordinates[0] / Block.BLOCK_SIZE)
-
-        if layer == 1:
-            self.bg_array[row][col] = code
-            # kill the sprite
-            for sprite in self.background_terrain_group:
-                if sprite.rect.collidepoint(coordinates):
-                    sprite.kill()
-                    break
-            # then add the new sprite in
-            if code != "  ":
-                self.background_terrain_group.add(Block(self.texture_set.get_texture_from_code(code),
-                                                        col * Block.BLOCK_SIZE,
-                                                        row * Block.BLOCK_SIZE))
-        elif layer == 2:
-            self.decorations_array[row][col] = code
-            for sprite in self.middle_ground_terrain_group:
-                if sprite.rect.collidepoint(coordinates):
-                    sprite.kill()
-                    break
-
-            if code != "  ":
-                self.middle_ground_terrain_group.add(Block(self.texture_set.get_texture_from_code(code),
-                                                           col * Block.BLOCK_SIZE,
-                                                           row * Block.BLOCK_SIZE))
-        elif layer == 3:
-            self.terrain_array[row][col] = code
-            for sprite in self.collideable_terrain_group:
-                if sprite.rect.collidepoint(coordinates):
-                    sprite.kill()
-                    break
-            for sprite in self.interactive_objects_group:
-                if sprite.rect.collidepoint(coordinates):
-                    sprite.kill()
-                    break
-
-            if code != "  ":
-                # By right the group you add into doesnt matter here bc you cant update anyway lmao get rekt
-                # so ill just add them all to collideable terrain
-                # ffs you serialise from the array anyway
-                new_block = Block(self.texture_set.get_texture_from_code(code),
-                                  col * Block.BLOCK_SIZE,
-                                  row * Block.BLOCK_SIZE)
-                self.collideable_terrain_group.add(new_block)
+        self.tilemap.set_tile(self.layer_names[layer], col, row, code)
 
     def delete(self, coordinates, layer):
-        # replace both array and group
+        # Must click the starting location of the object before it can be deleted
         row = int(coordinates[1] / Block.BLOCK_SIZE)
         col = int(coordinates[0] / Block.BLOCK_SIZE)
-
-        if layer == 1:
-            self.bg_array[row][col] = "  "
-            for sprite in self.background_terrain_group:
-                # Must click the starting locationn of the object before it can be deleted
-                if sprite.rect.collidepoint(coordinates):
-                    sprite.kill()
-                    break
-        elif layer == 2:
-            self.decorations_array[row][col] = "  "
-            for sprite in self.middle_ground_terrain_group:
-                if sprite.rect.collidepoint(coordinates):
-                    sprite.kill()
-                    break
-        elif layer == 3:
-            self.terrain_array[row][col] = "  "
-            for sprite in self.collideable_terrain_group:
-                if sprite.rect.collidepoint(coordinates):
-                    sprite.kill()
-                    break
-            for sprite in self.interactive_objects_group:
-                if sprite.rect.collidepoint(coordinates):
-                    sprite.kill()
-                    break
+        self.tilemap.set_tile(self.layer_names[layer], col, row, EMPTY_CODE)
 
     def render(self, camera, surface):
         if self.bg_on:
-            for sprite in self.background_terrain_group:
-                if camera.rect.colliderect(sprite.rect):
-                    surface.blit(sprite.image,
-                                 (sprite.rect.x - camera.rect.x, sprite.rect.y - camera.rect.y))
-
+            self.tilemap.render("background", camera.rect, surface)
         if self.decorations_on:
-            for sprite in self.middle_ground_terrain_group:
-                if camera.rect.colliderect(sprite.rect):
-                    surface.blit(sprite.image,
-                                 (sprite.rect.x - camera.rect.x, sprite.rect.y - camera.rect.y))
-
+            self.tilemap.render("decorations", camera.rect, surface)
         if self.terrain_on:
-            for sprite in self.collideable_terrain_group:
-                if camera.rect.colliderect(sprite.rect):
-                    surface.blit(sprite.image,
-                                 (sprite.rect.x - camera.rect.x, sprite.rect.y - camera.rect.y))
-
-            for sprite in self.interactive_objects_group:
-                if camera.rect.colliderect(sprite.rect):
-                    surface.blit(sprite.image,
-                                 (sprite.rect.x - camera.rect.x, sprite.rect.y - camera.rect.y))
+            self.tilemap.render("terrain", camera.rect, surface)
 
 
 class EditorEnemyManager:
@@ -22,8 +22,8 @@ class MapPanel:
             self.boundaries = (int(dimensions[0]) * Block.BLOCK_SIZE,
                                int(dimensions[1]) * Block.BLOCK_SIZE)
         else:
-            self.boundaries = (len(self.level.map.bg_array[0]) * Block.BLOCK_SIZE,
-                               len(self.level.map.bg_array) * Block.BLOCK_SIZE)
+            self.boundaries = (self.level.map.tilemap.columns * Block.BLOCK_SIZE,
+                               self.level.map.tilemap.rows * Block.BLOCK_SIZE)
         self.current_code = "xx"            # Can be an enemy code or a block code
         self.add_mode = True            # if this is false, then this is erase mode
         self.current_layer = 1
@@ -3,6 +3,7 @@ import pygame.freetype as ft
 import json
 from dev_modules.events import EditorEvents
 from dev_modules.editorpanels import PalettePanel, MapPanel
+from modules.inputstate import input_state
 
 ft.init()
 freetype = ft.Font("assets/fonts/pixChicago.ttf", 12)
@@ -112,7 +113,7 @@ class MapEditorScene(Scene):
                         self.palette_panel.texture_selector_sub_panel.on_texture_menu = False
 
     def update(self):
-        current_keys = pg.key.get_pressed()
+        current_keys = input_state.held
         self.palette_panel.update(current_keys)
         self.map_panel.update(current_keys)
 
@@ -0,0 +1,121 @@
+import argparse
+import threading
+import time
+import requests
+from modules.leaderboard import USER_AGENT, CONNECT_TIMEOUT, READ_TIMEOUT, encrypt_score
+from dev_modules.highscoreserver import start_server
+
+"""
+* =============================================================== *
+* Load test for the highscores API. Simulated game clients fetch  *
+* the leaderboard and submit scores concurrently, and the latency *
+* of each kind of request is reported.                            *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.highscoreload [--clients 8] [--cycles 25] [--url URL] [--no-keep-alive]
+
+Without --url, a stand-in server from dev_modules/highscoreserver.py is started in the same process,
+with the given --latency-ms and --failure-rate. Every cycle of a client fetches the board twice, the
+second time with the ETag of the first as the game does when revalidating, then submits a score.
+
+Each client keeps one connection alive like the game does, unless --no-keep-alive is given, in which
+case every request opens a new connection.
+"""
+
+REQUEST_KINDS = ("fetch", "revalidate", "submit")
+
+
+def get_percentile(sorted_values: list, percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percentile / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class SimulatedClient:
+    """Runs fetch and submit cycles against the server, recording the latency of every request"""
+
+    def __init__(self, client_id: int, url: str, cycles: int, keep_alive: bool):
+        self.client_id = client_id
+        self.url = url
+        self.cycles = cycles
+        self.keep_alive = keep_alive
+        self.latencies = {kind: [] for kind in REQUEST_KINDS}
+        self.errors = 0
+        self.not_modified = 0
+
+    def request(self, session, kind: str, method: str, expected_statuses, **kwargs):
+        if not self.keep_alive:
+            kwargs.setdefault("headers", {})["Connection"] = "close"
+        start = time.perf_counter()
+        try:
+            response = session.request(method, self.url, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), **kwargs)
+        except requests.RequestException:
+            self.errors += 1
+            return None
+        self.latencies[kind].append(time.perf_counter() - start)
+        if response.status_code not in expected_statuses:
+            self.errors += 1
+            return None
+        return response
+
+    def run(self):
+        with requests.Session() as session:
+            session.headers["User-Agent"] = USER_AGENT
+            for cycle in range(self.cycles):
+                response = self.request(session, "fetch", "GET", (200,))
+                if response is not None:
+                    response = self.request(session, "revalidate", "GET", (200, 304),
+                                            headers={"If-None-Match": response.headers.get("ETag", "")})
+                    if response is not None and response.status_code == 304:
+                        self.not_modified += 1
+                self.request(session, "submit", "POST", (201,),
+                             data=encrypt_score("client %d" % self.client_id, 100 + self.client_id + cycle / 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load tests the highscores API")
+    parser.add_argument("--clients", type=int, default=8, help="number of concurrent clients")
+    parser.add_argument("--cycles", type=int, default=25, help="fetch and submit cycles per client")
+    parser.add_argument("--url", help="server to test, instead of a stand-in server in this process")
+    parser.add_argument("--latency-ms", type=float, default=0, help="latency of the stand-in server")
+    parser.add_argument("--failure-rate", type=float, default=0, help="failure rate of the stand-in server")
+    parser.add_argument("--no-keep-alive", action="store_true", help="open a new connection for every request")
+    arguments = parser.parse_args()
+
+    url = arguments.url
+    if url is None:
+        url = start_server(latency=arguments.latency_ms / 1000, failure_rate=arguments.failure_rate).get_url()
+
+    clients = [SimulatedClient(i, url, arguments.cycles, not arguments.no_keep_alive)
+               for i in range(arguments.clients)]
+    threads = [threading.Thread(target=client.run) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    request_count = sum(len(client.latencies[kind]) for client in clients for kind in REQUEST_KINDS)
+    print("%d clients x %d cycles against %s (%s)" % (arguments.clients, arguments.cycles, url,
+                                                      "new connection per request" if arguments.no_keep_alive
+                                                      else "keep-alive"))
+    print("%-12s %8s %10s %10s %10s %10s" % ("request", "count", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for kind in REQUEST_KINDS:
+        latencies = sorted(latency for client in clients for latency in client.latencies[kind])
+        print("%-12s %8d %10.2f %10.2f %10.2f %10.2f" % (kind, len(latencies),
+                                                         get_percentile(latencies, 50) * 1000,
+                                                         get_percentile(latencies, 95) * 1000,
+                                                         get_percentile(latencies, 99) * 1000,
+                                                         (latencies[-1] if latencies else 0) * 1000))
+    print("throughput: %.1f requests/s over %.2f s" % (request_count / duration, duration))
+    print("not modified: %d, errors: %d" % (sum(client.not_modified for client in clients),
+                                            sum(client.errors for client in clients)))
+
+
+if __name__ == "__main__":
+    main()
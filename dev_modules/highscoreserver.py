@@ -0,0 +1,180 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from modules.leaderboard import USER_AGENT, decrypt_score
+
+"""
+* =============================================================== *
+* Stand-in for the Rails highscores backend, serving the same     *
+* /highscores contract from memory so that the game client can be *
+* run and measured without a live server.                         *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.highscoreserver [--port 3000] [--latency-ms 0] [--failure-rate 0] [--database scores.json]
+and point the game at it with:
+    TOWER_HIGHSCORES_URL=http://localhost:3000/highscores python main.py
+
+CONTRACT
+-------------------------
+The behaviour follows backend/app/controllers/highscores_controller.rb:
+    GET /highscores     ->          200 with a JSON list of the ten lowest times, as {"user": str, "time": float}.
+                                    Replies carry an ETag, and 304 Not Modified is returned for If-None-Match.
+    POST /highscores    ->          Form fields user and time, encrypted with AES-CBC by the same cipher in turn.
+                                    201 if stored, 401 if the User-Agent is not the game client's, and 400 if
+                                    the fields cannot be decrypted.
+
+--latency-ms delays every reply, and --failure-rate answers that fraction of requests with 503, which is
+useful to exercise the retries of the game client.
+"""
+
+
+class HighscoreStore:
+    """Thread-safe list of highscores, optionally saved to a JSON file after every change"""
+
+    def __init__(self, database_path=None):
+        self.database_path = database_path
+        self.lock = threading.Lock()
+        self.scores = []
+        if database_path is not None:
+            try:
+                with open(database_path) as f:
+                    self.scores = json.load(f)
+            except FileNotFoundError:
+                pass
+        self.update_top_ten()
+
+    def update_top_ten(self):
+        """Renders the top ten and its ETag once per change rather than once per request"""
+        top_ten = sorted(self.scores, key=lambda score: score["time"])[:10]
+        self.top_ten_json = json.dumps(top_ten).encode("utf-8")
+        self.etag = '"%s"' % hashlib.sha1(self.top_ten_json).hexdigest()
+
+    def add(self, user: str, score_time: float):
+        with self.lock:
+            self.scores.append({"user": user, "time": score_time})
+            self.update_top_ten()
+            if self.database_path is not None:
+                with open(self.database_path, "w") as f:
+                    json.dump(self.scores, f)
+
+    def get_top_ten(self) -> tuple:
+        """Returns the JSON of the top ten and its ETag"""
+        with self.lock:
+            return self.top_ten_json, self.etag
+
+
+class HighscoreRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keeps connections alive, like Puma does
+    disable_nagle_algorithm = True  # Otherwise the body of a reply waits for the client to ACK its headers
+
+    def do_GET(self):
+        if not self.is_highscores_path() or self.should_fail():
+            return
+
+        top_ten_json, etag = self.server.store.get_top_ten()
+        if self.headers.get("If-None-Match") == etag:
+            self.reply(304, headers={"ETag": etag})
+        else:
+            self.reply(200, top_ten_json, {"ETag": etag, "Content-Type": "application/json"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.is_highscores_path() or self.should_fail():
+            return
+        if self.headers.get("User-Agent") != USER_AGENT:
+            self.reply(401)
+            return
+
+        # The encrypted fields are arbitrary bytes, so they are decoded one-to-one as Latin-1
+        form = urllib.parse.parse_qs(body.decode("ascii", "replace"), encoding="latin-1")
+        try:
+            user, score_time = decrypt_score({field: form[field][0].encode("latin-1") for field in ("user", "time")})
+        except (KeyError, ValueError):
+            self.reply(400)
+            return
+        self.server.store.add(user, score_time)
+        self.reply(201)
+
+    def is_highscores_path(self) -> bool:
+        if urllib.parse.urlsplit(self.path).path.rstrip("/") != "/highscores":
+            self.reply(404)
+            return False
+        return True
+
+    def should_fail(self) -> bool:
+        """Waits for the configured latency, then answers with 503 if the request is chosen to fail"""
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        if random.random() < self.server.failure_rate:
+            self.reply(503)
+            return True
+        return False
+
+    def reply(self, status: int, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            # Tells the client not to reuse the connection, which is closed after this reply
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class HighscoreServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128        # Clients that open a new connection per request would overflow the default
+
+    def __init__(self, address, store: HighscoreStore, latency=0.0, failure_rate=0.0, verbose=False):
+        super().__init__(address, HighscoreRequestHandler)
+        self.store = store
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.verbose = verbose
+
+    def get_url(self) -> str:
+        host, port = self.server_address[:2]
+        return "http://%s:%d/highscores" % (host, port)
+
+
+def start_server(port=0, latency=0.0, failure_rate=0.0, database_path=None) -> HighscoreServer:
+    """Starts a quiet server on a background thread, on a free port if port is 0"""
+    server = HighscoreServer(("127.0.0.1", port), HighscoreStore(database_path), latency, failure_rate)
+    threading.Thread(target=server.serve_forever, name="highscore-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves the highscores API locally")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay added to every reply")
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of requests answered with 503")
+    parser.add_argument("--database", help="JSON file to keep the scores in between runs")
+    arguments = parser.parse_args()
+
+    server = HighscoreServer(("127.0.0.1", arguments.port), HighscoreStore(arguments.database),
+                             arguments.latency_ms / 1000, arguments.failure_rate, verbose=True)
+    print("Serving highscores on " + server.get_url())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
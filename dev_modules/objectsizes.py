@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+from modules.runtime import init_display, init_audio
+from modules.libraries import Library
+from modules.assets import load_json
+from modules.leveljson import Map, EnemyManager
+from modules.camera import Camera
+from modules.component import Component
+from modules.entities import Player
+from modules.gamescene import SURFACE_SIZE
+from dev_modules.benchmark import count_levels
+
+"""
+* =============================================================== *
+* Reports the memory taken by each Block and each enemy of the    *
+* largest level, and the size of the instances of the classes     *
+* that are created the most.                                      *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.objectsizes [--level 24] [--output sizes.json] [--compare baseline.json]
+
+The largest level is the one with the most cells, unless --level is given. The following are reported:
+    block_bytes         ->      memory allocated by Python per interactive Block of the level, including its
+                                Rect, its components and its entries in the sprite groups of the map
+    block_pixel_bytes   ->      pixels of the images owned by the Blocks, divided by the number of Blocks
+    enemy_bytes         ->      memory allocated by Python per enemy, measured over at least ENEMY_SAMPLES
+                                copies of the enemies of the level
+    instance_bytes      ->      size of a single instance of each class, including its __dict__ if it has one
+
+Memory allocated by Python is measured by tracemalloc as the difference before and after the objects are
+created, after creating them once to fill every cache. Pixels are allocated by SDL, which tracemalloc does
+not see, so they are counted from the sizes of the images.
+
+To compare two versions, run the tool with --output on the first and with --compare on the second.
+"""
+
+ENEMY_SAMPLES = 1000
+
+
+def get_level_json_path(level_num: int) -> str:
+    """Returns the path to the JSON file of the level, which is read even if the level has been chunked"""
+    return "assets/levels/level%d.json" % level_num
+
+
+def find_largest_level() -> int:
+    """Returns the number of the level with the most cells"""
+    def get_cell_count(level_num):
+        terrain = load_json(get_level_json_path(level_num))["map"]["terrain"]
+        return len(terrain) * len(terrain[0])
+    return max(range(1, count_levels() + 1), key=get_cell_count)
+
+
+def get_instance_size(instance) -> int:
+    size = sys.getsizeof(instance)
+    if hasattr(instance, "__dict__"):
+        size += sys.getsizeof(instance.__dict__)
+    return size
+
+
+def measure_traced_bytes(create) -> tuple:
+    """Returns the objects returned by create() and the memory that Python allocated for them"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    created = create()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return created, after - before
+
+
+def get_empty_map_dict(map_dict: dict) -> dict:
+    rows = len(map_dict["terrain"])
+    columns = len(map_dict["terrain"][0])
+    return {layer: [["  "] * columns for _ in range(rows)] for layer in map_dict}
+
+
+def measure_blocks(map_dict: dict) -> dict:
+    """Adds the layers of the level to an empty map of the same size, and measures the Blocks created"""
+    Map(map_dict)
+    game_map = Map(get_empty_map_dict(map_dict))
+    blocks, traced_bytes = measure_traced_bytes(lambda: game_map.add_layers(map_dict))
+
+    images = {id(block.image): block.image for block in blocks}
+    pixel_bytes = sum(image.get_width() * image.get_height() * image.get_bytesize() for image in images.values())
+    return {"blocks": len(blocks),
+            "block_bytes": traced_bytes / len(blocks),
+            "block_pixel_bytes": pixel_bytes / len(blocks),
+            "samples": blocks}
+
+
+def measure_enemies(enemies_list: list) -> dict:
+    copies = -(-ENEMY_SAMPLES // len(enemies_list))
+    EnemyManager(enemies_list)
+    manager, traced_bytes = measure_traced_bytes(lambda: EnemyManager(enemies_list * copies))
+    return {"enemies": len(enemies_list) * copies,
+            "enemy_bytes": traced_bytes / (len(enemies_list) * copies)}
+
+
+def get_samples(blocks: list, game_map: Map) -> list:
+    """Returns one instance of each class whose size is reported"""
+    player = Player()
+    samples = [player, Camera(SURFACE_SIZE, game_map.rect)]
+    samples.extend(value for value in vars(player).values() if isinstance(value, Component))
+    samples.extend(Library.player_animations.values())
+    samples.extend(game_map.texture_set.textures.values())
+    samples.extend(blocks)
+    tilemap = getattr(game_map, "tilemap", None)
+    if tilemap is not None:
+        samples.extend(tilemap.tile_types[1:])
+    return samples
+
+
+def measure_instances(samples: list) -> dict:
+    sizes = {}
+    for sample in samples:
+        sizes.setdefault(type(sample).__name__, get_instance_size(sample))
+    return dict(sorted(sizes.items()))
+
+
+def print_results(results: dict, baseline=None):
+    print("level%d: %d blocks, %d enemies measured" % (results["level"], results["blocks"], results["enemies"]))
+    rows = [(name, results[name], baseline[name] if baseline else None)
+            for name in ("block_bytes", "block_pixel_bytes", "enemy_bytes")]
+    rows.extend((name, size, baseline["instance_bytes"].get(name) if baseline else None)
+                for name, size in results["instance_bytes"].items())
+    print("%-28s %12s %12s" % ("", "bytes", "baseline" if baseline else ""))
+    for name, value, baseline_value in rows:
+        comparison = "" if baseline_value is None else "%12.0f %+7.0f%%" % (
+            baseline_value, (value / baseline_value - 1) * 100 if baseline_value else 0)
+        print("%-28s %12.0f %s" % (name, value, comparison))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reports the memory taken per Block, per enemy and per instance")
+    parser.add_argument("--level", type=int, help="level to measure, the largest by default")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare against")
+    arguments = parser.parse_args()
+
+    init_display(SURFACE_SIZE, "The Tower - Object sizes")
+    init_audio()
+    pg.init()
+    Library.load()
+
+    level_num = arguments.level or find_largest_level()
+    data = load_json(get_level_json_path(level_num))
+    block_results = measure_blocks(data["map"])
+    enemy_results = measure_enemies(data["enemies"])
+    results = {"level": level_num,
+               "blocks": block_results["blocks"],
+               "block_bytes": block_results["block_bytes"],
+               "block_pixel_bytes": block_results["block_pixel_bytes"],
+               "enemies": enemy_results["enemies"],
+               "enemy_bytes": enemy_results["enemy_bytes"],
+               "instance_bytes": measure_instances(get_samples(block_results["samples"], Map(data["map"])))}
+
+    baseline = None
+    if arguments.compare:
+        with open(arguments.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+from modules.runtime import init_display, init_audio
+from modules.libraries import Library
+from modules.leveljson import Level
+from modules.camera import Camera
+from modules.entities import Player
+from modules.entitystate import GameEvent
+from modules.gamescene import SURFACE_SIZE
+from dev_modules.stresslevel import ENEMY_TYPES, generate_level, write_level, parse_size
+
+"""
+* =============================================================== *
+* Sweeps synthetic levels of increasing size through Level, Map   *
+* and EnemyManager, and records how load, tick and render times   *
+* grow with the size of the map.                                  *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.scalingsweep [--sizes 32x16,64x32,128x64,256x128] [--densities 0.15]
+                                       [--ticks 120] [--output scaling.csv] [--plot scaling.png]
+
+Every combination of size and density is generated by dev_modules/stresslevel.py. The numbers of coins,
+spikes, ladders and enemies are given per 100 tiles, so that they grow with the area of the map, and
+enemies are split evenly between the types. The player stands still at the starting position while the
+enemies move, and is revived at the start if it dies.
+
+For each level, the following are recorded:
+    load_ms                         ->      time taken to construct the Level from its file
+    update_mean_ms, update_p95_ms   ->      time taken by Player.update() and Level.update() per tick
+    render_mean_ms, render_p95_ms   ->      time taken by Level.render() and Player.render() per tick
+    objects                         ->      number of tiles in the tilemap and sprites in the map and enemy
+                                            groups after loading
+
+The table also gives the tick time, update and render together, per 1000 objects. It stays flat while
+the cost grows linearly with the number of objects, and grows where the engine starts to scale worse.
+Levels whose tick time exceeds the frame budget of 60 FPS are marked.
+
+Results are written as CSV with --output. --plot draws the times against the number of tiles, and
+requires matplotlib, which is not a dependency of the game.
+"""
+
+TICK_TIME = 1 / 60
+FRAME_BUDGET_MS = 1000 / 60
+
+COLUMNS = ("width", "height", "density", "tiles", "objects", "enemies", "load_ms",
+           "update_mean_ms", "update_p95_ms", "render_mean_ms", "render_p95_ms")
+
+
+def get_percentile(sorted_values: list, percentile: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(percentile / 100 * len(sorted_values)))]
+
+
+def count_objects(level: Level) -> int:
+    level_map = level.map
+    tile_count = sum(len(tile_ids) - tile_ids.count(0) for tile_ids in level_map.tilemap.layers.values())
+    return (tile_count + len(level_map.collideable_terrain_group) + len(level_map.interactive_objects_group) +
+            len(level.enemies.enemies))
+
+
+def measure_level(filepath: str, surface: pg.Surface, ticks: int) -> dict:
+    """Loads the level at the given path and plays it for the given number of ticks"""
+    start = time.perf_counter()
+    level = Level(filepath)
+    load_time = time.perf_counter() - start
+
+    player = Player(level.starting_position)
+    camera = Camera(SURFACE_SIZE, level.map.rect)
+    camera.snap_to_target(player)
+    object_count = count_objects(level)
+
+    update_times = []
+    render_times = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        player.update(TICK_TIME, level.map)
+        level.update(TICK_TIME, player)
+        update_times.append(time.perf_counter() - start)
+        camera.follow_target(player)
+
+        start = time.perf_counter()
+        level.render(camera, surface)
+        player.render(camera, surface)
+        render_times.append(time.perf_counter() - start)
+
+        if pg.event.get(GameEvent.GAME_OVER.value):
+            player = Player(level.starting_position)
+        pg.event.clear()
+
+    update_times.sort()
+    render_times.sort()
+    return {"objects": object_count,
+            "enemies": len(level.enemies.enemies),
+            "load_ms": load_time * 1000,
+            "update_mean_ms": sum(update_times) / len(update_times) * 1000,
+            "update_p95_ms": get_percentile(update_times, 95) * 1000,
+            "render_mean_ms": sum(render_times) / len(render_times) * 1000,
+            "render_p95_ms": get_percentile(render_times, 95) * 1000}
+
+
+def write_csv(rows: list, filepath: str):
+    with open(filepath, "w", newline="") as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({column: row[column] for column in COLUMNS})
+
+
+def plot(rows: list, filepath: str):
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed, so no plot was drawn. Use the CSV from --output instead.",
+              file=sys.stderr)
+        return
+
+    figure, axes = plt.subplots(1, 3, figsize=(15, 4))
+    for density in sorted(set(row["density"] for row in rows)):
+        density_rows = sorted((row for row in rows if row["density"] == density), key=lambda row: row["tiles"])
+        tiles = [row["tiles"] for row in density_rows]
+        for axis, metric in zip(axes, ("load_ms", "update_mean_ms", "render_mean_ms")):
+            axis.plot(tiles, [row[metric] for row in density_rows], marker="o", label="density %.2f" % density)
+    for axis, title in zip(axes, ("Load", "Update per tick", "Render per tick")):
+        axis.set_title(title)
+        axis.set_xlabel("tiles")
+        axis.set_ylabel("ms")
+        axis.set_xscale("log")
+        axis.set_yscale("log")
+        axis.legend()
+    axes[1].axhline(FRAME_BUDGET_MS, color="grey", linestyle="--")
+    figure.tight_layout()
+    figure.savefig(filepath)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures how level load, tick and render times scale with size")
+    parser.add_argument("--sizes", default="32x16,64x32,128x64,256x128", help="comma-separated WIDTHxHEIGHT")
+    parser.add_argument("--densities", default="0.15", help="comma-separated fractions of solid tiles")
+    parser.add_argument("--coins", type=float, default=2, help="coins per 100 tiles")
+    parser.add_argument("--spikes", type=float, default=1, help="spikes per 100 tiles")
+    parser.add_argument("--ladders", type=float, default=1, help="ladders per 100 tiles")
+    parser.add_argument("--enemies", type=float, default=0.6, help="enemies per 100 tiles")
+    parser.add_argument("--ticks", type=int, default=120, help="ticks to play each level for")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="CSV file to write the results to")
+    parser.add_argument("--plot", help="image file to draw the results to, which requires matplotlib")
+    arguments = parser.parse_args()
+
+    init_display(SURFACE_SIZE, "The Tower - Scaling sweep")
+    init_audio()
+    pg.init()
+    Library.load()
+    surface = pg.Surface(SURFACE_SIZE)
+
+    rows = []
+    print("%-10s %8s %8s %10s %12s %12s %12s %14s" % ("size", "density", "objects", "load ms", "update ms",
+                                                       "render ms", "tick ms", "ms/1k objects"))
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, "stress.json")
+        for density in (float(density) for density in arguments.densities.split(",")):
+            for width, height in (parse_size(size) for size in arguments.sizes.split(",")):
+                tiles = width * height
+                enemy_count = int(tiles * arguments.enemies / 100)
+                enemy_counts = {enemy_type: enemy_count // len(ENEMY_TYPES) + (i < enemy_count % len(ENEMY_TYPES))
+                                for i, enemy_type in enumerate(ENEMY_TYPES)}
+                write_level(generate_level(width, height, density,
+                                           int(tiles * arguments.coins / 100),
+                                           int(tiles * arguments.spikes / 100),
+                                           int(tiles * arguments.ladders / 100),
+                                           enemy_counts, arguments.seed), filepath)
+
+                row = {"width": width, "height": height, "density": density, "tiles": tiles}
+                row.update(measure_level(filepath, surface, arguments.ticks))
+                rows.append(row)
+
+                tick_ms = row["update_mean_ms"] + row["render_mean_ms"]
+                print("%-10s %8.2f %8d %10.2f %12.3f %12.3f %12.3f %14.3f%s" % (
+                    "%dx%d" % (width, height), density, row["objects"], row["load_ms"], row["update_mean_ms"],
+                    row["render_mean_ms"], tick_ms, tick_ms / row["objects"] * 1000,
+                    "  over budget" if tick_ms > FRAME_BUDGET_MS else ""))
+
+    if arguments.output:
+        write_csv(rows, arguments.output)
+    if arguments.plot:
+        plot(rows, arguments.plot)
+
+
+if __name__ == "__main__":
+    main()
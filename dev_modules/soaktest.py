@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame as pg
+from modules.runtime import init_display, init_audio
+from modules.libraries import Library
+from modules.entitystate import GameEvent
+from modules.gamescene import SceneManager, TitleScene, GameScene, GameOverScene, GameBeatenScene, WINDOW_SIZE
+from modules.memorydiagnostics import memory_diagnostics, TRACKED_CLASSES
+from modules.inputstate import input_state
+
+"""
+* =============================================================== *
+* Soak test that plays every level in a loop through the real     *
+* scene transitions, and fails if memory does not plateau.        *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.soaktest [--loops 4] [--frames 20] [--tolerance-kb 256] [--quiet]
+
+Every loop starts a game from the title screen's scene stack, dies once on the first level and restarts
+from the game over screen, then plays each level for the given number of frames before finishing it.
+Levels are finished by posting SWITCH_LEVEL, so they go through the fade out, loading and fade in scenes
+as in the game. After the last level, the game is restarted from the victory screen, which starts the
+next loop. The player stands still, and restarts from the first level if it dies, as in the game.
+
+The memory diagnostics of modules/memorydiagnostics.py report every level boundary unless --quiet is
+given, and a snapshot is taken at the end of every loop. The first loop fills caches that live for the
+whole session, such as the sound bank and rendered text, so the loops after it are compared. The test
+fails if the traced memory at the end of the last loop is more than the tolerance above that of the
+end of the first loop compared, or if any tracked class has more live instances.
+"""
+
+# Frames after which a loop is considered stuck, e.g. because the player keeps dying
+MAX_FRAMES_PER_LEVEL = 1000
+
+
+def play_loop(manager: SceneManager, window: pg.Surface, frames_per_level: int, level_count: int):
+    """Plays every level once, restarting once from the game over screen, and ends on a new game"""
+    frames_in_level = 0
+    has_died = False
+    for _ in range(MAX_FRAMES_PER_LEVEL * level_count):
+        scene = manager.scene
+        if isinstance(scene, GameScene):
+            frames_in_level += 1
+            if frames_in_level == frames_per_level:
+                event_type = GameEvent.SWITCH_LEVEL if has_died else GameEvent.GAME_OVER
+                has_died = True
+                pg.event.post(pg.event.Event(event_type.value))
+        else:
+            frames_in_level = 0
+            if isinstance(scene, (GameOverScene, GameBeatenScene)):
+                pg.event.post(pg.event.Event(GameEvent.GAME_RESTART.value))
+
+        scene.handle_events()
+        input_state.sample()
+        manager.scene.update(1 / 60)
+        manager.scene.render(window)
+
+        if isinstance(scene, GameBeatenScene):
+            return
+    raise RuntimeError("the game did not reach the victory screen")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays every level in a loop and checks that memory plateaus")
+    parser.add_argument("--loops", type=int, default=4, help="number of times to play every level")
+    parser.add_argument("--frames", type=int, default=20, help="frames to play each level for")
+    parser.add_argument("--tolerance-kb", type=float, default=256, help="allowed growth of the traced memory")
+    parser.add_argument("--quiet", action="store_true", help="only report the snapshot of each loop")
+    arguments = parser.parse_args()
+    if arguments.loops < 2:
+        parser.error("at least 2 loops are needed to compare")
+
+    window = init_display(WINDOW_SIZE, "The Tower - Soak test")
+    init_audio()
+    pg.init()
+    Library.load()
+
+    memory_diagnostics.enable()
+    if arguments.quiet:
+        memory_diagnostics.report = lambda *args, **kwargs: None
+
+    # Starts the game as the title screen does, so that restarts unwind the stack to the title screen
+    manager = SceneManager(TitleScene())
+    manager.switch_to_scene(GameScene())
+    level_count = manager.scene.level_manager.number_of_levels
+
+    loop_snapshots = []
+    for loop in range(arguments.loops):
+        play_loop(manager, window, arguments.frames, level_count)
+        loop_snapshots.append(memory_diagnostics.take_snapshot("loop%d" % (loop + 1)))
+        print("loop %d done" % (loop + 1), file=sys.stderr)
+
+    print("%-8s %12s" % ("loop", "traced KB") + "".join("%12s" % name for name in TRACKED_CLASSES))
+    for snapshot in loop_snapshots:
+        print("%-8s %12.1f" % (snapshot.label, snapshot.traced_bytes / 1024) +
+              "".join("%12d" % snapshot.object_counts[name] for name in TRACKED_CLASSES))
+
+    baseline = loop_snapshots[1] if len(loop_snapshots) > 2 else loop_snapshots[0]
+    last = loop_snapshots[-1]
+    failures = []
+    growth_kb = (last.traced_bytes - baseline.traced_bytes) / 1024
+    if growth_kb > arguments.tolerance_kb:
+        failures.append("traced memory grew by %.1f KB from %s to %s" % (growth_kb, baseline.label, last.label))
+    for name in TRACKED_CLASSES:
+        if last.object_counts[name] > baseline.object_counts[name]:
+            failures.append("live %s grew from %d to %d" % (name, baseline.object_counts[name],
+                                                             last.object_counts[name]))
+
+    for failure in failures:
+        print("LEAK " + failure)
+    if failures:
+        sys.exit(1)
+    print("Memory plateaued: %+.1f KB from %s to %s" % (growth_kb, baseline.label, last.label))
+
+
+if __name__ == "__main__":
+    main()
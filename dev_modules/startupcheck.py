@@ -0,0 +1,118 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+"""
+* =============================================================== *
+* Import-time regression check for the game. Importing the scene  *
+* module must not initialise PyGame, load assets or pull in the   *
+* networking stack, and must stay within a fixed time budget so   *
+* that the window appears quickly on a cold start.                *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.startupcheck [--budget-ms 400] [--own-budget-ms 100] [--runs 5]
+
+The check exits with a non-zero status if any budget is exceeded or if an import has a side effect.
+"""
+
+# Modules that must only be imported once the leaderboard is opened
+DEFERRED_MODULES = ("requests", "Crypto")
+
+# The module imported by main.py before the window is opened
+ENTRY_MODULE = "modules.gamescene"
+
+PROBE = """
+import sys
+import {module}
+import pygame as pg
+deferred = [name for name in {deferred!r} if name in sys.modules]
+print("DEFERRED=" + ",".join(deferred))
+print("DISPLAY=" + str(pg.display.get_init()))
+print("MIXER=" + str(pg.mixer.get_init() is not None))
+"""
+
+
+def run_probe(module):
+    """Imports the module in a fresh interpreter and returns the wall time, the -X importtime
+    log and the side effects observed after the import"""
+    environment = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+                            capture_output=True, text=True, env=environment)
+    wall_time = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError("Importing %s failed:\n%s" % (module, result.stderr))
+
+    side_effects = {}
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition("=")
+        side_effects[key] = value
+    return wall_time, result.stderr, side_effects
+
+
+def parse_import_times(log):
+    """Returns a dict mapping each imported module to its self time in milliseconds"""
+    self_times = {}
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        name = fields[2].strip()
+        self_times[name] = int(fields[0]) / 1000
+    return self_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks the import time and side effects of " + ENTRY_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=400,
+                        help="maximum wall time of a cold interpreter importing the entry module")
+    parser.add_argument("--own-budget-ms", type=float, default=100,
+                        help="maximum time spent in the game's own modules")
+    parser.add_argument("--runs", type=int, default=5, help="number of runs, of which the fastest is kept")
+    arguments = parser.parse_args()
+
+    best_wall_time = None
+    best_self_times = None
+    failures = []
+    for _ in range(arguments.runs):
+        wall_time, log, side_effects = run_probe(ENTRY_MODULE)
+        if side_effects.get("DEFERRED"):
+            failures.append("deferred modules imported: " + side_effects["DEFERRED"])
+        if side_effects.get("DISPLAY") == "True":
+            failures.append("the display was initialised at import time")
+        if side_effects.get("MIXER") == "True":
+            failures.append("the mixer was initialised at import time")
+        if best_wall_time is None or wall_time < best_wall_time:
+            best_wall_time = wall_time
+            best_self_times = parse_import_times(log)
+
+    own_times = {name: self_time for name, self_time in best_self_times.items()
+                 if name.split(".")[0] in ("modules", "dev_modules")}
+    own_total = sum(own_times.values())
+    wall_ms = best_wall_time * 1000
+
+    print("import %s: %.1f ms wall (budget %.0f ms)" % (ENTRY_MODULE, wall_ms, arguments.budget_ms))
+    print("  own modules: %.1f ms (budget %.0f ms)" % (own_total, arguments.own_budget_ms))
+    for name, self_time in sorted(own_times.items(), key=lambda item: item[1], reverse=True)[:5]:
+        print("    %-28s %6.1f ms" % (name, self_time))
+
+    if wall_ms > arguments.budget_ms:
+        failures.append("import took %.1f ms, over the budget of %.0f ms" % (wall_ms, arguments.budget_ms))
+    if own_total > arguments.own_budget_ms:
+        failures.append("own modules took %.1f ms, over the budget of %.0f ms"
+                        % (own_total, arguments.own_budget_ms))
+
+    # Side effects are collected on every run, so each one is reported once
+    for failure in sorted(set(failures)):
+        print("FAIL: " + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import random
+from modules.block import Block
+
+"""
+* =============================================================== *
+* Generates synthetic level files of any size, with a given       *
+* density of solid tiles and number of objects and enemies, to    *
+* measure how the engine scales beyond the real levels.           *
+* =============================================================== *
+
+USAGE
+-------------------------
+Run from the root of the repository:
+    python -m dev_modules.stresslevel output.json [--size 256x128] [--density 0.15] [--coins 100]
+                                      [--spikes 50] [--ladders 50] [--pink-guys 10] [--trash-monsters 10]
+                                      [--tooth-walkers 10] [--seed 0]
+
+The generated level is enclosed by walls, with the player starting at the bottom-left corner and a
+gateway at the bottom-right corner. Solid tiles are scattered over the rest of the map at the given
+density, then coins, ladders, spikes and enemies are placed on the tiles left empty. Spikes are placed
+on top of solid tiles where possible. The same seed always gives the same level.
+
+Generated levels are valid level files, and can be played or opened in the level editor like any other.
+"""
+
+LAYERS = ("background", "decorations", "terrain")
+EMPTY_CODE = "  "
+SOLID_CODE = "f1"
+BACKGROUND_CODE = "wl"
+ENEMY_TYPES = ("Pink Guy", "Trash Monster", "Tooth Walker")
+
+MINIMUM_SIZE = (16, 12)
+START_AREA_SIZE = 3         # Width and height in tiles of the corner kept clear around the starting position
+
+
+def generate_level(width: int, height: int, density=0.15, coins=0, spikes=0, ladders=0, enemy_counts=None,
+                   seed=0) -> dict:
+    """Returns the dict of a level file with the given parameters.
+
+    :param width:           Width of the map in tiles, including the walls.
+    :param height:          Height of the map in tiles, including the walls.
+    :param density:         Fraction of the tiles inside the walls that are solid.
+    :param coins:           Number of coins, ladders and spikes. Each is limited by the number of empty tiles.
+    :param enemy_counts:    Dict of the number of enemies of each type in ENEMY_TYPES.
+    :param seed:            Seed of the random placement.
+    """
+
+    if width < MINIMUM_SIZE[0] or height < MINIMUM_SIZE[1]:
+        raise ValueError("levels must be at least %dx%d tiles" % MINIMUM_SIZE)
+    rng = random.Random(seed)
+
+    terrain = [[EMPTY_CODE] * width for _ in range(height)]
+    for x in range(width):
+        terrain[0][x] = "c1"
+        terrain[height - 1][x] = SOLID_CODE
+    for y in range(1, height - 1):
+        terrain[y][0] = "l1"
+        terrain[y][width - 1] = "r1"
+    terrain[height - 1][0] = "bl"
+    terrain[height - 1][width - 1] = "br"
+    terrain[height - 2][width - 2] = "GW"
+
+    # Every tile inside the walls, apart from the starting corner and the gateway, can be filled
+    free_tiles = [(x, y) for y in range(1, height - 1) for x in range(1, width - 1)
+                  if not (x <= START_AREA_SIZE and y >= height - 1 - START_AREA_SIZE)
+                  and terrain[y][x] == EMPTY_CODE]
+    rng.shuffle(free_tiles)
+
+    solid_count = int(len(free_tiles) * density)
+    for x, y in free_tiles[:solid_count]:
+        terrain[y][x] = SOLID_CODE
+    free_tiles = free_tiles[solid_count:]
+
+    # Spikes go on top of solid tiles first, so that they can actually be landed on
+    supported_tiles = [tile for tile in free_tiles if terrain[tile[1] + 1][tile[0]] == SOLID_CODE]
+    unsupported_tiles = [tile for tile in free_tiles if terrain[tile[1] + 1][tile[0]] != SOLID_CODE]
+    spike_tiles = (supported_tiles + unsupported_tiles)[:spikes]
+    for x, y in spike_tiles:
+        terrain[y][x] = "SP"
+
+    free_tiles = [tile for tile in free_tiles if terrain[tile[1]][tile[0]] == EMPTY_CODE]
+    for x, y in free_tiles[:coins]:
+        terrain[y][x] = "CN"
+    for x, y in free_tiles[coins:coins + ladders]:
+        terrain[y][x] = "LB"
+    free_tiles = free_tiles[coins + ladders:]
+
+    enemies = []
+    for enemy_type in ENEMY_TYPES:
+        for _ in range((enemy_counts or {}).get(enemy_type, 0)):
+            if not free_tiles:
+                break
+            x, y = free_tiles.pop()
+            enemies.append({"type": enemy_type, "coordinates": [x * Block.BLOCK_SIZE, y * Block.BLOCK_SIZE]})
+
+    return {"enemies": enemies,
+            "map": {"background": [[BACKGROUND_CODE] * width for _ in range(height)],
+                    "decorations": [[EMPTY_CODE] * width for _ in range(height)],
+                    "terrain": terrain},
+            "starting_position": [Block.BLOCK_SIZE, (height - 3) * Block.BLOCK_SIZE]}
+
+
+def write_level(data: dict, filepath: str):
+    with open(filepath, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+
+
+def parse_size(text: str) -> tuple:
+    """Parses a size in tiles such as "256x128" """
+    width, height = (int(length) for length in text.lower().split("x"))
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a synthetic level for stress testing")
+    parser.add_argument("output", help="path of the level JSON file to write")
+    parser.add_argument("--size", default="256x128", help="WIDTHxHEIGHT of the map in tiles")
+    parser.add_argument("--density", type=float, default=0.15, help="fraction of solid tiles")
+    parser.add_argument("--coins", type=int, default=100)
+    parser.add_argument("--spikes", type=int, default=50)
+    parser.add_argument("--ladders", type=int, default=50)
+    parser.add_argument("--pink-guys", type=int, default=10)
+    parser.add_argument("--trash-monsters", type=int, default=10)
+    parser.add_argument("--tooth-walkers", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    width, height = parse_size(arguments.size)
+    data = generate_level(width, height, arguments.density, arguments.coins, arguments.spikes, arguments.ladders,
+                          {"Pink Guy": arguments.pink_guys,
+                           "Trash Monster": arguments.trash_monsters,
+                           "Tooth Walker": arguments.tooth_walkers},
+                          arguments.seed)
+    write_level(data, arguments.output)
+    print("Wrote a %dx%d level with %d enemies to %s" % (width, height, len(data["enemies"]), arguments.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import pygame as pg
 import pygame.freetype as ft
+from modules.inputstate import input_state
 from dev_modules.editorscenes import *
 
 """
@@ -34,6 +35,7 @@ def main() -> None:
     while run:
         # Directs the scene to process events in the queue, update its state and render onto the window
         manager.scene.handle_events()
+        input_state.sample()
         manager.scene.update()
         manager.scene.render(window)
 
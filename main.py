@@ -1,5 +1,20 @@
+import time
+STARTUP_TIME = time.perf_counter()
+
 import pygame as pg
-from modules.gamescene import SceneManager, TitleScene
+from modules.runtime import StartupTrace, init_display, init_audio, get_font, wait_for_event, STARTUP_IMAGES, \
+    STARTUP_SOUNDS, IDLE_WAKE_INTERVAL, MUSIC_WAKE_INTERVAL
+from modules.assets import mount_configured_archive, AssetPreloader
+from modules.libraries import Library
+from modules.gamescene import Scene, SceneManager, TitleScene, GameScene
+from modules.sound import music_player
+from modules.leaderboard import score_submitter
+from modules.telemetry import telemetry, TelemetryOverlay
+from modules.counters import counters
+from modules.profiler import profiler
+from modules.gcpolicy import gc_policy
+from modules.inputstate import input_state
+from modules.quality import quality_governor
 
 """
 * =============================================================== *
@@ -13,35 +28,121 @@ from modules.gamescene import SceneManager, TitleScene
 def main() -> None:
     """Initialises PyGame and invokes all the necessary functions and modules to run the game"""
 
-    # Initialise PyGame
+    # Records the time taken by each phase of startup if TOWER_STARTUP_TRACE is set
+    startup_trace = StartupTrace(STARTUP_TIME)
+    startup_trace.mark("imports")
+
+    # Serve assets from assets.pak in a frozen build, or from the loose files otherwise
+    mount_configured_archive()
+
+    # Decode the images used at startup on worker threads while the window is being opened
+    preloader = AssetPreloader()
+    preloader.preload(STARTUP_IMAGES)
+    startup_trace.mark("assets")
+
+    # Initialise window before anything else so that the player sees it as early as possible
+    window = init_display((800, 600), "The Tower")
+    startup_trace.mark("display")
+
+    # Initialise sound. Sounds can only be decoded once the mixer is up.
+    init_audio()
+    preloader.preload(STARTUP_SOUNDS)
+    startup_trace.mark("audio")
+
+    # Every surface conversion below needs the decoded images
+    preloader.join()
+    Scene.load_sound_library()
+    startup_trace.mark("decoding")
+
+    # Initialise the remaining PyGame modules
     pg.init()
+    get_font()
+    startup_trace.mark("fonts")
+
+    # Load the sprites and sounds shared by all entities
+    Library.load()
+    startup_trace.mark("library")
+
+    # Send any highscores that could not be sent before the game was last closed
+    score_submitter.start()
 
-    # Initialise window
-    window = pg.display.set_mode((800, 600))
-    pg.display.set_caption("The Tower", "The Tower")
+    # Keeps the collector from scanning the assets loaded so far, which live for the whole session
+    gc_policy.freeze()
 
     # Initialise clock
     clock = pg.time.Clock()
 
+    # Times each phase of every frame if TOWER_TELEMETRY is set, or once F3 is pressed
+    telemetry_overlay = TelemetryOverlay(telemetry)
+
     # Initialise scene manager with TitleScene set as the initial scene
     manager = SceneManager(TitleScene())
+    startup_trace.mark("title scene")
 
     # Game loop runs when this is true
     run = True
 
+    # Whether the previous frame was spent playing, rather than in a menu or a transition
+    is_playing = False
+
     # -------------------- GAME LOOP -------------------- #
     while run:
-        """Delta time refers to the time difference between the 
+        # Static scenes that have not changed are not redrawn, so the loop sleeps until an event arrives
+        if manager.scene.is_static and not manager.scene.is_dirty and not telemetry_overlay.is_visible:
+            wait_for_event(MUSIC_WAKE_INTERVAL if music_player.is_switching() else IDLE_WAKE_INTERVAL)
+            # The time spent asleep is not counted as part of the next frame
+            clock.tick()
+
+        """Delta time refers to the time difference between the
         previous frame that was drawn and the current frame"""
         delta_time = clock.tick(60) / 1000
+        telemetry.begin_frame()
+
+        # Adjusts the quality to the time taken by the previous frame, not counting the wait, if it was gameplay
+        if is_playing:
+            quality_governor.record_frame(clock.get_rawtime())
+        is_playing = isinstance(manager.scene, GameScene)
+
+        # The profiler only keeps samples taken during gameplay, if it is recording
+        profiler.set_scope(is_playing)
+
+        # Any event may change a static scene, whether or not the loop slept waiting for it
+        if pg.event.peek().type != pg.NOEVENT:
+            manager.scene.is_dirty = True
 
         # Directs the scene to process events in the queue, update its state and render onto the window
         manager.scene.handle_events()
+        input_state.sample()
+        telemetry.lap("events")
         manager.scene.update(delta_time)
-        manager.scene.render(window)
+        telemetry.lap("update")
+        is_redrawn = not manager.scene.is_static or manager.scene.is_dirty or telemetry_overlay.is_visible
+        if is_redrawn:
+            manager.scene.render(window)
+            manager.scene.is_dirty = False
+        telemetry.lap("render")
+
+        # Draws the telemetry overlay over the scene, if it is shown
+        telemetry_overlay.handle_hotkeys()
+        profiler.handle_hotkeys()
+        quality_governor.handle_hotkeys()
+        telemetry_overlay.update(delta_time)
+        telemetry_overlay.render(window)
+        telemetry.lap("overlay")
+
+        # Carries on with any switch of music whose track has been read
+        music_player.update()
 
         # Updates the window to reflect the current rendered image
-        pg.display.update()
+        if is_redrawn:
+            pg.display.update()
+        telemetry.lap("present")
+        telemetry.end_frame()
+        counters.end_frame()
+
+        if not startup_trace.is_reported:
+            startup_trace.mark("first frame")
+            startup_trace.report()
     # -------------------- END GAME LOOP ---------------- #
     # Quit PyGame
     pg.quit()
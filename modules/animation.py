@@ -1,11 +1,15 @@
 import os
 import pygame as pg
 from pygame.surface import Surface
+from .assets import load_image, list_asset_directory
 from .component import Component
 from .entitystate import Direction
+from .counters import counters, SURFACES_ALLOCATED
 
 
 class Animation:
+    __slots__ = ("images", "current_index", "frame_counter", "FRAMES_PER_UPDATE", "animation_length",
+                 "flipped_images")
 
     def __init__(self, images, speed=5):
         self.images = images
@@ -13,6 +17,7 @@ class Animation:
         self.frame_counter = 0
         self.FRAMES_PER_UPDATE = speed
         self.animation_length = len(self.images)
+        self.flipped_images = None          # The images facing the other way, see get_flipped_image_at()
 
     @staticmethod
     def of_entire_sheet(sprite_sheet, flip=False, speed=5):
@@ -28,17 +33,26 @@ class Animation:
     def of_directory(directory_path, speed=5):
         REQUIRED_SUFFIX = ".png"
         images = []
-        filenames = os.listdir(directory_path)
+        filenames = list_asset_directory(directory_path)
         filenames.sort()
         for filename in filenames:
             image_path = os.path.join(directory_path, filename)
             if image_path.endswith(REQUIRED_SUFFIX):
-                images.append(pg.image.load(image_path))
+                images.append(load_image(image_path))
         return Animation(images, speed)
 
     def get_image_at(self, index):
         return self.images[index]
 
+    def get_flipped_image_at(self, index):
+        """Returns the image at the index flipped horizontally. The images are only flipped once, and
+        then shared by every entity using this Animation."""
+        if self.flipped_images is None:
+            self.flipped_images = [pg.transform.flip(image, True, False) for image in self.images]
+            if __debug__ and counters.enabled:
+                counters.add(SURFACES_ALLOCATED, len(self.flipped_images))
+        return self.flipped_images[index]
+
     def get_next_image(self) -> Surface:
         self.frame_counter = (self.frame_counter + 1) % self.FRAMES_PER_UPDATE
         if self.frame_counter is 0:
@@ -51,6 +65,7 @@ class TerrainAnimationComponent(Component):
     the state of the sprite. This should be used for terrain
     sprites, which do not have EntityState as an attribute,
     and only has a single animation sequence."""
+    __slots__ = ("animation", "terrain_sprite")
 
     def __init__(self, terrain_sprite, animation: Animation):
         super().__init__()
@@ -64,6 +79,7 @@ class TerrainAnimationComponent(Component):
 class EntityAnimationComponent(Component):
     """Handles animation of entities, whose animation
     sequence is dependent on its current state."""
+    __slots__ = ("entity", "animations", "current_state", "current_animation")
 
     def __init__(self, entity, animations: dict):
         """Creates an Entity Animation Component.
@@ -94,4 +110,6 @@ class EntityAnimationComponent(Component):
         next_image = self.current_animation.get_next_image()
         if self.entity.get_direction() is Direction.LEFT:
             next_image = pg.transform.flip(next_image, True, False)
+            if __debug__ and counters.enabled:
+                counters.add(SURFACES_ALLOCATED, 1)
         self.entity.image = next_image
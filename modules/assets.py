@@ -0,0 +1,298 @@
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import pygame as pg
+import pygame.freetype as ft
+
+"""
+* =============================================================== *
+* This module is the single point through which the game reads    *
+* its assets. If an asset archive has been mounted, files are     *
+* served from memory-mapped slices of the archive; otherwise they *
+* are read from the loose files under assets/.                    *
+* =============================================================== *
+
+ASSET ARCHIVE
+-------------------------
+The archive is built from the assets/ directory by dev_modules/archivebuilder.py and has the layout:
+    magic               ->          8 bytes, ARCHIVE_MAGIC
+    index length        ->          unsigned 32-bit little-endian integer
+    index               ->          UTF-8 JSON object mapping each path (e.g. "assets/levels/level1.json")
+                                    to the [offset, length] of its contents within the archive
+    data                ->          the contents of every file, back to back
+
+Paths are always given relative to the root of the repository with forward slashes, exactly as
+they would be passed to open().
+
+mount_configured_archive() is called by main() before anything is loaded. A frozen build mounts assets.pak
+from the directory of its executable, wherever it is launched from, as setup.py builds the archive and ships
+it there. Any build mounts the archive at the path in the TOWER_ASSET_ARCHIVE environment variable instead. Otherwise, the loose files are used, which is the normal setup during development,
+so that an archive built once and left in the working directory never hides later changes to assets/.
+Tools that are asked to use the archive, such as the benchmark, call mount_archive() directly.
+
+CACHING AND PRELOADING
+-------------------------
+Decoded images and sounds are cached by path, so every caller of load_image() and load_sound() with the
+same path shares a single Surface or Sound. Callers must copy an image before drawing on it.
+
+AssetPreloader fills these caches ahead of time by decoding files on a pool of worker threads. Decoding
+does not need the display, but any convert() or convert_alpha() does, so the preloader must be joined
+before those calls are made, which happens naturally as they are made on surfaces returned by
+load_image(). Sounds can only be decoded once the mixer has been initialised.
+"""
+
+ARCHIVE_MAGIC = b"TWRPAK01"
+ARCHIVE_HEADER = struct.Struct("<8sI")
+DEFAULT_ARCHIVE_PATH = "assets.pak"
+ARCHIVE_PATH_VARIABLE = "TOWER_ASSET_ARCHIVE"
+
+IMAGE_SUFFIXES = (".png", ".gif", ".jpg", ".bmp")
+SOUND_SUFFIXES = (".ogg", ".wav")
+
+_archive = None
+_image_cache = {}
+_sound_cache = {}
+
+
+class ArchiveFile(io.RawIOBase):
+    """Read-only file-like view of a single file in the archive. Reads are served
+    straight from the memory-mapped archive without copying the whole file."""
+
+    def __init__(self, view: memoryview, name: str):
+        super().__init__()
+        self.view = view
+        self.name = name
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        length = min(len(buffer), len(self.view) - self.position)
+        buffer[:length] = self.view[self.position:self.position + length]
+        self.position += length
+        return length
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = len(self.view) + offset
+        self.position = max(0, min(self.position, len(self.view)))
+        return self.position
+
+    def tell(self):
+        return self.position
+
+
+class AssetArchive:
+    """A memory-mapped asset archive"""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        with open(filepath, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+
+        magic, index_length = ARCHIVE_HEADER.unpack_from(self.mmap, 0)
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError(filepath + " is not an asset archive")
+        index_start = ARCHIVE_HEADER.size
+        self.index = json.loads(bytes(self.view[index_start:index_start + index_length]).decode("utf-8"))
+
+        # Every directory that contains a file, mapped to the names of its immediate children
+        self.directories = {}
+        for path in self.index:
+            parent, _, name = path.rpartition("/")
+            while parent:
+                self.directories.setdefault(parent, set()).add(name)
+                parent, _, name = parent.rpartition("/")
+
+    def contains(self, path: str) -> bool:
+        return path in self.index or path in self.directories
+
+    def is_directory(self, path: str) -> bool:
+        return path in self.directories
+
+    def get_view(self, path: str) -> memoryview:
+        """Returns a zero-copy slice of the archive holding the contents of the file"""
+        try:
+            offset, length = self.index[path]
+        except KeyError:
+            raise FileNotFoundError(path) from None
+        return self.view[offset:offset + length]
+
+    def open(self, path: str) -> ArchiveFile:
+        return ArchiveFile(self.get_view(path), path)
+
+    def list_directory(self, path: str) -> list:
+        try:
+            return list(self.directories[path])
+        except KeyError:
+            raise FileNotFoundError(path) from None
+
+
+def normalise_path(path: str) -> str:
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def get_default_archive_path() -> str:
+    """Returns the path of assets.pak, which is next to the executable of a frozen build, and in the working
+    directory otherwise"""
+    if getattr(sys, "frozen", False):
+        return os.path.join(os.path.dirname(sys.executable), DEFAULT_ARCHIVE_PATH)
+    return DEFAULT_ARCHIVE_PATH
+
+
+def mount_archive(filepath=None) -> bool:
+    """Serves assets from the given archive, or the default one if no path is given.
+    Returns False, leaving the loose files in use, if the archive does not exist."""
+    global _archive
+    if filepath is None:
+        filepath = os.environ.get(ARCHIVE_PATH_VARIABLE) or get_default_archive_path()
+    if not os.path.isfile(filepath):
+        return False
+    _archive = AssetArchive(filepath)
+    return True
+
+
+def mount_configured_archive() -> bool:
+    """Mounts the archive if the game is a frozen build or TOWER_ASSET_ARCHIVE is set. Returns whether an
+    archive was mounted."""
+    filepath = os.environ.get(ARCHIVE_PATH_VARIABLE)
+    if filepath is None and not getattr(sys, "frozen", False):
+        return False
+    return mount_archive(filepath)
+
+
+def get_archive():
+    """Returns the mounted AssetArchive, or None if the loose files are in use"""
+    return _archive
+
+
+def open_asset(path: str, mode="rb"):
+    """Opens an asset for reading, in binary mode unless mode is "r" """
+    if _archive is None:
+        return open(path, mode)
+    raw_file = _archive.open(normalise_path(path))
+    if "b" in mode:
+        return raw_file
+    return io.TextIOWrapper(io.BufferedReader(raw_file), encoding="utf-8")
+
+
+def asset_exists(path: str) -> bool:
+    if _archive is None:
+        return os.path.exists(path)
+    return _archive.contains(normalise_path(path))
+
+
+def is_asset_directory(path: str) -> bool:
+    if _archive is None:
+        return os.path.isdir(path)
+    return _archive.is_directory(normalise_path(path))
+
+
+def list_asset_directory(path: str) -> list:
+    if _archive is None:
+        return os.listdir(path)
+    return _archive.list_directory(normalise_path(path))
+
+
+def load_json(path: str):
+    with open_asset(path, "r") as f:
+        return json.load(f)
+
+
+def decode_image(path: str) -> pg.Surface:
+    if _archive is None:
+        return pg.image.load(path)
+    return pg.image.load(open_asset(path), path)
+
+
+def decode_sound(path: str) -> pg.mixer.Sound:
+    if _archive is None:
+        return pg.mixer.Sound(path)
+    return pg.mixer.Sound(file=open_asset(path))
+
+
+def load_image(path: str) -> pg.Surface:
+    """Returns the decoded image, which is shared with every other caller that loads the same path"""
+    path = normalise_path(path)
+    image = _image_cache.get(path)
+    if image is None:
+        image = decode_image(path)
+        _image_cache[path] = image
+    return image
+
+
+def load_sound(path: str) -> pg.mixer.Sound:
+    """Returns the decoded sound, which is shared with every other caller that loads the same path"""
+    path = normalise_path(path)
+    sound = _sound_cache.get(path)
+    if sound is None:
+        sound = decode_sound(path)
+        _sound_cache[path] = sound
+    return sound
+
+
+def clear_caches():
+    _image_cache.clear()
+    _sound_cache.clear()
+
+
+def expand_asset_paths(paths) -> list:
+    """Replaces every directory in the given paths with the files directly inside it"""
+    expanded_paths = []
+    for path in paths:
+        if is_asset_directory(path):
+            for filename in sorted(list_asset_directory(path)):
+                expanded_paths.append(normalise_path(path + "/" + filename))
+        else:
+            expanded_paths.append(normalise_path(path))
+    return expanded_paths
+
+
+class AssetPreloader:
+    """Decodes images and sounds on a pool of worker threads and stores them in the
+    caches used by load_image() and load_sound()"""
+
+    def __init__(self, max_workers=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asset-loader")
+        self.futures = []
+
+    def preload(self, paths):
+        """Starts decoding the given files, and the files directly inside the given directories.
+        Files that are neither images nor sounds, or are already cached, are skipped."""
+        for path in expand_asset_paths(paths):
+            if path.endswith(IMAGE_SUFFIXES) and path not in _image_cache:
+                self.futures.append(self.executor.submit(self.decode_into_cache, path, decode_image, _image_cache))
+            elif path.endswith(SOUND_SUFFIXES) and path not in _sound_cache:
+                self.futures.append(self.executor.submit(self.decode_into_cache, path, decode_sound, _sound_cache))
+
+    @staticmethod
+    def decode_into_cache(path, decode, cache):
+        cache[path] = decode(path)
+
+    def join(self):
+        """Waits for every file to be decoded, and raises the first error encountered, if any"""
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.futures = []
+            self.executor.shutdown()
+
+
+def load_font(path: str, size: int) -> ft.Font:
+    if _archive is None:
+        return ft.Font(path, size)
+    return ft.Font(open_asset(path), size)
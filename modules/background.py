@@ -1,5 +1,6 @@
 import pygame as pg
 from .camera import Camera
+from .assets import load_image
 
 """
 * =============================================================== *
@@ -25,7 +26,7 @@ class StaticBackground:
     """Handles the rendering of a static, unmoving background, which does not change with the camera position"""
     def __init__(self, filepath: str, surface: pg.Surface):
         self.surface = surface
-        self.image = pg.image.load(filepath).convert_alpha()
+        self.image = load_image(filepath).convert_alpha()
         # scales the image to fill the screen
         if self.image.get_width() / self.image.get_height() > surface.get_width() / surface.get_height():
             self.background = pg.transform.scale(self.image,
@@ -54,7 +55,7 @@ class ParallaxBackground:
     """Handles the rendering of a background that moves with the camera"""
     def __init__(self, filepath: str, surface: pg.Surface):
         self.surface = surface
-        self.image = pg.image.load(filepath).convert_alpha()
+        self.image = load_image(filepath).convert_alpha()
         self.background = pg.transform.scale(self.image,
             (self.image.get_width() * int(surface.get_height() / self.image.get_height()), surface.get_height()))
         
@@ -83,7 +84,7 @@ class ScrollingBackground:
     """Handles the rendering of a background that automatically scrolls"""
     def __init__(self, filepath: str, surface: pg.Surface):
         self.surface = surface
-        self.image = pg.image.load(filepath).convert_alpha()
+        self.image = load_image(filepath).convert_alpha()
         self.background = pg.transform.scale(self.image,
                                              (self.image.get_width() * int(
                                                  surface.get_height() / self.image.get_height()), surface.get_height()))
@@ -1,31 +1,48 @@
 import pygame as pg
 from .animation import Animation, TerrainAnimationComponent
 from .entitystate import GameEvent, EntityState, Direction, EntityMessage
-from .spritesheet import SpriteSheet
 from .textureset import TerrainType
+from .libraries import Library
+from .sound import sound_bank
+from .pools import ObjectPool
+from .inputstate import input_state
 
 """
 * =============================================================== *
 * This module contains Blocks, which are representations of the   *
-* individual tiles of the game map.								  *
+* interactive objects of the game map, such as coins and spikes.  *
+* Static tiles are stored in the Tilemap of leveljson.py instead. *
 * =============================================================== *
 
+POOLING
+-------------------------
+Blocks are acquired from the pool of their class in block_pools, and released back to it when their level
+is unloaded. Every Block has a reset() method taking the same arguments as its constructor, which must
+set every attribute that the Block changes while it is played, so that a reused Block is as new.
+
+SNAPSHOTS
+-------------------------
+Snapshots of the map save the position of every Block and the groups it is in. Blocks with any other
+attribute that changes while they are played list it in STATE_ATTRIBUTES, so that it is saved as well.
+
 """
 
 
 class Block(pg.sprite.Sprite):
     BLOCK_SIZE = 25
+    STATE_ATTRIBUTES = ()
 
     def __init__(self, type_object: TerrainType, x, y):
         super().__init__()
-        self.image = pg.transform.scale(type_object.image.convert_alpha(),
-                                        (int(type_object.block_width * Block.BLOCK_SIZE),
-                                         int(type_object.block_height * Block.BLOCK_SIZE))
-                                        )
-        self.rect = pg.Rect(x + int(type_object.block_pos_x * Block.BLOCK_SIZE),
-                            y + int(type_object.block_pos_y * Block.BLOCK_SIZE),
-                            int(type_object.block_width * Block.BLOCK_SIZE),
-                            int(type_object.block_height * Block.BLOCK_SIZE))
+        self.rect = pg.Rect(0, 0, 0, 0)
+        self.reset(type_object, x, y)
+
+    def reset(self, type_object: TerrainType, x, y):
+        self.image = type_object.get_scaled_image(Block.BLOCK_SIZE)
+        self.rect.update(x + int(type_object.block_pos_x * Block.BLOCK_SIZE),
+                         y + int(type_object.block_pos_y * Block.BLOCK_SIZE),
+                         int(type_object.block_width * Block.BLOCK_SIZE),
+                         int(type_object.block_height * Block.BLOCK_SIZE))
         self.is_spike = False
 
 
@@ -33,8 +50,8 @@ class SpikeBlock(Block):
     """Represents a block that damages the player
     if the player comes into contact with it"""
 
-    def __init__(self, type_object, x, y):
-        super().__init__(type_object, x, y)
+    def reset(self, type_object, x, y):
+        super().reset(type_object, x, y)
         self.is_spike = True
 
     def update(self, player, *args):
@@ -58,7 +75,7 @@ class GatewayBlock(Block):
     def __init__(self, type_object, x, y):
         super().__init__(type_object, x, y)
 
-    def update(self, player, terrain_group):
+    def update(self, player, game_map):
         """Checks if the player has collided with itself, and initiates a level transition if there is a collision"""
         if player.rect.collidepoint(self.rect.centerx, self.rect.centery):
             pg.event.post(
@@ -70,12 +87,14 @@ class GatewayBlock(Block):
 
 # Has potential for many variations
 class FallingBlock(Block):
-    def __init__(self, type_object, x, y):
-        super().__init__(type_object, x, y)
+    STATE_ATTRIBUTES = ("fallen",)
+
+    def reset(self, type_object, x, y):
+        super().reset(type_object, x, y)
         self.vel = 1
         self.fallen = False
 
-    def update(self, player, terrain_group):
+    def update(self, player, game_map):
         if (self.rect.top == player.rect.bottom) and not self.fallen \
                 and (self.rect.left < player.rect.left < self.rect.right
                      or self.rect.left < player.rect.right < self.rect.right):
@@ -86,15 +105,15 @@ class FallingBlock(Block):
             player.rect.bottom = self.rect.top
 
         # If the FallingBlock falls on a Block
-        for colliding_sprite in pg.sprite.spritecollide(self, terrain_group, False):
-                if colliding_sprite.rect.top < self.rect.bottom < colliding_sprite.rect.bottom:
-                    self.rect.bottom = colliding_sprite.rect.top
+        for colliding_rect in game_map.get_colliding_rects(self.rect, ignored_object=self):
+                if colliding_rect.top < self.rect.bottom < colliding_rect.bottom:
+                    self.rect.bottom = colliding_rect.top
                     self.fallen = True
 
 
 class MovingBlock(Block):
-    def __init__(self, type_object, x, y):
-        super().__init__(type_object, x, y)
+    def reset(self, type_object, x, y):
+        super().reset(type_object, x, y)
         self.vel = 1
 
     def update(self, player, *args):
@@ -111,11 +130,11 @@ class MovingBlock(Block):
                 self.rect.x += self.vel
                 player.rect.x = self.rect.x
 
-            if pg.key.get_pressed()[pg.K_UP]:
+            if input_state.is_held(pg.K_UP):
                 self.rect.y -= self.vel
                 player.rect.bottom = self.rect.top
 
-            elif pg.key.get_pressed()[pg.K_DOWN]:
+            elif input_state.is_held(pg.K_DOWN):
                 self.rect.y += self.vel
                 player.rect.bottom = self.rect.top
 
@@ -124,11 +143,15 @@ class Coin(Block):
     """Represents a coin which heals the player when picked up"""
 
     def __init__(self, type_object, x, y):
+        # Every coin animates on its own, but the frames of the animation are shared
+        self.animation_component = TerrainAnimationComponent(self, Animation(Library.coin_images))
+        self.coin_sound = sound_bank.get("assets/sound/sfx/coin.ogg", voice_limit=3)
         super().__init__(type_object, x, y)
-        spritesheet = SpriteSheet("assets/textures/environment/animated/ruby.png", 1, 16)
-        coin_animation = Animation.of_entire_sheet(spritesheet)
-        self.animation_component = TerrainAnimationComponent(self, coin_animation)
-        self.coin_sound = pg.mixer.Sound("assets/sound/sfx/coin.ogg")
+
+    def reset(self, type_object, x, y):
+        super().reset(type_object, x, y)
+        self.animation_component.animation.current_index = 0
+        self.animation_component.animation.frame_counter = 0
 
     def update(self, entity, *args):
         """Checks if the player has collided with the coin, healing the player if there is a collision,
@@ -141,12 +164,12 @@ class Coin(Block):
 
 
 class LadderBlock(Block):
-    def __init__(self, type_object, x, y):
-        super().__init__(type_object, x, y)
+    def reset(self, type_object, x, y):
+        super().reset(type_object, x, y)
         self.mid_rect = pg.Rect(self.rect.centerx - 0.5, self.rect.top, 1, self.rect.height)
 
     def update(self, entity, *args):
-        current_keys = pg.key.get_pressed()
+        current_keys = input_state.held
         if self.mid_rect.colliderect(entity.rect) and entity.state != EntityState.JUMPING:
             if current_keys[pg.K_UP] or current_keys[pg.K_DOWN]:
                 # Snap player to middle of ladder when entering HANGING state
@@ -155,15 +178,17 @@ class LadderBlock(Block):
 
 
 class PushableBlock(Block):
-    def __init__(self, type_object, x, y):
-        super().__init__(type_object, x, y)
+    STATE_ATTRIBUTES = ("y_velocity",)
+
+    def reset(self, type_object, x, y):
+        super().reset(type_object, x, y)
         self.y_velocity = 1
         self.gravity = 1
 
-    # A pushable block reacts to gravity, hence it interacts with both the player and terrain group
+    # A pushable block reacts to gravity, hence it interacts with both the player and the terrain of the map
     # In future, possible to make one superclass for all blocks that are affected by gravity and collides with other
     # blocks
-    def update(self, player, terrain_group):
+    def update(self, player, game_map):
 
         # If player is pushing the block
         if (self.rect.left == player.rect.right or self.rect.right == player.rect.left) \
@@ -178,20 +203,26 @@ class PushableBlock(Block):
             # The broke method is to ignore this since it is slightly discernible at normal speeds of 30 - 60 fps
             self.rect.x += (self.rect.centerx - player.rect.centerx) / 20
 
-        for colliding_sprite in pg.sprite.spritecollide(self, terrain_group, False):
-            if colliding_sprite.rect.left < self.rect.left < colliding_sprite.rect.right:
-                self.rect.left = colliding_sprite.rect.right
-            if colliding_sprite.rect.left < self.rect.right < colliding_sprite.rect.right:
-                self.rect.right = colliding_sprite.rect.left
+        for colliding_rect in game_map.get_colliding_rects(self.rect, ignored_object=self):
+            if colliding_rect.left < self.rect.left < colliding_rect.right:
+                self.rect.left = colliding_rect.right
+            if colliding_rect.left < self.rect.right < colliding_rect.right:
+                self.rect.right = colliding_rect.left
 
         self.y_velocity += self.gravity
         self.rect.y += self.y_velocity
         isFloating = True
-        for colliding_sprite in pg.sprite.spritecollide(self, terrain_group, False):
-            if colliding_sprite.rect.top < self.rect.top < colliding_sprite.rect.bottom:
-                self.rect.top = colliding_sprite.rect.bottom
+        for colliding_rect in game_map.get_colliding_rects(self.rect, ignored_object=self):
+            if colliding_rect.top < self.rect.top < colliding_rect.bottom:
+                self.rect.top = colliding_rect.bottom
                 self.y_velocity = 0
-            if colliding_sprite.rect.top < self.rect.bottom < colliding_sprite.rect.bottom:
+            if colliding_rect.top < self.rect.bottom < colliding_rect.bottom:
                 isFloating = False
-                self.rect.bottom = colliding_sprite.rect.top
+                self.rect.bottom = colliding_rect.top
                 self.y_velocity = 0
+
+
+# The pool of every class of Block, from which Maps acquire their interactive objects
+block_pools = {block_class: ObjectPool(block_class.__name__, block_class, block_class.reset)
+               for block_class in (SpikeBlock, GatewayBlock, FallingBlock, MovingBlock, Coin, LadderBlock,
+                                   PushableBlock)}
@@ -10,6 +10,8 @@ import pygame as pg
 
 
 class Camera:
+    __slots__ = ("boundaries", "camera_size", "rect")
+
     def __init__(self, camera_size, map_rect):
         self.boundaries = map_rect
 
@@ -1,12 +1,17 @@
 import pygame as pg
 from pygame.surface import Surface
 from .entitystate import GameEvent, EntityState, EntityMessage
+from .counters import counters, BLITS, SURFACES_ALLOCATED
 
 
 class Component:
     """Components determine the behavior of the Entity
     which contains it. Most Components are reusable, as
-    they do not contain information on state."""
+    they do not contain information on state.
+
+    Components are created for every Entity and Block, so
+    each subclass declares its attributes in __slots__."""
+    __slots__ = ()
 
     def __init__(self):
         pass
@@ -21,6 +26,8 @@ class Component:
 
 
 class SoundComponent(Component):
+    __slots__ = ("sounds",)
+
     def __init__(self, sounds):
         super().__init__()
         self.sounds = sounds
@@ -34,6 +41,7 @@ class SoundComponent(Component):
 
 class DeathComponent(Component):
     """Handles the situations in which an entity dies."""
+    __slots__ = ("entity", "is_game_over")
 
     def __init__(self, entity, is_game_over=True):
         super().__init__()
@@ -57,6 +65,8 @@ class DeathComponent(Component):
 
 class HealthComponent(Component):
     """Handles the situations in which a player would take damage in health."""
+    __slots__ = ("entity", "last_collide_time", "MAX_HEALTH", "health", "IMMUNITY_TIME", "ENEMY_DAMAGE",
+                 "SPIKE_DAMAGE", "COIN_REPLENISHMENT")
 
     def __init__(self, entity):
         super().__init__()
@@ -101,24 +111,8 @@ class HealthComponent(Component):
         return self.MAX_HEALTH
 
 
-class EnemyCombatComponent(Component):
-    """Handles the interactions between a player and the enemy."""
-
-    def __init__(self, enemy):
-        self.enemy = enemy
-
-    def update(self, player):
-        has_collided_with_player = self.enemy.rect.colliderect(player.rect)
-        if has_collided_with_player:
-            is_stomped_by_player = player.rect.bottom < self.enemy.rect.centery \
-                                   and player.y_velocity > 0
-            if is_stomped_by_player:
-                self.enemy.message(EntityMessage.DIE)
-            else:
-                player.message(EntityMessage.ENEMY_HIT)
-
-
 class RenderComponent(Component):
+    __slots__ = ()
 
     def __init__(self):
         super().__init__()
@@ -128,3 +122,6 @@ class RenderComponent(Component):
         rendered_image = entity.image.subsurface(entity.blit_rect)
         blit_destination = (entity.rect.x - camera.rect.x, entity.rect.y - camera.rect.y)
         game_display.blit(rendered_image, blit_destination)
+        if __debug__ and counters.enabled:
+            counters.add(SURFACES_ALLOCATED, 1)
+            counters.add(BLITS, 1)
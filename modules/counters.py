@@ -0,0 +1,102 @@
+import atexit
+import os
+import sys
+from collections import deque
+
+"""
+* =============================================================== *
+* This module contains the Counters registry, which counts work   *
+* done on the hot paths of every frame, such as collision tests,  *
+* blits and surface allocations.                                  *
+* =============================================================== *
+
+COUNTING
+-------------------------
+Every increment is guarded so that it costs nothing when counting is off:
+    if __debug__ and counters.enabled:
+        counters.add("blits", 1)
+
+When the game is run with python -O, as in the frozen build, the whole statement is removed by the
+compiler. Otherwise it costs a single attribute check while disabled. Set the TOWER_COUNTERS
+environment variable to enable counting.
+
+The counts of the last frame are shown in a panel on the HUD. begin_level() closes the totals of the
+previous level and prints them to stderr, as does exiting the game.
+"""
+
+COUNTERS_VARIABLE = "TOWER_COUNTERS"
+
+COLLISION_CALLS = "collision calls"
+SPRITES_TESTED = "sprites tested"
+BLITS = "blits"
+SURFACES_ALLOCATED = "surfaces allocated"
+INTERACTIVE_UPDATES = "interactive updates"
+
+LEVEL_HISTORY = 24           # Summaries of older levels are dropped, so that long sessions do not grow
+
+
+class LevelCounts:
+    """The totals and per-frame maximum of every counter over a single level"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.frame_count = 0
+        self.totals = {}
+        self.maximums = {}
+
+    def add_frame(self, frame_counts: dict):
+        self.frame_count += 1
+        for name, count in frame_counts.items():
+            self.totals[name] = self.totals.get(name, 0) + count
+            self.maximums[name] = max(self.maximums.get(name, 0), count)
+
+    def to_dict(self) -> dict:
+        return {"level": self.name,
+                "frames": self.frame_count,
+                "mean": {name: total / max(1, self.frame_count) for name, total in self.totals.items()},
+                "max": dict(self.maximums)}
+
+
+class Counters:
+    """Counts collected over the current frame and the current level"""
+
+    def __init__(self, enabled=None):
+        self.enabled = bool(os.environ.get(COUNTERS_VARIABLE)) if enabled is None else enabled
+        self.frame_counts = {}
+        self.last_frame_counts = {}
+        self.level_counts = LevelCounts("startup")
+        self.level_summaries = deque(maxlen=LEVEL_HISTORY)
+        if self.enabled:
+            atexit.register(self.end_level)
+
+    def add(self, name: str, amount: int):
+        self.frame_counts[name] = self.frame_counts.get(name, 0) + amount
+
+    def end_frame(self):
+        """Closes the counts of the current frame, which are kept until the end of the next one"""
+        if not self.enabled:
+            return
+        self.level_counts.add_frame(self.frame_counts)
+        self.last_frame_counts = self.frame_counts
+        self.frame_counts = {}
+
+    def begin_level(self, name: str):
+        """Closes the counts of the previous level and starts counting a new one"""
+        if not self.enabled:
+            return
+        self.end_level()
+        self.level_counts = LevelCounts(name)
+
+    def end_level(self):
+        summary = self.level_counts.to_dict()
+        if summary["frames"] == 0:
+            return
+        self.level_summaries.append(summary)
+        print("[counters] %s: %d frames" % (summary["level"], summary["frames"]), file=sys.stderr)
+        for name in sorted(summary["mean"]):
+            print("[counters]     %-20s %10.1f mean %8d max per frame" % (name, summary["mean"][name],
+                                                                           summary["max"][name]), file=sys.stderr)
+
+
+# The counters shared by the whole game
+counters = Counters()
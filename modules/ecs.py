@@ -0,0 +1,370 @@
+from .entitystate import EntityState, Direction, EntityMessage
+from .physics import is_colliding_from_below, is_colliding_from_above, is_colliding_from_right, \
+    is_colliding_from_left
+from .counters import counters, COLLISION_CALLS, SPRITES_TESTED, BLITS
+from .quality import quality_governor, get_area_around, NEAR_AREA
+
+"""
+* =============================================================== *
+* This module contains the entity-component-system core, which    *
+* stores the components of entities in parallel lists, and the    *
+* systems that update them one aspect at a time.                  *
+* =============================================================== *
+
+ARCHETYPES
+-------------------------
+An Archetype stores every entity with the same set of components. Each component is a column, i.e. a
+list with one value per entity, so that the components of an entity are at the same index of every
+column and the entity itself is only that index. Entities are never objects of their own, so an
+entity costs one slot per column rather than an object per component.
+
+Entities keep the order in which they were added. Removing entities compacts every column in a single
+pass, so indices only change between frames, when the World removes the dead entities.
+
+save() copies the columns, and restore() brings the entities back to that point, including those that
+have been removed since, as used by the snapshots of modules/snapshot.py.
+
+SYSTEMS
+-------------------------
+A System updates a single aspect of every active entity in one loop over the columns it needs. The World
+runs its systems in order, which for enemies is:
+    AISystem -> GravitySystem -> CombatSystem -> RigidBodySystem -> AnimationSystem -> DeathSystem
+
+and the RenderSystem draws the entities separately.
+
+MESSAGES
+-------------------------
+Systems never call one another. A system that needs another to react to something, such as the rigid
+body turning an enemy around at a wall, or combat killing a stomped enemy, posts an EntityMessage to the
+MessageQueue of the World. The queue is dispatched in a batch to every system after each system has run,
+so that messages take effect before the next system, as they did when components called one another.
+"""
+
+
+class Archetype:
+    """The components of a set of entities that all have the same components, stored as one list per
+    component"""
+
+    def __init__(self, name: str, component_names: tuple):
+        self.name = name
+        self.component_names = component_names
+        self.columns = {component_name: [] for component_name in component_names}
+
+    def __len__(self):
+        return len(self.columns[self.component_names[0]])
+
+    def add(self, **components) -> int:
+        """Adds an entity with the given value of every component, and returns its index"""
+        if set(components) != set(self.component_names):
+            raise ValueError("an entity of %s must have exactly the components %s" %
+                             (self.name, ", ".join(self.component_names)))
+        for component_name, value in components.items():
+            self.columns[component_name].append(value)
+        return len(self) - 1
+
+    def find(self, component_name: str, value) -> list:
+        """Returns the indices of the entities whose component is the given value"""
+        return [index for index, component in enumerate(self.columns[component_name]) if component is value]
+
+    def remove(self, indices: list):
+        """Removes the entities at the given indices, keeping the order of the rest"""
+        if not indices:
+            return
+        removed = set(indices)
+        for column in self.columns.values():
+            column[:] = [component for index, component in enumerate(column) if index not in removed]
+
+    def save(self, mutable_component_names=()) -> dict:
+        """Returns a copy of every column, from which restore() brings back the entities as they are now.
+
+        :param mutable_component_names:     The components that are changed in place, such as rects, which
+                                            are copied with their copy() method. Every other component is
+                                            only ever replaced, so it is shared with the snapshot.
+        """
+
+        return {component_name: [component.copy() for component in column]
+                if component_name in mutable_component_names else list(column)
+                for component_name, column in self.columns.items()}
+
+    def restore(self, saved_columns: dict, mutable_component_names=()):
+        """Replaces every entity with those of the columns returned by save(), which can be restored again"""
+        for component_name, column in self.columns.items():
+            if component_name in mutable_component_names:
+                column[:] = [component.copy() for component in saved_columns[component_name]]
+            else:
+                column[:] = saved_columns[component_name]
+
+
+class MessageQueue:
+    """Holds the messages posted to entities until the World dispatches them"""
+
+    def __init__(self):
+        self.messages = []
+
+    def post(self, index: int, message: EntityMessage):
+        self.messages.append((index, message))
+
+    def take(self) -> list:
+        messages = self.messages
+        self.messages = []
+        return messages
+
+
+class System:
+    """Updates a single aspect of the entities of an Archetype"""
+
+    def update(self, world, indices, delta_time, game_map, player):
+        """Updates the entities at the given indices, which are those active in this frame"""
+        pass
+
+    def receive(self, world, index: int, message: EntityMessage):
+        pass
+
+
+class World:
+    """Runs a sequence of systems over the entities of an Archetype"""
+
+    def __init__(self, entities: Archetype, systems: list):
+        self.entities = entities
+        self.systems = systems
+        self.messages = MessageQueue()
+
+    def remove_dead(self):
+        """Removes the entities that died in the previous frame, and were rendered dead in it"""
+        self.entities.remove(self.entities.find("state", EntityState.DEAD))
+
+    def update(self, indices, delta_time, game_map, player):
+        for system in self.systems:
+            system.update(self, indices, delta_time, game_map, player)
+            self.dispatch_messages()
+
+    def dispatch_messages(self):
+        for index, message in self.messages.take():
+            for system in self.systems:
+                system.receive(self, index, message)
+
+
+class AISystem(System):
+    """Walks every entity back and forth between two points, patrolling around where it started"""
+
+    def update(self, world, indices, delta_time, game_map, player):
+        columns = world.entities.columns
+        rects = columns["rect"]
+        directions = columns["direction"]
+        states = columns["state"]
+        x_velocities = columns["x_velocity"]
+        left_bounds = columns["left_bound"]
+        right_bounds = columns["right_bound"]
+        walking_speeds = columns["walking_speed"]
+        for index in indices:
+            states[index] = EntityState.WALKING
+            if directions[index] is Direction.LEFT:
+                if rects[index].x > left_bounds[index]:
+                    x_velocities[index] = -walking_speeds[index]
+                else:
+                    directions[index] = Direction.RIGHT
+            elif directions[index] is Direction.RIGHT:
+                if rects[index].x < right_bounds[index]:
+                    x_velocities[index] = walking_speeds[index]
+                else:
+                    directions[index] = Direction.LEFT
+
+    def receive(self, world, index, message):
+        columns = world.entities.columns
+        if message is EntityMessage.AI_TURN_RIGHT:
+            columns["direction"][index] = Direction.RIGHT
+            columns["x_velocity"][index] = -columns["x_velocity"][index]
+        if message is EntityMessage.AI_TURN_LEFT:
+            columns["direction"][index] = Direction.LEFT
+            columns["x_velocity"][index] = -columns["x_velocity"][index]
+
+
+class GravitySystem(System):
+    """Accelerates every entity that is not on a chain downwards, see EntityGravityComponent"""
+
+    DISCRETE_TIMESTEP = 1 / 60
+
+    def __init__(self, weight=30):
+        self.GRAVITY = weight
+
+    def update(self, world, indices, delta_time, game_map, player):
+        num_full_steps = int(delta_time / self.DISCRETE_TIMESTEP)
+        remainder_time = delta_time % self.DISCRETE_TIMESTEP
+        # Every entity gains the same velocity, as the steps are the same for all of them
+        gained_velocity = num_full_steps * int(self.GRAVITY * self.DISCRETE_TIMESTEP * 60) + \
+            int(self.GRAVITY * remainder_time * 60)
+        columns = world.entities.columns
+        states = columns["state"]
+        y_velocities = columns["y_velocity"]
+        for index in indices:
+            if states[index] is not EntityState.CLIMBING and states[index] is not EntityState.HANGING:
+                y_velocities[index] += gained_velocity
+
+
+class CombatSystem(System):
+    """Lets the player stomp on every entity it lands on, and hurts the player when it runs into one"""
+
+    def update(self, world, indices, delta_time, game_map, player):
+        rects = world.entities.columns["rect"]
+        player_rect = player.rect
+        for index in indices:
+            rect = rects[index]
+            if rect.colliderect(player_rect):
+                is_stomped_by_player = player_rect.bottom < rect.centery and player.y_velocity > 0
+                if is_stomped_by_player:
+                    world.messages.post(index, EntityMessage.DIE)
+                else:
+                    player.message(EntityMessage.ENEMY_HIT)
+
+
+class RigidBodySystem(System):
+    """Moves every entity by its velocity and resolves its collisions with the terrain,
+    see EntityRigidBodyComponent"""
+
+    DISCRETE_TIMESTEP = 1 / 60
+
+    def update(self, world, indices, delta_time, game_map, player):
+        num_full_steps = int(delta_time / self.DISCRETE_TIMESTEP)
+        remainder_time = delta_time % self.DISCRETE_TIMESTEP
+        columns = world.entities.columns
+        rects = columns["rect"]
+        x_velocities = columns["x_velocity"]
+        y_velocities = columns["y_velocity"]
+        map_width = game_map.rect.width
+        for index in indices:
+            rect = rects[index]
+            for i in range(0, num_full_steps):
+                rect.y += int(y_velocities[index] * self.DISCRETE_TIMESTEP)
+                self.handle_y_collisions(world, index, game_map)
+                rect.x += int(x_velocities[index] * self.DISCRETE_TIMESTEP)
+                self.handle_x_collisions(world, index, game_map)
+            rect.y += int(y_velocities[index] * remainder_time)
+            if int(y_velocities[index] * remainder_time) != 0:
+                self.handle_y_collisions(world, index, game_map)
+            rect.x += int(x_velocities[index] * remainder_time)
+            # Without any movement since the last step, the x collisions would be the ones just resolved
+            if num_full_steps == 0 or int(x_velocities[index] * remainder_time) != 0 \
+                    or int(y_velocities[index] * remainder_time) != 0:
+                self.handle_x_collisions(world, index, game_map)
+
+            # Boundaries of the map
+            if rect.top < 0:
+                rect.top = 0
+            if rect.left < 0:
+                rect.left = 0
+            elif rect.right > map_width:
+                rect.right = map_width
+
+    @staticmethod
+    def handle_y_collisions(world, index, game_map):
+        columns = world.entities.columns
+        rect = columns["rect"][index]
+        colliding_rects = game_map.get_colliding_rects(rect)
+        if __debug__ and counters.enabled:
+            counters.add(COLLISION_CALLS, 1)
+            counters.add(SPRITES_TESTED, game_map.count_collision_candidates(rect))
+        for colliding_rect in colliding_rects:
+            if is_colliding_from_below(rect, colliding_rect):
+                rect.top = colliding_rect.bottom
+                columns["y_velocity"][index] = 0
+            if is_colliding_from_above(rect, colliding_rect):
+                is_crushed = colliding_rect.bottom < rect.centery
+                if is_crushed:
+                    world.messages.post(index, EntityMessage.DIE)
+                else:
+                    if columns["state"][index] is EntityState.JUMPING:
+                        columns["state"][index] = EntityState.IDLE
+                    rect.bottom = colliding_rect.top
+                    columns["y_velocity"][index] = 0
+
+    @staticmethod
+    def handle_x_collisions(world, index, game_map):
+        rect = world.entities.columns["rect"][index]
+        colliding_rects = game_map.get_colliding_rects(rect, include_spikes=False)
+        if __debug__ and counters.enabled:
+            counters.add(COLLISION_CALLS, 1)
+            counters.add(SPRITES_TESTED, game_map.count_collision_candidates(rect))
+        for colliding_rect in colliding_rects:
+            if is_colliding_from_right(rect, colliding_rect):
+                rect.left = colliding_rect.right
+                world.messages.post(index, EntityMessage.AI_TURN_RIGHT)
+            if is_colliding_from_left(rect, colliding_rect):
+                rect.right = colliding_rect.left
+                world.messages.post(index, EntityMessage.AI_TURN_LEFT)
+
+
+class AnimationSystem(System):
+    """Advances the animation of the current state of every entity, see EntityAnimationComponent.
+
+    Every entity keeps its own position in the Animation, which is shared by all entities of a type,
+    and images facing left are flipped once per Animation rather than once per frame. Entities out of
+    sight of the player are only animated every distant_animation_interval ticks of the quality tier."""
+
+    def __init__(self):
+        self.tick_count = 0
+
+    def update(self, world, indices, delta_time, game_map, player):
+        interval = quality_governor.tier.distant_animation_interval
+        self.tick_count = (self.tick_count + 1) % interval
+        if self.tick_count != 0:
+            near_rect = get_area_around(player.rect, NEAR_AREA)
+            rects = world.entities.columns["rect"]
+            indices = [index for index in indices if near_rect.colliderect(rects[index])]
+
+        columns = world.entities.columns
+        states = columns["state"]
+        directions = columns["direction"]
+        animation_libraries = columns["animations"]
+        animation_states = columns["animation_state"]
+        frame_indices = columns["frame_index"]
+        frame_counters = columns["frame_counter"]
+        images = columns["image"]
+        for index in indices:
+            state = states[index]
+            if state is not animation_states[index]:
+                animation_states[index] = state
+                frame_indices[index] = 0
+                frame_counters[index] = 0
+            animation = animation_libraries[index][state]
+            frame_counters[index] = (frame_counters[index] + 1) % animation.FRAMES_PER_UPDATE
+            if frame_counters[index] == 0:
+                frame_indices[index] = (frame_indices[index] + 1) % animation.animation_length
+            if directions[index] is Direction.LEFT:
+                images[index] = animation.get_flipped_image_at(frame_indices[index])
+            else:
+                images[index] = animation.get_image_at(frame_indices[index])
+
+
+class DeathSystem(System):
+    """Kills every entity that falls out of the map or receives EntityMessage.DIE, see DeathComponent.
+    Dead entities are removed by the World at the start of the next frame."""
+
+    def update(self, world, indices, delta_time, game_map, player):
+        columns = world.entities.columns
+        rects = columns["rect"]
+        states = columns["state"]
+        map_bottom = game_map.rect.bottom
+        for index in indices:
+            if rects[index].top > map_bottom:
+                states[index] = EntityState.DEAD
+
+    def receive(self, world, index, message):
+        if message is EntityMessage.DIE:
+            world.entities.columns["state"][index] = EntityState.DEAD
+
+
+class RenderSystem:
+    """Blits every entity that is visible through the camera in a single call, see RenderComponent"""
+
+    def render(self, entities: Archetype, camera, surface):
+        camera_rect = camera.rect
+        blit_rects = entities.columns["blit_rect"]
+        images = entities.columns["image"]
+        blit_sequence = []
+        for index, rect in enumerate(entities.columns["rect"]):
+            if camera_rect.colliderect(rect):
+                blit_sequence.append((images[index], (rect.x - camera_rect.x, rect.y - camera_rect.y),
+                                      blit_rects[index]))
+        surface.blits(blit_sequence, False)
+        if __debug__ and counters.enabled:
+            counters.add(BLITS, len(blit_sequence))
@@ -1,9 +1,11 @@
 import pygame as pg
 from .entitystate import EntityState, Direction, EntityMessage
 from .animation import EntityAnimationComponent
-from .component import SoundComponent, RenderComponent, HealthComponent, DeathComponent, EnemyCombatComponent
+from .component import SoundComponent, RenderComponent, HealthComponent, DeathComponent
 from .physics import UserControlComponent, EntityGravityComponent, EntityRigidBodyComponent
 from .libraries import Library
+from .ecs import Archetype
+from .pools import rect_pool
 
 
 class Entity(pg.sprite.Sprite):
@@ -54,6 +56,7 @@ class Player(Entity):
 
     def __init__(self, starting_position=DEFAULT_STARTING_POS):
         super().__init__()
+        Library.load()
         self.blit_rect = pg.Rect(15, 3.5, 20, 30)
         self.rect = pg.Rect(starting_position, (self.blit_rect.width, self.blit_rect.height))
 
@@ -82,46 +85,60 @@ class Player(Entity):
     def render(self, camera, surface):
         self.render_component.update(self, camera, surface)
 
-
-class Enemy(Entity):
-
-    def __init__(self, type_object, ai_component, render_component, starting_position):
-        super().__init__()
-        self.ai_component = ai_component
-        self.render_component = render_component
-        self.gravity_component = EntityGravityComponent()
-        self.rigid_body_component = EntityRigidBodyComponent()
-        self.animation_component = EntityAnimationComponent(self, type_object.animation_library)
-        self.sound_component = SoundComponent(type_object.sound_library)
-        self.death_component = DeathComponent(self, is_game_over=False)
-        self.combat_component = EnemyCombatComponent(self)
-
-        self.blit_rect = type_object.blit_rect
-        self.rect = pg.Rect(starting_position, (self.blit_rect.width, self.blit_rect.height))
-        self.image = self.animation_component.get_initial_image()
-
-    def message(self, message):
-        self.ai_component.receive(message, self)
-        self.death_component.receive(message)
-    
-    def update(self, delta_time, map, player):
-        self.ai_component.update(self, map)
-        self.gravity_component.update(self, delta_time)
-        self.combat_component.update(player)
-        self.rigid_body_component.update(self, delta_time, map)
-        self.animation_component.update()
-        self.death_component.update(map)
-
-    def render(self, camera, surface):
-        self.render_component.update(self, camera, surface)
+    def save_state(self) -> tuple:
+        """Returns the mutable state of the player, which restore_state() brings back"""
+        return (self.rect.x, self.rect.y, self.x_velocity, self.y_velocity, self.state, self.direction,
+                self.health_component.health, self.health_component.last_collide_time)
+
+    def restore_state(self, state: tuple):
+        (self.rect.x, self.rect.y, self.x_velocity, self.y_velocity, self.state, self.direction,
+         self.health_component.health, self.health_component.last_collide_time) = state
+
+
+# Components of every enemy. Enemies are not objects, but entities of an Archetype, see modules/ecs.py.
+# The chunk is the (column, row) of the chunk of a StreamingMap that the enemy was placed in, or None.
+ENEMY_COMPONENTS = ("rect", "blit_rect", "x_velocity", "y_velocity", "direction", "state",
+                    "left_bound", "right_bound", "walking_speed",
+                    "animations", "animation_state", "frame_index", "frame_counter", "image", "chunk")
+
+# Components of enemies that are changed in place rather than replaced, and must be copied by snapshots
+ENEMY_MUTABLE_COMPONENTS = ("rect",)
+
+
+def add_enemy(enemies: Archetype, type_object, starting_position, walking_speed=90, patrol_radius=50,
+              chunk=None) -> int:
+    """Adds an enemy of the given EnemyType to the archetype of enemies, and returns its index.
+
+    :param starting_position:   The top left of the enemy. It patrols up to patrol_radius on either side.
+    :param chunk:               The chunk of a StreamingMap that the enemy belongs to, which removes it when
+                                the chunk is evicted.
+    """
+
+    initial_animation = type_object.animation_library[EntityState.IDLE]
+    return enemies.add(rect=rect_pool.acquire(starting_position, type_object.blit_rect.size),
+                       blit_rect=type_object.blit_rect,
+                       x_velocity=0,
+                       y_velocity=0,
+                       direction=Direction.RIGHT,
+                       state=EntityState.IDLE,
+                       left_bound=starting_position[0] - patrol_radius,
+                       right_bound=starting_position[0] + patrol_radius,
+                       walking_speed=walking_speed,
+                       animations=type_object.animation_library,
+                       animation_state=EntityState.IDLE,
+                       frame_index=0,
+                       frame_counter=0,
+                       image=initial_animation.get_image_at(0),
+                       chunk=chunk)
 
 
 class EnemyType:
     """Template object representing the type of enemy, which
-    is passed into the Enemy constructor to instantiate an
-    Enemy with the corresponding visuals, health and sounds."""
+    is passed into add_enemy() to add an enemy with the
+    corresponding visuals, health and sounds."""
 
     def __init__(self):
+        Library.load()
         self.health = 100
         self.animation_library = {}
         self.sound_library = Library.entity_sounds
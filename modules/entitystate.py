@@ -58,3 +58,5 @@ class GameEvent(Enum):
     GAME_RESTART = pg.USEREVENT + 4
     GAME_RETURN_TO_TITLE_SCREEN = pg.USEREVENT + 5
     GAME_LOAD_LEVEL = pg.USEREVENT + 6
+    LEADERBOARD_FETCHED = pg.USEREVENT + 7
+    SCORE_SUBMISSION_UPDATED = pg.USEREVENT + 8
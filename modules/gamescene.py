@@ -1,16 +1,22 @@
+import sys
 import pygame as pg
-import pygame.freetype as ft
 from .camera import Camera
 from .leveljson import LevelManager
+from .snapshot import WorldSnapshot
+from .rewind import RewindBuffer, REWIND_KEY
 from .entities import Player
 from .background import StaticBackground
 from .headsupdisplay import HeadsUpDisplay
 from .entitystate import GameEvent
 from .userinterface import Menu, MenuButton, LevelSelectButton
-import os
-import json
-import requests
-from Crypto.Cipher import AES
+from .runtime import get_font
+from .assets import asset_exists
+from .sound import sound_bank, music_player
+from .telemetry import telemetry
+from .inputstate import input_state
+from .quality import quality_governor
+from .counters import counters, BLITS, SURFACES_ALLOCATED
+from .leaderboard import leaderboard_client, score_submitter, SUBMISSION_SENT, SUBMISSION_RETRYING
 
 """
 * =============================================================== *
@@ -33,38 +39,75 @@ All scenes must support the following methods, which are invoked on every cycle
 Additionally, all scenes will have a manager attribute, which contains a SceneManager object to facilitate 
 transitions between scenes.
 
+Scenes that only change in response to events, such as menus, set is_static. The game loop only renders a
+static scene while its is_dirty flag is set, which happens when it is shown and whenever an event arrives,
+and sleeps otherwise. Animated scenes, such as the GameScene and the transitions, are rendered every frame.
+
+Scenes may also override the following hooks, which the SceneManager invokes on every transition:
+    on_enter()          ->      The scene has been pushed onto the stack
+    on_exit()           ->      The scene has been popped off the stack
+    on_pause()          ->      Another scene has been pushed on top of the scene
+    on_resume()         ->      The scene on top of the scene has been popped, so it is shown again
+    reset()             ->      Brings a registered scene back to the state it was created in, see below
+
 SCENE MANAGER
 -------------------------
-- TO BE COMPLETED -
+The SceneManager holds the stack of scenes, the top of which is the current scene:
+    switch_to_scene()       ->      Pushes the given scene, or goes back to it if it is already on the stack
+    switch_to()             ->      Resets the registered instance of the given scene class with the given
+                                    arguments, and pushes it
+    go_to_previous_scene()  ->      Pops the current scene
+    go_back_to_scene()      ->      Pops every scene above the given scene
+
+Menus, overlays and transitions are registered, i.e. a single instance of each is created the first time
+it is shown, and reused every time after that. Their menus, text and surfaces are therefore only rendered
+once per session, and showing them again allocates nothing. The GameScene is still created anew for
+every game, as it holds the level being played.
+
+A scene is never on the stack twice: switching to a scene that is already on it pops the scenes above it
+instead. The stack holds at most MAX_SCENE_STACK_DEPTH scenes, and pushing a scene onto a full stack
+replaces the current scene, which is reported to stderr, so that no transition can make the stack grow
+without bound.
 """
 
 # Size tuples
 WINDOW_SIZE = (800, 600)
 SURFACE_SIZE = (400, 300)
 
-# Temporarily put this here so that code runs in Joshua's computer
-# Will comment this out when I push
-pg.init()
+# Filled behind the level instead of the backgrounds by the quality tiers that skip them
+BACKGROUND_FILL = (88, 62, 65)
 
-# Initialise sound
-pg.mixer.init(44100, 16, 2, 512)
+# Background music
+TITLE_MUSIC = "assets/sound/music/Debris of the Lost.ogg"
+GAME_MUSIC = "assets/sound/music/Deep Dream.ogg"
 
-# Freetype font
-# Initialise the FreeType font system
-ft.init()
-freetype = ft.Font("assets/fonts/pixChicago.ttf", 8)
-freetype.antialiased = False
+# The deepest stack is title, game, victory, leaderboard and score submission
+MAX_SCENE_STACK_DEPTH = 8
 
 
 class Scene:
     """Represents a scene in the program, which is analogous to the state of the game"""
-    sound_library = {"Scroll": pg.mixer.Sound("assets/sound/sfx/confirm.ogg"),
-                     "Confirm": pg.mixer.Sound("assets/sound/sfx/confirm.ogg")
-                     }
+    # Loaded by load_sound_library() once the mixer has been initialised
+    sound_library = {}
+
+    # Whether the scene only changes in response to events, so that it need not be rendered every frame
+    is_static = False
 
     def __init__(self):
-        self.manager = SceneManager(self)
+        Scene.load_sound_library()
+        self.manager = None                 # Set by the SceneManager when the scene is pushed
         self.game_display = pg.Surface(SURFACE_SIZE)
+        self.is_dirty = True                # Whether a static scene has changed since it was last rendered
+
+    @staticmethod
+    def load_sound_library():
+        """Loads the sounds shared by all scenes. Does nothing if they have already been loaded."""
+        if not Scene.sound_library:
+            # Menu feedback plays on the reserved channels, so that it is never drowned out
+            confirm_sound = sound_bank.get("assets/sound/sfx/confirm.ogg", is_reserved=True)
+            Scene.sound_library = {"Scroll": confirm_sound,
+                                   "Confirm": confirm_sound
+                                   }
 
     def handle_events(self):
         raise NotImplementedError
@@ -75,30 +118,91 @@ class Scene:
     def render(self, surface: pg.Surface):
         raise NotImplementedError
 
+    def reset(self, *args):
+        """Brings the scene back to the state it was created in. Called with the arguments given to
+        SceneManager.switch_to() every time a registered scene is shown."""
+        pass
+
+    def on_enter(self):
+        pass
+
+    def on_exit(self):
+        pass
+
+    def on_pause(self):
+        pass
+
+    def on_resume(self):
+        pass
+
 
 class SceneManager:
     """Handles scene transitions from one scene to another"""
     def __init__(self, scene: Scene):
-        # TODO: Implement previous_scene as stack without dictionary
         self.scene_stack = []           # Lists can also act as stacks
+        self.registered_scenes = {}     # Scene class -> the instance reused by switch_to()
 
         self.scene_stack.append(scene)
         self.scene = scene
         self.scene.manager = self
+        self.scene.is_dirty = True
+        self.scene.on_enter()
+
+    def get_scene(self, scene_class) -> Scene:
+        """Returns the registered instance of the scene class, which is created the first time"""
+        scene = self.registered_scenes.get(scene_class)
+        if scene is None:
+            scene = scene_class()
+            self.registered_scenes[scene_class] = scene
+        return scene
+
+    def switch_to(self, scene_class, *args):
+        """Resets the registered instance of the scene class with the given arguments, then switches to it"""
+        scene = self.get_scene(scene_class)
+        scene.reset(*args)
+        self.switch_to_scene(scene)
 
     def switch_to_scene(self, scene: Scene):
+        if scene in self.scene_stack:
+            self.go_back_to_scene(scene)
+            return
+        if len(self.scene_stack) >= MAX_SCENE_STACK_DEPTH:
+            replaced_scene = self.scene_stack.pop()
+            print("[scenes] the scene stack is full, so %s replaces %s: %s" % (
+                type(scene).__name__, type(replaced_scene).__name__,
+                ", ".join(type(stacked_scene).__name__ for stacked_scene in self.scene_stack)), file=sys.stderr)
+            replaced_scene.on_exit()
+        else:
+            self.scene.on_pause()
         self.scene_stack.append(scene)
         self.scene = scene
         self.scene.manager = self
+        self.scene.is_dirty = True
+        self.scene.on_enter()
+
+    def go_back_to_scene(self, scene: Scene):
+        """Pops every scene above the given scene, which must be on the stack"""
+        if scene is self.scene:
+            scene.is_dirty = True
+            return
+        while self.scene_stack[-1] is not scene:
+            self.scene_stack.pop().on_exit()
+        self.scene = scene
+        self.scene.manager = self
+        self.scene.is_dirty = True
+        self.scene.on_resume()
 
     def go_to_previous_scene(self):
-        self.scene_stack.pop()
+        self.scene_stack.pop().on_exit()
         self.scene = self.scene_stack[-1]
         self.scene.manager = self
+        self.scene.is_dirty = True
+        self.scene.on_resume()
 
 
 class TitleScene(Scene):
     """Represents the title screen"""
+    is_static = True
 
     def __init__(self):
         super().__init__()
@@ -109,21 +213,20 @@ class TitleScene(Scene):
                             StaticBackground("assets/textures/background/04 background.png", self.game_display))
 
         # Initialize title text
-        self.title = freetype.render("THE TOWER", (70, 35, 35), None, 0, 0, 32)
+        self.title = get_font().render("THE TOWER", (70, 35, 35), None, 0, 0, 32)
         self.title_blit_position = (int((self.game_display.get_width() - self.title[0].get_width()) / 2), 100)
 
         # Initialise menu
         self.menu = Menu(8,
                          (200, 200, 200),
                          ("New Game", lambda: self.manager.switch_to_scene(GameScene()), (165, 180)),
-                         ("Level Select", lambda: self.manager.switch_to_scene(LevelSelectionScene()), (165, 200)),
+                         ("Level Select", lambda: self.manager.switch_to(LevelSelectionScene), (165, 200)),
                          ("Quit Game", lambda: pg.quit(), (165, 220))
                          )
 
-        # Play BGM
-        pg.mixer.music.load("assets/sound/music/Debris of the Lost.ogg")
-        pg.mixer.music.set_volume(0.5)
-        pg.mixer.music.play(-1)
+        # Play BGM, and read the game music in the background so that New Game starts without a pause
+        music_player.play(TITLE_MUSIC, 0.5)
+        music_player.preload(GAME_MUSIC)
 
     def handle_events(self):
         # Clears the event queue and processes the events
@@ -168,12 +271,14 @@ class TitleScene(Scene):
 
 
 class LevelSelectionScene(Scene):
+    is_static = True
+
     def __init__(self):
         super().__init__()
         # Get the count of items in the directory
         levelcount = 0
         for i in range(1, 100):
-            if os.path.exists("assets/levels/level" + str(i) + ".json"):
+            if asset_exists(LevelManager.get_level_filepath(i)):
                 levelcount += 1
             else:
                 break
@@ -211,13 +316,13 @@ class LevelSelectionScene(Scene):
         self.current_index = 0
 
         # additional text
-        self.level_select_title = freetype.render("Level Select", (235, 235, 235), None, 0, 0, 24)
+        self.level_select_title = get_font().render("Level Select", (235, 235, 235), None, 0, 0, 24)
         self.title_blit_position = (int((self.game_display.get_width() - self.level_select_title[0].get_width()) / 2),
                                     35)
 
         # TODO: add two buttons for scrolling
         # this is hardcoded
-        back_button_text = freetype.render("<", (235, 235, 235), None, 0, 0, 24)
+        back_button_text = get_font().render("<", (235, 235, 235), None, 0, 0, 24)
         self.back_button = back_button_text[0]
         self.back_button_rect = pg.Rect(13, 100, 20, 150)
 
@@ -229,6 +334,9 @@ class LevelSelectionScene(Scene):
                             StaticBackground("assets/textures/background/03 background B.png", self.game_display),
                             StaticBackground("assets/textures/background/04 background.png", self.game_display))
 
+    def reset(self):
+        self.current_index = 0
+
     def handle_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT:
@@ -261,6 +369,8 @@ class LevelSelectionScene(Scene):
                                                             self.manager.scene.camera)
                 # prevents the user from submitting scores to leaderboard
                 self.manager.scene.can_submit_leaderboard = False
+                # levels played from the selection screen are practice, and can be rewound
+                self.manager.scene.enable_rewind()
 
     def update(self, *args):
         pass
@@ -308,10 +418,8 @@ class GameScene(Scene):
                             StaticBackground("assets/textures/background/03 background B.png", self.game_display),
                             StaticBackground("assets/textures/background/04 background.png", self.game_display))
 
-        # Play BGM
-        pg.mixer.music.load("assets/sound/music/Deep Dream.ogg")
-        pg.mixer.music.set_volume(0.8)
-        pg.mixer.music.play(-1)
+        # Play BGM. Carries on without restarting if the game is being restarted.
+        music_player.play(GAME_MUSIC, 0.8)
 
         # Track the time passed since the game started
         self.score_timer = pg.time.Clock()
@@ -320,6 +428,12 @@ class GameScene(Scene):
         # hack to control ability to submit leaderboard
         self.can_submit_leaderboard = True
 
+        # The state of the current level when it started, to which restart_level() brings it back
+        self.checkpoint = None
+
+        # Records the last seconds of play in practice mode, see enable_rewind()
+        self.rewind_buffer = None
+
     def handle_events(self):
         # Clears the event queue and processes the events
         for event in pg.event.get():
@@ -331,45 +445,95 @@ class GameScene(Scene):
                     pg.quit()
                     quit()
                 elif event.key == pg.K_ESCAPE:
-                    pg.mixer.music.pause()
-                    self.manager.switch_to_scene(PauseScene())
+                    self.manager.switch_to(PauseScene)
             elif event.type == GameEvent.SWITCH_LEVEL.value:
-                self.manager.switch_to_scene(FadeOutScene())
+                self.manager.switch_to(FadeOutScene)
             elif event.type == GameEvent.GAME_OVER.value:
-                self.manager.switch_to_scene(GameOverScene())
+                self.manager.switch_to(GameOverScene)
             elif event.type == GameEvent.GAME_COMPLETE.value:
                 # FIXME: this is unnecessary, check and remove
-                self.manager.switch_to_scene(GameBeatenScene(self.score_timer.tick() / 1000))
+                self.manager.switch_to(GameBeatenScene, self.score_timer.tick() / 1000)
                 if not self.can_submit_leaderboard:
                     self.manager.scene.submitted = True
 
+    def save_checkpoint(self):
+        self.checkpoint = WorldSnapshot(self.level_manager.level, self.player)
+
+    def restart_level(self):
+        """Brings the level and the player back to the last checkpoint, without loading the level again"""
+        self.checkpoint.restore(self.level_manager.level, self.player)
+        self.camera.snap_to_target(self.player)
+        self.level_manager.level.map.stream(self.camera)
+        if self.rewind_buffer is not None:
+            self.rewind_buffer.clear()
+
+    def enable_rewind(self):
+        """Enables practice mode, in which holding REWIND_KEY rewinds the last seconds of play"""
+        self.rewind_buffer = RewindBuffer()
+
+    def rewind(self, delta_time):
+        """Steps back by one tick, instead of playing it, if any earlier tick was recorded"""
+        if self.rewind_buffer.rewind(self.level_manager.level, self.player):
+            self.camera.follow_target(self.player)
+            self.level_manager.level.map.stream(self.camera)
+            self.hud.update(delta_time, self.player, self.camera)
+        telemetry.lap("rewind")
+
     def update(self, delta_time):
+        # A checkpoint is saved on the first update of every level, once the player has been placed at its start
+        if self.checkpoint is None or self.checkpoint.level is not self.level_manager.level:
+            self.save_checkpoint()
+
+        if self.rewind_buffer is not None and input_state.is_held(REWIND_KEY):
+            self.rewind(delta_time)
+            return
+
         self.player.update(delta_time, self.level_manager.level.map)
+        telemetry.lap("player")
         self.level_manager.level.update(delta_time, self.player)
         self.hud.update(delta_time, self.player, self.camera)
+        telemetry.lap("hud")
         self.camera.follow_target(self.player)
+        telemetry.lap("camera")
+        self.level_manager.level.map.stream(self.camera)
+        telemetry.lap("streaming")
+
+        if self.rewind_buffer is not None:
+            self.rewind_buffer.record(self.level_manager.level, self.player)
+            telemetry.lap("rewind")
 
     def render(self, surface):
         # Blit backgrounds on game_display
-        for background in self.backgrounds:
-            background.render()
+        if quality_governor.tier.draw_backgrounds:
+            for background in self.backgrounds:
+                background.render()
+        else:
+            self.game_display.fill(BACKGROUND_FILL)
+        telemetry.lap("backgrounds")
 
         self.level_manager.level.render(self.camera, self.game_display)
         self.player.render(self.camera, self.game_display)
+        telemetry.lap("player render")
         self.hud.render(self.game_display)
+        telemetry.lap("hud render")
 
         # Blit game_display on window surface
         surface.blit(pg.transform.scale(self.game_display, WINDOW_SIZE), (0, 0))
+        if __debug__ and counters.enabled:
+            counters.add(SURFACES_ALLOCATED, 1)
+            counters.add(BLITS, 1)
+        telemetry.lap("scale")
 
 
 class GameOverScene(Scene):
     """Represents the "Game Over" screen"""
+    is_static = True
 
     def __init__(self):
         super().__init__()
 
         # Initialize title
-        self.title = freetype.render("GAME OVER", (235, 235, 235), None, 0, 0, 32)
+        self.title = get_font().render("GAME OVER", (235, 235, 235), None, 0, 0, 32)
         self.title_blit_position = (int((self.game_display.get_width() - self.title[0].get_width()) / 2), 100)
 
         self.menu = Menu(8,
@@ -380,15 +544,18 @@ class GameOverScene(Scene):
                           (182, 200)),
                          ("Quit", lambda: pg.event.post(pg.event.Event(pg.QUIT)), (182, 220)))
 
+    def reset(self):
+        self.menu.reset()
+
     def handle_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT:
                 pg.quit()
                 quit()
             elif event.type == GameEvent.GAME_RESTART.value:
+                # Retries the level from its start, rather than starting a new game
                 self.manager.go_to_previous_scene()
-                self.manager.go_to_previous_scene()
-                self.manager.switch_to_scene(GameScene())
+                self.manager.scene.restart_level()
             elif event.type == GameEvent.GAME_RETURN_TO_TITLE_SCREEN.value:
                 self.manager.go_to_previous_scene()
                 self.manager.go_to_previous_scene()
@@ -425,11 +592,13 @@ class GameOverScene(Scene):
 
 
 class GameBeatenScene(Scene):
-    def __init__(self, time: float):
+    is_static = True
+
+    def __init__(self):
         super().__init__()
-        self.time = time
+        self.time = 0
         # Initialize title
-        self.title = freetype.render("VICTORY", (0, 0, 0), None, 0, 0, 32)
+        self.title = get_font().render("VICTORY", (0, 0, 0), None, 0, 0, 32)
         self.title_blit_position = (int((self.game_display.get_width() - self.title[0].get_width()) / 2), 100)
 
         self.menu = Menu(8,
@@ -438,11 +607,16 @@ class GameBeatenScene(Scene):
                          ("Main Menu",
                           lambda: pg.event.post(pg.event.Event(GameEvent.GAME_RETURN_TO_TITLE_SCREEN.value)),
                           (182, 200)),
-                         ("Leaderboard", lambda: self.manager.switch_to_scene(LeaderboardScene(self.time, self.submitted)), (182, 220)),
+                         ("Leaderboard", lambda: self.manager.switch_to(LeaderboardScene, self.time, self.submitted), (182, 220)),
                          ("Quit", lambda: pg.event.post(pg.event.Event(pg.QUIT)), (182, 240)))
 
         self.submitted = False          # This is the last place to change this
 
+    def reset(self, time: float):
+        self.time = time
+        self.submitted = False
+        self.menu.reset()
+
     def handle_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT:
@@ -489,40 +663,62 @@ class GameBeatenScene(Scene):
 
 
 class LeaderboardScene(Scene):
-    def __init__(self, time: float, submitted = False):
+    is_static = True
+
+    def __init__(self):
         super().__init__()
-        self.time = time
+        self.time = None
         # First list the top ten
         # then list your score
         # then have submit and back buttons
-        self.title = freetype.render("Your timing: " + ('%.1f' % self.time) + 's', (0, 0, 0), None, 0, 0, 18)
-        self.title_blit_position = (int((self.game_display.get_width() - self.title[0].get_width()) / 2), 25)
+        self.title = None
+        self.title_blit_position = None
 
         self.leaderboard_names_list = []
         self.leaderboard_timings_list = []
         self.render_heights = []
+        self.has_entries = False
+        self.entries = None                 # The entries that the text was last generated for
 
         self.render_error = False
-        self.fetch_error = freetype.render("There was an error in fetching the leaderboard", (150, 0, 0), None, 0, 0, 8)
+        self.render_stale_notice = False
+        self.fetch_error = get_font().render("There was an error in fetching the leaderboard", (150, 0, 0), None, 0, 0, 8)
+        self.loading_notice = get_font().render("Loading leaderboard...", (80, 80, 80), None, 0, 0, 8)
+        self.stale_notice = get_font().render("Offline - showing the last saved leaderboard", (150, 0, 0), None, 0, 0, 8)
+
+        self.submitted = False
+        self.submitted_menu = Menu(8,
+                                   (80, 80, 80),
+                                   ("Back", lambda: self.manager.go_to_previous_scene(), (180, 250))
+                                   )
+        self.submission_menu = Menu(8,
+                                    (80, 80, 80),
+                                    ("Submit Score",
+                                     lambda: self.manager.switch_to(LeaderboardSubmissionScene, self.time),
+                                     (90, 250)),
+                                    ("Back", lambda: self.manager.go_to_previous_scene(), (280, 250))
+                                    )
+        self.menu = self.submission_menu
+
+    def reset(self, time: float, submitted=False):
+        # The title is only rendered again for another timing
+        if time != self.time:
+            self.time = time
+            self.title = get_font().render("Your timing: " + ('%.1f' % self.time) + 's', (0, 0, 0), None, 0, 0, 18)
+            self.title_blit_position = (int((self.game_display.get_width() - self.title[0].get_width()) / 2), 25)
 
-        try:
-            self.fetch_leaderboard()
-        except Exception:
-            pass
+        self.render_error = False
+        self.render_stale_notice = False
+
+        # Show the cached leaderboard straight away, and the latest one once it arrives
+        cached_entries = leaderboard_client.get_entries()
+        if cached_entries is not None:
+            self.set_entries(cached_entries)
+        self.fetch_leaderboard()
 
         self.submitted = submitted
-        if submitted:
-            self.menu = Menu(8,
-                             (80, 80, 80),
-                             ("Back", lambda: self.manager.go_to_previous_scene(), (180, 250))
-                             )
-        else:
-            self.menu = Menu(8,
-                             (80, 80, 80),
-                             ("Submit Score", lambda: self.manager.switch_to_scene(LeaderboardSubmissionScene(self.time)),
-                              (90, 250)),
-                             ("Back", lambda: self.manager.go_to_previous_scene(), (280, 250))
-                             )
+        self.menu = self.submitted_menu if submitted else self.submission_menu
+        self.menu.reset()
 
     def handle_events(self):
         for event in pg.event.get():
@@ -545,7 +741,15 @@ class LeaderboardScene(Scene):
             elif event.type == pg.MOUSEBUTTONDOWN:
                 self.sound_library["Confirm"].play()
                 self.menu.click((event.pos[0] / 2, event.pos[1] / 2))
-        # TODO: when posting the request, make a new get request from the server and update the list again 
+            elif event.type == GameEvent.LEADERBOARD_FETCHED.value:
+                if event.entries is None:
+                    self.render_error = True
+                else:
+                    self.render_error = False
+                    self.set_entries(event.entries)
+                self.render_stale_notice = event.is_stale and event.entries is not None
+            elif event.type == GameEvent.SCORE_SUBMISSION_UPDATED.value and event.status == SUBMISSION_SENT:
+                self.fetch_leaderboard(force=True)
 
     def update(self, *args):
         if self.submitted:
@@ -559,19 +763,33 @@ class LeaderboardScene(Scene):
             self.game_display.blit(self.fetch_error[0],
                                    (int((self.game_display.get_width() - self.fetch_error[0].get_width()) / 2),
                                     int((self.game_display.get_height() - self.fetch_error[0].get_height()) / 2) - 18))
+        elif not self.has_entries:
+            self.game_display.blit(self.loading_notice[0],
+                                   (int((self.game_display.get_width() - self.loading_notice[0].get_width()) / 2),
+                                    int((self.game_display.get_height() - self.loading_notice[0].get_height()) / 2) - 18))
         else:
             for i in range (0, len(self.leaderboard_names_list)):
                 self.game_display.blit(self.leaderboard_names_list[i][0][0], self.leaderboard_names_list[i][1])
                 self.game_display.blit(self.leaderboard_timings_list[i][0][0], self.leaderboard_timings_list[i][1])
+            if self.render_stale_notice:
+                self.game_display.blit(self.stale_notice[0],
+                                       (int((self.game_display.get_width() - self.stale_notice[0].get_width()) / 2),
+                                        235))
         self.menu.render(self.game_display)
 
 
         surface.blit(pg.transform.scale(self.game_display, WINDOW_SIZE), (0, 0))
 
-    def fetch_leaderboard(self):
-        # Get the json from the remote server and parse
-        leaderboard_json_response = requests.get('https://recursivesandwich-api.herokuapp.com/highscores').text
-        leaderboard_json_dict = json.loads(leaderboard_json_response)
+    def fetch_leaderboard(self, force=False):
+        """Requests the leaderboard in the background. The scene is updated by the LEADERBOARD_FETCHED event."""
+        leaderboard_client.fetch(force)
+
+    def set_entries(self, leaderboard_json_dict):
+        """Generates the text for the given leaderboard entries, unless it was generated for them already"""
+        if self.has_entries and leaderboard_json_dict == self.entries:
+            return
+        self.has_entries = True
+        self.entries = leaderboard_json_dict
 
         # Generate text based on the results of json parse
         # TODO: these must contain names and blit positions
@@ -588,14 +806,14 @@ class LeaderboardScene(Scene):
             try:
                 user = leaderboard_json_dict[i]["user"]
                 user = user if len(user) <= 20 else user[0:20] + "..."
-                self.leaderboard_names_list.append((freetype.render(user,
+                self.leaderboard_names_list.append((get_font().render(user,
                                                                     (0, 0, 0),
                                                                     None,
                                                                     0,
                                                                     0,
                                                                     12),
                                                     (name_x, starting_y)))
-                self.leaderboard_timings_list.append((freetype.render(('%.1f' % leaderboard_json_dict[i]["time"]) + "s",
+                self.leaderboard_timings_list.append((get_font().render(('%.1f' % leaderboard_json_dict[i]["time"]) + "s",
                                                                       (0, 0, 0),
                                                                       None,
                                                                       0,
@@ -608,25 +826,38 @@ class LeaderboardScene(Scene):
 
     def change_menu_upon_successful_submission(self):
         """Call this to restrict the ability to resubmit scores"""
-        self.menu = Menu(8,
-                         (80, 80, 80),
-                         ("Back", lambda: self.manager.go_to_previous_scene(), (180, 250))
-                         )
+        self.menu = self.submitted_menu
+        self.menu.reset()
 
 
 class LeaderboardSubmissionScene(Scene):
-    def __init__(self, time: float):
+    is_static = True
+
+    def __init__(self):
         super().__init__()
+        self.player_name = ""
+        self.time = 0
+        self.render_length_warning = False
+        self.render_fail_warning = False
+        self.length_warning = get_font().render("Name cannot be empty!", (150, 0, 0), None, 0, 0, 12)
+        self.fail_warning = get_font().render("A problem occurred with the request", (150, 0, 0), None, 0, 0, 12)
+        self.success_notification = get_font().render("Your highscore has been submitted!", (0, 150, 0), None, 0, 0, 12)
+        self.input_instructions = get_font().render("Enter your name below:", (50, 50, 50), None, 0, 0, 12)
+        self.submission_instructions = get_font().render("Press Enter to submit or Esc to go back", (50, 50, 50), None, 0, 0, 8)
+        self.sending_notification = get_font().render("Submitting your highscore...", (50, 50, 50), None, 0, 0, 12)
+        self.queued_notice = get_font().render("Offline - your highscore will be sent later", (150, 90, 0), None, 0, 0, 12)
+        self.request_posted_successfully = False
+        self.render_queued_notice = False
+        self.submission_id = None
+
+    def reset(self, time: float):
         self.player_name = ""
         self.time = time
         self.render_length_warning = False
         self.render_fail_warning = False
-        self.length_warning = freetype.render("Name cannot be empty!", (150, 0, 0), None, 0, 0, 12)
-        self.fail_warning = freetype.render("A problem occurred with the request", (150, 0, 0), None, 0, 0, 12)
-        self.success_notification = freetype.render("Your highscore has been submitted!", (0, 150, 0), None, 0, 0, 12)
-        self.input_instructions = freetype.render("Enter your name below:", (50, 50, 50), None, 0, 0, 12)
-        self.submission_instructions = freetype.render("Press Enter to submit or Esc to go back", (50, 50, 50), None, 0, 0, 8)
         self.request_posted_successfully = False
+        self.render_queued_notice = False
+        self.submission_id = None
 
     def handle_events(self):
         for event in pg.event.get():
@@ -642,48 +873,40 @@ class LeaderboardSubmissionScene(Scene):
                         self.render_length_warning = True
                     else:
                         self.render_length_warning = False
-                        # Useragent is here to validate requests
-                        if not self.request_posted_successfully:
-                            def pad(string_or_number):
-                                pad_length = (16 - (len(str(string_or_number)) % 16)) % 16
-                                output = (str(string_or_number) + (str(chr(pad_length)) * pad_length)).encode("utf-8")
-                                return output
-                            
-                            try:
-                                encryptor = AES.new("u8x/A?D(G+KaPdSgVkYp3s6v9y$B&E)H".encode("utf-8"),
-                                                    AES.MODE_CBC,
-                                                    "LoremIpsumDolorS".encode("utf-8"))
-                                post_request = requests.post('https://recursivesandwich-api.herokuapp.com/highscores',
-                                                             headers = {"User-Agent": "The Tower - Game Client"},
-                                                             data = {"user": encryptor.encrypt(pad(self.player_name)),
-                                                                     "time": encryptor.encrypt(pad(self.time))
-                                                                     }
-                                                             )
-                                if post_request.status_code == 201:
-                                    self.request_posted_successfully = True
-                                    self.render_fail_warning = False
-                                else:
-                                    self.render_fail_warning = True
-                            except requests.RequestException:
-                                self.render_fail_warning = True
+                        # The score is queued on disk and sent in the background. Progress
+                        # is reported through SCORE_SUBMISSION_UPDATED events.
+                        if self.submission_id is None:
+                            self.render_fail_warning = False
+                            self.submission_id = score_submitter.submit(self.player_name, self.time)
                 elif event.key == pg.K_ESCAPE:
                     self.manager.go_to_previous_scene()
-                    if self.request_posted_successfully:
+                    # A score that is still being sent, or was rejected, can be submitted again later
+                    if self.request_posted_successfully or self.render_queued_notice:
                         # TODO: modify previous state
                         self.manager.scene.change_menu_upon_successful_submission()
-                        self.manager.scene.fetch_leaderboard()
+                        self.manager.scene.fetch_leaderboard(force=True)
                         self.manager.scene.submitted = True
+                elif self.submission_id is not None:
+                    # The name cannot be changed once the score has been submitted
+                    pass
                 elif event.key == pg.K_BACKSPACE:
                     # array slicing is safe from null pointers
                     self.player_name = self.player_name[:-1]
                 else:
                     self.player_name += event.unicode
+            elif event.type == GameEvent.SCORE_SUBMISSION_UPDATED.value and event.submission_id == self.submission_id:
+                self.request_posted_successfully = event.status == SUBMISSION_SENT
+                self.render_queued_notice = event.status == SUBMISSION_RETRYING
+                self.render_fail_warning = not (self.request_posted_successfully or self.render_queued_notice)
+                if self.render_fail_warning:
+                    # The server rejected the score, so the name can be changed and the score submitted again
+                    self.submission_id = None
 
     def update(self, *args):
         pass
 
     def render(self, surface: pg.Surface):
-        name_display = freetype.render(self.player_name, (0, 0, 0), None, 0, 0, 24)
+        name_display = get_font().render(self.player_name, (0, 0, 0), None, 0, 0, 24)
 
         self.game_display.fill((235, 235, 235))
 
@@ -720,11 +943,23 @@ class LeaderboardSubmissionScene(Scene):
                                    (int((self.game_display.get_width() - self.success_notification[0].get_width()) / 2),
                                     int((self.game_display.get_height() - self.success_notification[0].get_height()) / 2) + 50)
                                    )
+        elif self.render_queued_notice:
+            self.game_display.blit(self.queued_notice[0],
+                                   (int((self.game_display.get_width() - self.queued_notice[0].get_width()) / 2),
+                                    int((self.game_display.get_height() - self.queued_notice[0].get_height()) / 2) + 50)
+                                   )
+        elif self.submission_id is not None:
+            self.game_display.blit(self.sending_notification[0],
+                                   (int((self.game_display.get_width() - self.sending_notification[0].get_width()) / 2),
+                                    int((self.game_display.get_height() - self.sending_notification[0].get_height()) / 2) + 50)
+                                   )
 
         surface.blit(pg.transform.scale(self.game_display, WINDOW_SIZE), (0, 0))
 
 
 class PauseScene(Scene):
+    is_static = True
+
     def __init__(self):
         super().__init__()
         self.menu = Menu(20,
@@ -732,13 +967,21 @@ class PauseScene(Scene):
                          ("RESUME", lambda: pg.event.post(pg.event.Event(GameEvent.GAME_RESUME.value)), (170, 120)),
                          ("QUIT", lambda: pg.event.post(pg.event.Event(pg.QUIT)), (170, 160)))
 
+    def reset(self):
+        self.menu.reset()
+
+    def on_enter(self):
+        music_player.pause()
+
+    def on_exit(self):
+        music_player.unpause()
+
     def handle_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT:
                 pg.quit()
                 quit()
             elif event.type == GameEvent.GAME_RESUME.value:
-                pg.mixer.music.unpause()
                 self.manager.go_to_previous_scene()
             elif event.type == pg.KEYDOWN:
                 if event.key == pg.K_F4 and (event.mod & pg.KMOD_ALT):
@@ -774,6 +1017,9 @@ class FadeOutScene(Scene):
         self.game_display.fill((0, 0, 0))
         self.game_display.set_alpha(50)
 
+    def reset(self):
+        self.counter = 30
+
     def handle_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT:
@@ -796,7 +1042,7 @@ class FadeOutScene(Scene):
                                                              self.manager.scene.camera)
 
             if not self.manager.scene.level_manager.is_game_complete():
-                self.manager.switch_to_scene(LoadingScene())
+                self.manager.switch_to(LoadingScene)
 
     def render(self, surface: pg.Surface):
         surface.blit(pg.transform.scale(self.game_display, WINDOW_SIZE), (0, 0))
@@ -805,10 +1051,13 @@ class FadeOutScene(Scene):
 class LoadingScene(Scene):
     def __init__(self):
         super().__init__()
-        self.text = freetype.render("Loading...", (255, 255, 255))
+        self.text = get_font().render("Loading...", (255, 255, 255))
         self.text_blit_position = (int((self.game_display.get_width() - self.text[0].get_width()) / 2), 200)
         self.wait_frames = 90
 
+    def reset(self):
+        self.wait_frames = 90
+
     def handle_events(self):
         for event in pg.event.get():
             if event.type == pg.QUIT:
@@ -819,14 +1068,14 @@ class LoadingScene(Scene):
                     pg.quit()
                     quit()
             elif event.type == GameEvent.GAME_COMPLETE.value:
-                self.manager.switch_to_scene(GameBeatenScene())
+                self.manager.switch_to(GameBeatenScene, self.manager.scene_stack[-2].score_timer.tick() / 1000)
 
     def update(self, delta_time):
         if self.wait_frames > 0:
             self.wait_frames -= 1
         else:
             self.manager.go_to_previous_scene()
-            self.manager.switch_to_scene(FadeInScene(self.manager.scene))
+            self.manager.switch_to(FadeInScene, self.manager.scene)
 
     def render(self, surface: pg.Surface):
         self.game_display.fill((0, 0, 0))
@@ -836,11 +1085,16 @@ class LoadingScene(Scene):
 
 
 class FadeInScene(Scene):
-    def __init__(self, previous_scene):
+    def __init__(self):
         super().__init__()
         self.counter = 15
         self.game_display.fill((0, 0, 0))
         self.game_display.set_alpha(255)
+        self.previous_scene = None
+
+    def reset(self, previous_scene):
+        self.counter = 15
+        self.game_display.set_alpha(255)
         self.previous_scene = previous_scene
 
     def handle_events(self):
@@ -860,6 +1114,10 @@ class FadeInScene(Scene):
         else:
             self.manager.go_to_previous_scene()
 
+    def on_exit(self):
+        # Drops the scene faded into, so that the registered instance does not keep it alive
+        self.previous_scene = None
+
     def render(self, surface: pg.Surface):
         # Basically render the previous scene and then render the overlay over it
         self.previous_scene.render(surface)
@@ -0,0 +1,124 @@
+import atexit
+import gc
+import os
+import sys
+import time
+from .pools import count_pooled_objects
+
+"""
+* =============================================================== *
+* This module contains the GCPolicy, which moves the work of the  *
+* garbage collector out of gameplay and into level loads, and     *
+* reports the collections and allocations of every level.         *
+* =============================================================== *
+
+FREEZING
+-------------------------
+Most of the objects of the game live for the whole session, such as the modules, the sprite sheets,
+animations and textures of the Library, and the sound bank. A full collection would scan all of them, so
+they are frozen with gc.freeze() instead, which moves them out of the reach of the collector:
+    freeze()            ->      called by main.py once the assets are loaded at startup. Collects, then
+                                freezes every object alive.
+    begin_level_load()  ->      called by LevelManager once the previous level has been released to the
+                                pools. Collects, so that the garbage of the previous level is freed while
+                                the screen is faded out, rather than by a collection during play.
+
+Objects are never unfrozen, as gc.unfreeze() would also unfreeze the assets, and a full collection of
+them takes longer than loading a level. The objects of a level are short-lived in comparison, so they
+are left to the collector, which only has to scan them.
+
+Frozen objects that become garbage are still freed as soon as nothing refers to them, but garbage in
+reference cycles is never collected, so nothing that is frozen should be discarded during the session.
+
+REPORTING
+-------------------------
+Set the TOWER_GC_STATS environment variable to report, to stderr:
+    after every load            ->      the time taken, the net number of memory blocks allocated by Python,
+                                        the objects created and reused by the pools of pools.py, and the
+                                        collections and their pauses during the load, including the one
+                                        of the previous level
+    at the end of every level   ->      the collections of every generation during play, and their total and
+                                        longest pauses
+"""
+
+GC_STATS_VARIABLE = "TOWER_GC_STATS"
+
+
+class GCPolicy:
+    """Freezes the objects that live for the whole session, collects between levels, and times every
+    collection if enabled"""
+
+    def __init__(self, enabled=None):
+        """Creates a GCPolicy.
+
+        :param enabled:     Overrides the TOWER_GC_STATS environment variable if not None.
+        """
+
+        self.enabled = bool(os.environ.get(GC_STATS_VARIABLE)) if enabled is None else enabled
+        self.level_name = "startup"
+        self.collection_counts = [0, 0, 0]          # Collections of each generation since the last reset
+        self.total_pause = 0
+        self.longest_pause = 0
+        self.collection_start = 0
+        self.load_start = None                      # Time, allocated blocks and pool counts at the start of a load
+        if self.enabled:
+            gc.callbacks.append(self.on_collection)
+            atexit.register(self.report_level)
+
+    def on_collection(self, phase: str, info: dict):
+        if phase == "start":
+            self.collection_start = time.perf_counter()
+            return
+        pause = time.perf_counter() - self.collection_start
+        self.collection_counts[info["generation"]] += 1
+        self.total_pause += pause
+        self.longest_pause = max(self.longest_pause, pause)
+
+    def reset_collections(self):
+        self.collection_counts = [0, 0, 0]
+        self.total_pause = 0
+        self.longest_pause = 0
+
+    def freeze(self):
+        """Collects, then freezes every object alive"""
+        gc.collect()
+        gc.freeze()
+
+    def begin_level_load(self, name: str):
+        """Reports the previous level, then collects its garbage before the given level is loaded"""
+        if self.enabled:
+            self.report_level()
+            self.reset_collections()
+            self.level_name = name
+        gc.collect()
+        if self.enabled:
+            created_count, reused_count = count_pooled_objects()
+            self.load_start = (time.perf_counter(), sys.getallocatedblocks(), created_count, reused_count)
+
+    def end_level_load(self):
+        """Reports the load once the level has been loaded"""
+        if self.enabled and self.load_start is not None:
+            self.report_load()
+            self.reset_collections()
+
+    def report_load(self, stream=sys.stderr):
+        start_time, start_blocks, start_created_count, start_reused_count = self.load_start
+        created_count, reused_count = count_pooled_objects()
+        print("[gc] %s loaded in %.1f ms: %+d blocks allocated, %d pooled objects reused, %d created, "
+              "%d objects frozen" % (self.level_name, (time.perf_counter() - start_time) * 1000,
+                                     sys.getallocatedblocks() - start_blocks, reused_count - start_reused_count,
+                                     created_count - start_created_count, gc.get_freeze_count()), file=stream)
+        self.report_collections("load", stream)
+
+    def report_level(self, stream=sys.stderr):
+        print("[gc] %s:" % self.level_name, file=stream)
+        self.report_collections("play", stream)
+
+    def report_collections(self, label: str, stream=sys.stderr):
+        print("[gc]     %-6s %3d collections (%d/%d/%d), %.2f ms total, %.2f ms longest" % (
+            label, sum(self.collection_counts), *self.collection_counts, self.total_pause * 1000,
+            self.longest_pause * 1000), file=stream)
+
+
+# The GC policy shared by the whole game
+gc_policy = GCPolicy()
@@ -1,5 +1,7 @@
 import pygame as pg
-import pygame.freetype as ft
+from .runtime import get_font
+from .assets import load_image
+from .counters import counters
 
 """
 * =============================================================== *
@@ -15,28 +17,34 @@ class HeadsUpDisplay:
         # self.vignette = Vignette()
         self.healthbar = Healthbar()
         self.fps_counter = FPSCounter()
+        self.counters_panel = CountersPanel() if counters.enabled else None
 
     def update(self, delta_time, player, camera):
         """Updates all the elements of the HUD"""
         # self.vignette.update(player, camera)
         self.healthbar.update(player)
         self.fps_counter.update(delta_time)
+        if self.counters_panel is not None:
+            self.counters_panel.update(delta_time)
 
     def render(self, surface):
         """Renders the elements of the HUD onto the specified surface"""
         # self.vignette.render(surface)
         self.healthbar.render(surface)
         self.fps_counter.render(surface)
+        if self.counters_panel is not None:
+            self.counters_panel.render(surface)
 
 
 class Healthbar:
     """Tracks the current health of the player"""
     def __init__(self):
         # image is 49*17, while decoration is 64 * 17. Original offset is 14
-        self.healthbar = pg.image.load("assets/textures/hud/health_bar.png").convert()
+        self.healthbar = load_image("assets/textures/hud/health_bar.png").convert()
         self.healthbar.set_colorkey((0, 0, 0))
 
-        self.healthbar_frame = pg.image.load("assets/textures/hud/health_bar_decoration.png")
+        # Copied, as the colour key would otherwise be set on the image shared by every caller of load_image()
+        self.healthbar_frame = load_image("assets/textures/hud/health_bar_decoration.png").copy()
         self.healthbar_frame.set_colorkey((0, 0, 0))
 
         self.image_offset = 14
@@ -55,8 +63,7 @@ class Healthbar:
 class FPSCounter:
     """Tracks the FPS of the game"""
     def __init__(self):
-        self.freetype = ft.Font("assets/fonts/pixChicago.ttf", 8)   # size must be set to 8, otherwise AA kicks in
-        self.freetype.antialiased = False
+        self.freetype = get_font()
         self.fps = self.freetype.render("0", (150, 100, 100), None, 0, 0, 8)
         # Variables for calculating FPS
         self.time_counter = 0
@@ -78,6 +85,27 @@ class FPSCounter:
         surface.blit(self.fps[0], (355, 20))
 
 
+class CountersPanel:
+    """Shows the hot path counters of the last frame, when counting is enabled"""
+    def __init__(self):
+        self.freetype = get_font()
+        self.lines = []
+        self.time_counter = 0.5
+
+    def update(self, delta_time):
+        """Renders the counts of the last frame again every 0.5 seconds"""
+        self.time_counter += delta_time
+        if self.time_counter > 0.5:
+            self.time_counter = 0
+            self.lines = [self.freetype.render("%s: %d" % (name, count), (150, 100, 100))
+                          for name, count in sorted(counters.last_frame_counts.items())]
+
+    def render(self, surface):
+        """Renders the counts below the FPS counter, aligned to the right edge of the specified surface"""
+        for i, line in enumerate(self.lines):
+            surface.blit(line[0], (surface.get_width() - 15 - line[0].get_width(), 35 + i * 12))
+
+
 class Vignette:
     """Limits the vision of the player"""
     # Since this is a post-process
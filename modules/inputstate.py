@@ -0,0 +1,67 @@
+import pygame as pg
+
+"""
+* =============================================================== *
+* This module contains the InputState, which samples the keyboard *
+* once per tick, so that everything that reads the keys during    *
+* the tick agrees on which keys are held down.                    *
+* =============================================================== *
+
+SAMPLING
+-------------------------
+The game loop calls sample() once per tick, after the scene has processed the event queue, as SDL only
+updates the state of the keyboard when events are pumped. Everything that reads the keys afterwards reads
+the sampled state instead of calling pg.key.get_pressed():
+    held[key]               ->      whether the key is held down during this tick
+    is_held(key)            ->      the same as held[key]
+    was_pressed(key)        ->      whether the key went down since the previous tick
+    was_released(key)       ->      whether the key went up since the previous tick
+
+SOURCES
+-------------------------
+The keys are sampled from a source, which is any function that returns the state of the keys, indexed by
+key, in the manner of pg.key.get_pressed(). The keyboard is the default source. Scripted or recorded
+inputs are played back by replacing it with set_source(), as the benchmark of dev_modules/benchmark.py
+does, so that every consumer sees the same inputs on every run.
+
+As the state of the previous tick is kept to find the keys that changed, a source must return a new state
+on every call, as pg.key.get_pressed() does, rather than update and return the same one.
+"""
+
+
+class NoKeysHeld:
+    """The state of the keys before the first sample, in which no key is held down"""
+
+    def __getitem__(self, key) -> bool:
+        return False
+
+
+class InputState:
+    """The state of the keys during the current tick, and the changes since the previous tick"""
+
+    def __init__(self, source=pg.key.get_pressed):
+        self.source = source
+        self.held = NoKeysHeld()
+        self.previously_held = self.held
+
+    def set_source(self, source):
+        """Samples the keys from the given source from the next tick onwards"""
+        self.source = source
+
+    def sample(self):
+        """Samples the keys for the current tick. Must be called exactly once per tick."""
+        self.previously_held = self.held
+        self.held = self.source()
+
+    def is_held(self, key) -> bool:
+        return self.held[key]
+
+    def was_pressed(self, key) -> bool:
+        return self.held[key] and not self.previously_held[key]
+
+    def was_released(self, key) -> bool:
+        return self.previously_held[key] and not self.held[key]
+
+
+# The input state shared by the whole game
+input_state = InputState()
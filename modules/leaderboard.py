@@ -0,0 +1,351 @@
+import json
+import os
+import threading
+import time
+import uuid
+import pygame as pg
+from .entitystate import GameEvent
+from .runtime import get_user_data_path
+
+"""
+* =============================================================== *
+* This module contains the LeaderboardClient, which fetches the   *
+* top ten highscores from the server, and the ScoreSubmitter,     *
+* which sends new highscores to it. Neither blocks the game.      *
+* =============================================================== *
+
+FETCHING
+-------------------------
+fetch() starts a request on a background thread and returns immediately. When the request finishes,
+a GameEvent.LEADERBOARD_FETCHED event is posted to the event queue with the attributes:
+    entries             ->          list of {"user": str, "time": float}, or None if there is nothing to show
+    is_stale            ->          True if the entries are from the cache because the server could not be reached
+
+Requests time out after CONNECT_TIMEOUT seconds without a connection, or READ_TIMEOUT seconds without data.
+
+CACHING
+-------------------------
+The last board received is kept in memory and in leaderboard.json in the user data directory, along
+with its ETag. While it is younger than CACHE_TTL seconds, fetch() posts it straight away without
+making a request. After that, the request asks the server to reply with 304 Not Modified if the
+board has not changed, in which case the cached board is used and nothing is downloaded.
+
+The cache on disk is what is shown when the server cannot be reached, so the board is still visible
+offline as long as it has been fetched once before.
+
+SUBMITTING
+-------------------------
+submit() appends the score to submissions.jsonl in the user data directory and returns at once. A
+background sender posts every queued score to the server, one after another over a single kept-alive
+connection, and removes each one from the file once the server has accepted it. Scores left in the
+file are sent the next time the game starts.
+
+If the server cannot be reached, or fails with a 5xx status, the sender waits before trying again,
+doubling the wait after every failure up to MAX_RETRY_DELAY seconds. Submitting another score ends the
+wait and starts the backoff over. Any other status means the server will never accept the score, so it
+is dropped.
+
+After every attempt, a GameEvent.SCORE_SUBMISSION_UPDATED event is posted with the attributes:
+    submission_id       ->          the id returned by submit()
+    status              ->          SUBMISSION_SENT, SUBMISSION_RETRYING or SUBMISSION_REJECTED
+
+The user and time fields are encrypted with AES-CBC, as expected by the server. Both fields are
+encrypted by the same cipher, so the time is chained onto the end of the user.
+"""
+
+# Set TOWER_HIGHSCORES_URL to use another server, such as dev_modules/highscoreserver.py
+HIGHSCORES_URL_VARIABLE = "TOWER_HIGHSCORES_URL"
+HIGHSCORES_URL = os.environ.get(HIGHSCORES_URL_VARIABLE, "https://recursivesandwich-api.herokuapp.com/highscores")
+USER_AGENT = "The Tower - Game Client"
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 5
+CACHE_TTL = 60
+CACHE_FILENAME = "leaderboard.json"
+
+ENCRYPTION_KEY = "u8x/A?D(G+KaPdSgVkYp3s6v9y$B&E)H".encode("utf-8")
+ENCRYPTION_IV = "LoremIpsumDolorS".encode("utf-8")
+
+SUBMISSION_QUEUE_FILENAME = "submissions.jsonl"
+FIRST_RETRY_DELAY = 2
+MAX_RETRY_DELAY = 300
+
+SUBMISSION_SENT = "sent"
+SUBMISSION_RETRYING = "retrying"
+SUBMISSION_REJECTED = "rejected"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the requests.Session shared by every request to the server, which keeps connections alive.
+    The networking stack is only imported once the first request is made."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            _session = requests.Session()
+            _session.headers["User-Agent"] = USER_AGENT
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def pad(string_or_number) -> bytes:
+    """Pads the UTF-8 encoding of the value to a whole number of AES blocks, PKCS#7 style"""
+    data = str(string_or_number).encode("utf-8")
+    pad_length = (16 - (len(data) % 16)) % 16
+    return data + bytes([pad_length]) * pad_length
+
+
+def encrypt_score(user: str, score_time: float) -> dict:
+    """Returns the form fields of a highscore submission"""
+    from Crypto.Cipher import AES
+
+    encryptor = AES.new(ENCRYPTION_KEY, AES.MODE_CBC, ENCRYPTION_IV)
+    return {"user": encryptor.encrypt(pad(user)),
+            "time": encryptor.encrypt(pad(score_time))}
+
+
+def unpad(data: bytes) -> bytes:
+    """Reverses pad(), in the same way as the server"""
+    pad_length = data[-1] if data else 0
+    if 0 < pad_length <= 16 and data.endswith(bytes([pad_length]) * pad_length):
+        return data[:-pad_length]
+    return data
+
+
+def decrypt_score(fields: dict) -> tuple:
+    """Reverses encrypt_score(), returning the user and the time"""
+    from Crypto.Cipher import AES
+
+    decryptor = AES.new(ENCRYPTION_KEY, AES.MODE_CBC, ENCRYPTION_IV)
+    user = unpad(decryptor.decrypt(fields["user"])).decode("utf-8")
+    score_time = float(unpad(decryptor.decrypt(fields["time"])).decode("utf-8"))
+    return user, score_time
+
+
+class LeaderboardClient:
+    """Fetches the leaderboard on a background thread and caches it in memory and on disk"""
+
+    def __init__(self, url=HIGHSCORES_URL):
+        self.url = url
+        self.entries = None
+        self.etag = None
+        self.fetched_at = None      # time.time() of the last response from the server
+        self.is_cache_loaded = False
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def get_entries(self):
+        """Returns the most recent entries available without making a request, or None if there are none"""
+        with self.lock:
+            self.load_cache()
+            return self.entries
+
+    def is_fresh(self) -> bool:
+        return self.fetched_at is not None and time.time() - self.fetched_at < CACHE_TTL
+
+    def fetch(self, force=False):
+        """Posts the leaderboard in a LEADERBOARD_FETCHED event, requesting it from the server unless the
+        cached board is fresh. If force is True, the cached board is always revalidated with the server."""
+        with self.lock:
+            self.load_cache()
+            if not force and self.is_fresh():
+                self.post(self.entries, False)
+                return
+            if self.thread is not None and self.thread.is_alive():
+                # The request in flight will post its own event
+                return
+            self.thread = threading.Thread(target=self.fetch_from_server, name="leaderboard", daemon=True)
+            self.thread.start()
+
+    def fetch_from_server(self):
+        import requests
+
+        headers = {}
+        with self.lock:
+            cached_entries = self.entries
+            if self.etag is not None and cached_entries is not None:
+                headers["If-None-Match"] = self.etag
+
+        try:
+            response = get_session().get(self.url, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            if response.status_code == 304:
+                entries = cached_entries
+            else:
+                response.raise_for_status()
+                entries = [{"user": str(entry["user"]), "time": float(entry["time"])} for entry in response.json()]
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            self.post(cached_entries, True)
+            return
+
+        with self.lock:
+            self.entries = entries
+            self.etag = response.headers.get("ETag", self.etag)
+            self.fetched_at = time.time()
+            self.save_cache()
+        self.post(entries, False)
+
+    @staticmethod
+    def post(entries, is_stale: bool):
+        pg.event.post(pg.event.Event(GameEvent.LEADERBOARD_FETCHED.value, entries=entries, is_stale=is_stale))
+
+    def load_cache(self):
+        """Reads the cache on disk, once. Must be called with the lock held."""
+        if self.is_cache_loaded:
+            return
+        self.is_cache_loaded = True
+        try:
+            with open(get_user_data_path(CACHE_FILENAME)) as f:
+                cache = json.load(f)
+            self.entries = cache["entries"]
+            self.etag = cache["etag"]
+            self.fetched_at = cache["fetched_at"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save_cache(self):
+        """Writes the cache on disk. Must be called with the lock held."""
+        cache = {"entries": self.entries, "etag": self.etag, "fetched_at": self.fetched_at}
+        try:
+            with open(get_user_data_path(CACHE_FILENAME), "w") as f:
+                json.dump(cache, f)
+        except OSError:
+            pass
+
+
+class ScoreSubmitter:
+    """Queues highscores on disk and sends them to the server from a background thread"""
+
+    def __init__(self, url=HIGHSCORES_URL):
+        self.url = url
+        self.lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.thread = None
+        self.retry_delay = FIRST_RETRY_DELAY    # Only read and written by the sender thread
+
+    def get_queue_path(self) -> str:
+        return get_user_data_path(SUBMISSION_QUEUE_FILENAME)
+
+    def start(self):
+        """Starts the sender, which first sends any scores left in the queue by a previous run"""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="score-submitter", daemon=True)
+                self.thread.start()
+
+    def submit(self, user: str, score_time: float) -> str:
+        """Adds the score to the queue and returns its submission id"""
+        submission = {"id": uuid.uuid4().hex, "user": user, "time": score_time}
+        with self.lock:
+            with open(self.get_queue_path(), "a") as f:
+                f.write(json.dumps(submission) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.start()
+        self.wake_event.set()
+        return submission["id"]
+
+    def get_pending(self) -> list:
+        """Returns every submission still in the queue. A line cut short by a crash is ignored."""
+        submissions = []
+        with self.lock:
+            try:
+                with open(self.get_queue_path()) as f:
+                    for line in f:
+                        try:
+                            submissions.append(json.loads(line))
+                        except ValueError:
+                            pass
+            except OSError:
+                pass
+        return submissions
+
+    def remove(self, submission_ids):
+        """Removes the given submissions from the queue, keeping any that were added in the meantime"""
+        with self.lock:
+            queue_path = self.get_queue_path()
+            try:
+                with open(queue_path) as f:
+                    lines = f.readlines()
+            except OSError:
+                return
+            kept_lines = []
+            for line in lines:
+                try:
+                    if json.loads(line)["id"] in submission_ids:
+                        continue
+                except (ValueError, KeyError):
+                    continue
+                kept_lines.append(line)
+            temporary_path = queue_path + ".tmp"
+            with open(temporary_path, "w") as f:
+                f.writelines(kept_lines)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary_path, queue_path)
+
+    def run(self):
+        while True:
+            pending = self.get_pending()
+            if not pending:
+                self.wake_event.wait()
+                self.wake_event.clear()
+                continue
+
+            if self.send_all(pending):
+                self.retry_delay = FIRST_RETRY_DELAY
+            else:
+                # Wait before trying again, unless a new score is submitted in the meantime, in which case the
+                # backoff starts over
+                if self.wake_event.wait(self.retry_delay):
+                    self.retry_delay = FIRST_RETRY_DELAY
+                else:
+                    self.retry_delay = min(self.retry_delay * 2, MAX_RETRY_DELAY)
+                self.wake_event.clear()
+
+    def send_all(self, pending) -> bool:
+        """Sends the submissions in order over one connection, stopping at the first one that can be
+        retried. Returns True if every submission was either accepted or rejected."""
+        import requests
+
+        finished_ids = set()
+        is_complete = True
+        for submission in pending:
+            try:
+                response = get_session().post(self.url,
+                                              data=encrypt_score(submission["user"], submission["time"]),
+                                              timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                status_code = response.status_code
+            except requests.RequestException:
+                status_code = None
+
+            if status_code == 201:
+                status = SUBMISSION_SENT
+            elif status_code is None or status_code >= 500:
+                status = SUBMISSION_RETRYING
+            else:
+                status = SUBMISSION_REJECTED
+
+            self.post(submission["id"], status)
+            if status == SUBMISSION_RETRYING:
+                is_complete = False
+                break
+            finished_ids.add(submission["id"])
+
+        if finished_ids:
+            self.remove(finished_ids)
+        return is_complete
+
+    @staticmethod
+    def post(submission_id: str, status: str):
+        pg.event.post(pg.event.Event(GameEvent.SCORE_SUBMISSION_UPDATED.value,
+                                     submission_id=submission_id, status=status))
+
+
+# The leaderboard client and score submitter shared by the whole game
+leaderboard_client = LeaderboardClient()
+score_submitter = ScoreSubmitter()
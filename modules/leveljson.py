@@ -1,11 +1,22 @@
+import math
 import pygame as pg
-import json
-from modules.block import Block, FallingBlock, PushableBlock, LadderBlock, SpikeBlock, GatewayBlock, Coin
-from modules.entities import Enemy, PinkGuy, TrashMonster, ToothWalker
+from modules.block import Block, FallingBlock, PushableBlock, LadderBlock, SpikeBlock, GatewayBlock, Coin, \
+    block_pools
+from modules.entities import PinkGuy, TrashMonster, ToothWalker, ENEMY_COMPONENTS, ENEMY_MUTABLE_COMPONENTS, \
+    add_enemy
 from modules.entitystate import GameEvent, EntityState
-from modules.component import RenderComponent
-from modules.physics import AIControlComponent
-from modules.textureset import TextureSet
+from modules.ecs import Archetype, World, AISystem, GravitySystem, CombatSystem, RigidBodySystem, \
+    AnimationSystem, DeathSystem, RenderSystem
+from modules.textureset import TextureSet, TerrainType
+from modules.libraries import Library
+from modules.pools import rect_pool
+from modules.assets import load_json, asset_exists, is_asset_directory
+from modules.sound import sound_bank
+from modules.telemetry import telemetry
+from modules.counters import counters, BLITS, INTERACTIVE_UPDATES
+from modules.memorydiagnostics import memory_diagnostics
+from modules.gcpolicy import gc_policy
+from modules.quality import quality_governor, get_area_around
 
 """
 * =============================================================== *
@@ -39,15 +50,67 @@ Below are some editor tricks within PyCharm to edit multiple blocks at once
         Makes editing quicker for multiple lines, although you don't have as much control over 
         where to edit.
 
+CHUNKED LEVELS
+-------------------------
+Very large levels can be split into fixed-size chunks with dev_modules/chunkbuilder.py, which writes a
+directory next to the JSON file (e.g. assets/levels/level24/). LevelManager prefers the directory over the
+JSON file if both exist. The directory contains:
+        manifest.json       ->          The starting position of the level, the size of the map in tiles,
+                                        the chunk size and the list of chunks that have tiles or enemies
+        chunk_X_Y.json      ->          The three map layers of the chunk in column X and row Y, and the
+                                        enemies whose coordinates lie in it
+
+TILEMAP
+-------------------------
+Static tiles, such as floors, walls and decorations, are not sprites. Each layer of the map is stored in
+the Tilemap as a 2-dimensional array of tile IDs, one byte per cell in row order, and every tile ID
+refers to a TileType holding the scaled image and the extent shared by all tiles with that code. Only
+the codes in INTERACTIVE_CODES are instantiated as Blocks. Rendering and collisions only look at the
+cells around the camera or the colliding rect, so their cost does not grow with the size of the map.
+
 """
 
+# Terrain codes that are instantiated as interactive objects rather than stored in the Tilemap
+INTERACTIVE_CODES = ("FB", "LB", "PB", "SP", "GW", "CN")
+
+# Layers of the Tilemap, from the backmost to the frontmost
+TILEMAP_LAYERS = ("background", "decorations", "terrain")
+# Layers drawn by the quality tiers that skip the decorations, see modules/quality.py
+UNDECORATED_TILEMAP_LAYERS = ("background", "terrain")
+EMPTY_CODE = "  "
+
+CHUNK_MANIFEST_FILENAME = "manifest.json"
+
+
+def get_chunk_filename(column: int, row: int) -> str:
+    return "chunk_%d_%d.json" % (column, row)
+
+
 
 class LevelManager:
     def __init__(self):
-        self.level = Level("assets/levels/level1.json")
+        self.begin_level("level1")
+        self.level = Level(LevelManager.get_level_filepath(1))
+        gc_policy.end_level_load()
         self.current_level = 1
         self.number_of_levels = 24
 
+    @staticmethod
+    def begin_level(name: str):
+        """Tells the GC policy, the sound bank and the diagnostics that the named level is about to load"""
+        gc_policy.begin_level_load(name)
+        sound_bank.begin_level(name)
+        counters.begin_level(name)
+        memory_diagnostics.begin_level(name)
+
+    @staticmethod
+    def get_level_filepath(level_num: int) -> str:
+        """Returns the path to the chunked directory of the level if it has been built, or its JSON file otherwise"""
+        chunked_directory = "assets/levels/level" + str(level_num)
+        if asset_exists(chunked_directory + "/" + CHUNK_MANIFEST_FILENAME):
+            return chunked_directory
+        return chunked_directory + ".json"
+
     def load_next_level(self, player, camera):
         self.current_level += 1
         if self.current_level > self.number_of_levels:
@@ -58,7 +121,10 @@ class LevelManager:
             )
             return
 
-        self.level = Level("assets/levels/level" + str(self.current_level) + ".json")
+        self.unload_level()
+        self.begin_level("level" + str(self.current_level))
+        self.level = Level(LevelManager.get_level_filepath(self.current_level))
+        gc_policy.end_level_load()
         player.rect.x = self.level.starting_position[0]
         player.rect.y = self.level.starting_position[1]
         camera.snap_to_target(player)
@@ -66,163 +132,711 @@ class LevelManager:
 
     def load_level(self, level_num: int, player, camera):
         self.current_level = level_num
-        self.level = Level("assets/levels/level" + str(level_num) + ".json")
+        self.unload_level()
+        self.begin_level("level" + str(level_num))
+        self.level = Level(LevelManager.get_level_filepath(level_num))
+        gc_policy.end_level_load()
         player.rect.x = self.level.starting_position[0]
         player.rect.y = self.level.starting_position[1]
         camera.snap_to_target(player)
         camera.update_boundaries(self.level.map.rect)
 
+    def unload_level(self):
+        """Releases the objects of the current level to their pools, so that the next level reuses them"""
+        self.level.release()
+        self.level = None
+
     def is_game_complete(self):
         return self.current_level > self.number_of_levels
 
 
 class Level:
     def __init__(self, filepath: str):
-        # loads the json file from the specified filepath
-        with open(filepath) as f:
-            data = json.load(open(filepath))
+        if is_asset_directory(filepath):
+            # Chunked levels only load their manifest up front, and stream the map and its enemies in as the
+            # camera moves
+            data = load_json(filepath + "/" + CHUNK_MANIFEST_FILENAME)
+            self.enemies = EnemyManager([])
+            self.map = StreamingMap(filepath, data, data["starting_position"], self.enemies)
+        else:
+            # loads the json file from the specified filepath
+            data = load_json(filepath)
+            self.map = Map(data["map"])
+            self.enemies = EnemyManager(data["enemies"])
 
-        self.enemies = EnemyManager(data["enemies"])
-        self.map = Map(data["map"])
         self.starting_position = data["starting_position"]
 
+    def release(self):
+        """Releases the objects of the level to their pools once it is unloaded"""
+        self.map.release()
+        self.enemies.release()
+
     def update(self, delta_time, player):
         # TODO: rework update for map to send events instead
         self.enemies.update(delta_time, self.map, player)
+        telemetry.lap("enemies")
         self.map.update(player)
+        telemetry.lap("map update")
 
     def render(self, camera, surface):
         self.map.render(camera, surface)
+        telemetry.lap("tiles")
         self.enemies.render(camera, surface)
+        telemetry.lap("enemy render")
+
+
+class TileType:
+    """The image and the extent of a static tile, shared by every tile of the map with the same code"""
+    __slots__ = ("code", "width", "height", "image", "offset_x", "offset_y", "margin")
+
+    def __init__(self, code: str, type_object: TerrainType):
+        self.code = code
+        self.width = int(type_object.block_width * Block.BLOCK_SIZE)
+        self.height = int(type_object.block_height * Block.BLOCK_SIZE)
+        self.image = type_object.get_scaled_image(Block.BLOCK_SIZE)
+        self.offset_x = int(type_object.block_pos_x * Block.BLOCK_SIZE)
+        self.offset_y = int(type_object.block_pos_y * Block.BLOCK_SIZE)
+
+        # The number of cells beyond its own that the tile reaches into, in any direction
+        self.margin = max(0,
+                          math.ceil(-self.offset_x / Block.BLOCK_SIZE),
+                          math.ceil(-self.offset_y / Block.BLOCK_SIZE),
+                          math.ceil((self.offset_x + self.width) / Block.BLOCK_SIZE) - 1,
+                          math.ceil((self.offset_y + self.height) / Block.BLOCK_SIZE) - 1)
+
+    def place_rect(self, rect, column: int, row: int):
+        """Moves and resizes the given rect to the extent of the tile in the given cell"""
+        rect.update(column * Block.BLOCK_SIZE + self.offset_x,
+                    row * Block.BLOCK_SIZE + self.offset_y,
+                    self.width,
+                    self.height)
+
+
+class Tilemap:
+    """The static tiles of a map, stored as one 2-dimensional array of tile IDs per layer.
+
+    Each layer is a single bytearray holding one tile ID per cell, row by row, which indexes the tile type
+    table. ID 0 is an empty cell, so a map can use up to 255 distinct codes. Tile types are created from the
+    TextureSet the first time their code is used, and their image is shared by every tile of that type.
+    """
+
+    def __init__(self, columns: int, rows: int, texture_set: TextureSet):
+        self.columns = columns
+        self.rows = rows
+        self.texture_set = texture_set
+        self.tile_types = [None]        # Tile ID -> TileType, with None for empty cells
+        self.tile_ids = {}              # Code -> tile ID
+        self.layers = {layer: bytearray(columns * rows) for layer in TILEMAP_LAYERS}
+        # The furthest any tile of each layer reaches beyond its cell, which widens every search of the layer
+        self.margins = dict.fromkeys(TILEMAP_LAYERS, 0)
+        self.blit_tables = None         # The images and offsets of the tile types by tile ID, see get_blit_tables()
+        # The list and the rects returned by get_colliding_rects(), which every call reuses
+        self.colliding_rects = []
+        self.scratch_rects = []
+
+    def get_tile_id(self, code: str) -> int:
+        if code == EMPTY_CODE:
+            return 0
+        tile_id = self.tile_ids.get(code)
+        if tile_id is None:
+            tile_id = len(self.tile_types)
+            if tile_id > 255:
+                raise ValueError("a map cannot use more than 255 distinct codes")
+            self.tile_types.append(TileType(code, self.texture_set.get_texture_from_code(code)))
+            self.tile_ids[code] = tile_id
+            self.blit_tables = None
+        return tile_id
+
+    def get_blit_tables(self) -> tuple:
+        """Returns the lists of the images, x offsets and y offsets of the tile types, indexed by tile ID,
+        so that render() looks each up with a single index"""
+        if self.blit_tables is None:
+            tile_types = self.tile_types[1:]
+            self.blit_tables = ([None] + [tile_type.image for tile_type in tile_types],
+                                [0] + [tile_type.offset_x for tile_type in tile_types],
+                                [0] + [tile_type.offset_y for tile_type in tile_types])
+        return self.blit_tables
+
+    def get_code(self, layer: str, column: int, row: int) -> str:
+        tile_id = self.layers[layer][row * self.columns + column]
+        return self.tile_types[tile_id].code if tile_id else EMPTY_CODE
+
+    def set_tile(self, layer: str, column: int, row: int, code: str):
+        tile_id = self.get_tile_id(code)
+        self.layers[layer][row * self.columns + column] = tile_id
+        if tile_id:
+            self.margins[layer] = max(self.margins[layer], self.tile_types[tile_id].margin)
+
+    def set_layer(self, layer: str, codes: list, column_offset=0, row_offset=0, skipped_codes=()):
+        """Sets the tiles of a layer from a 2-dimensional array of codes, starting at the given cell.
+        Cells whose code is in skipped_codes are left empty."""
+        tile_ids = self.layers[layer]
+        used_ids = set()
+        for y, code_row in enumerate(codes):
+            row_ids = bytes(0 if code in skipped_codes else self.get_tile_id(code) for code in code_row)
+            start = (y + row_offset) * self.columns + column_offset
+            tile_ids[start:start + len(row_ids)] = row_ids
+            used_ids.update(row_ids)
+        used_ids.discard(0)
+        for tile_id in used_ids:
+            self.margins[layer] = max(self.margins[layer], self.tile_types[tile_id].margin)
+
+    def get_layer_codes(self, layer: str) -> list:
+        """Returns the layer as a 2-dimensional array of codes, as stored in level files"""
+        codes = [EMPTY_CODE] + [tile_type.code for tile_type in self.tile_types[1:]]
+        tile_ids = self.layers[layer]
+        return [[codes[tile_id] for tile_id in tile_ids[row * self.columns:(row + 1) * self.columns]]
+                for row in range(self.rows)]
+
+    def clear_region(self, first_column: int, first_row: int, columns: int, rows: int):
+        """Empties the cells of every layer in the given region"""
+        last_column = min(first_column + columns, self.columns)
+        empty_row = bytes(last_column - first_column)
+        for tile_ids in self.layers.values():
+            for row in range(first_row, min(first_row + rows, self.rows)):
+                tile_ids[row * self.columns + first_column:row * self.columns + last_column] = empty_row
+
+    def get_cell_range(self, layer: str, rect) -> tuple:
+        """Returns the (first column, first row, last column, last row) of the cells whose tiles
+        may overlap the given rect"""
+        margin = self.margins[layer]
+        return (max(rect.left // Block.BLOCK_SIZE - margin, 0),
+                max(rect.top // Block.BLOCK_SIZE - margin, 0),
+                min((rect.right - 1) // Block.BLOCK_SIZE + margin, self.columns - 1),
+                min((rect.bottom - 1) // Block.BLOCK_SIZE + margin, self.rows - 1))
+
+    def get_colliding_rects(self, rect) -> list:
+        """Returns the rects of the terrain tiles that overlap the given rect. The list and its rects are reused
+        by the next call, as collisions are queried several times per entity per tick, so they must not be
+        kept beyond it."""
+        tile_ids = self.layers["terrain"]
+        tile_types = self.tile_types
+        scratch_rects = self.scratch_rects
+        # The same as get_cell_range(), which this is called too often to afford
+        margin = self.margins["terrain"]
+        first_column = max(rect.left // Block.BLOCK_SIZE - margin, 0)
+        first_row = max(rect.top // Block.BLOCK_SIZE - margin, 0)
+        last_column = min((rect.right - 1) // Block.BLOCK_SIZE + margin, self.columns - 1)
+        last_row = min((rect.bottom - 1) // Block.BLOCK_SIZE + margin, self.rows - 1)
+        colliding_rects = self.colliding_rects
+        colliding_rects.clear()
+        for row in range(first_row, last_row + 1):
+            row_start = row * self.columns
+            row_ids = tile_ids[row_start + first_column:row_start + last_column + 1]
+            if not any(row_ids):
+                continue
+            for column, tile_id in enumerate(row_ids, first_column):
+                if tile_id:
+                    # The next unused scratch rect, which is only used up if the tile collides
+                    if len(colliding_rects) == len(scratch_rects):
+                        scratch_rects.append(pg.Rect(0, 0, 0, 0))
+                    tile_rect = scratch_rects[len(colliding_rects)]
+                    tile_types[tile_id].place_rect(tile_rect, column, row)
+                    if rect.colliderect(tile_rect):
+                        colliding_rects.append(tile_rect)
+        return colliding_rects
+
+    def count_cells(self, layer: str, rect) -> int:
+        """Returns the number of cells searched for the tiles of the layer overlapping the given rect"""
+        first_column, first_row, last_column, last_row = self.get_cell_range(layer, rect)
+        return max(0, last_column - first_column + 1) * max(0, last_row - first_row + 1)
+
+    def render(self, layer: str, camera_rect, surface):
+        """Blits the tiles of the layer that may be visible through the camera"""
+        tile_ids = self.layers[layer]
+        first_column, first_row, last_column, last_row = self.get_cell_range(layer, camera_rect)
+        if first_column > last_column:
+            return
+        images, offsets_x, offsets_y = self.get_blit_tables()
+        # The screen x of every column in the range, and the screen y of every row
+        column_xs = range(first_column * Block.BLOCK_SIZE - camera_rect.x, (last_column + 1) * Block.BLOCK_SIZE -
+                          camera_rect.x, Block.BLOCK_SIZE)
+        blit_sequence = []
+        append = blit_sequence.append
+        for row in range(first_row, last_row + 1):
+            y = row * Block.BLOCK_SIZE - camera_rect.y
+            row_start = row * self.columns
+            for tile_id, x in zip(tile_ids[row_start + first_column:row_start + last_column + 1], column_xs):
+                if tile_id:
+                    append((images[tile_id], (x + offsets_x[tile_id], y + offsets_y[tile_id])))
+        surface.blits(blit_sequence, False)
+
+    def count_visible_tiles(self, camera_rect) -> int:
+        """Returns the number of tiles blitted by render() over every layer"""
+        count = 0
+        for layer, tile_ids in self.layers.items():
+            first_column, first_row, last_column, last_row = self.get_cell_range(layer, camera_rect)
+            for row in range(first_row, last_row + 1):
+                row_start = row * self.columns
+                count += sum(1 for tile_id in tile_ids[row_start + first_column:row_start + last_column + 1] if tile_id)
+        return count
 
 
 class Map:
     def __init__(self, map_dict):
         # takes in the entire dict and parses it accordingly
-        self.background_terrain_group = pg.sprite.Group()       # backmost layer
-        self.middle_ground_terrain_group = pg.sprite.Group()    # middle layer
-        self.collideable_terrain_group = pg.sprite.Group()      # front layer
+        terrain_layer = map_dict["terrain"]
+        self.init_tiles(len(terrain_layer[0]), len(terrain_layer))
+        self.add_layers(map_dict)
+
+    def init_tiles(self, columns: int, rows: int):
+        """Sets up an empty map of the given size in tiles, to which add_layers() adds the tiles and the
+        interactive objects"""
+        self.rect = pg.Rect(0, 0, columns * Block.BLOCK_SIZE, rows * Block.BLOCK_SIZE)
+
+        # Static tiles of all three layers. Only interactive objects are sprites.
+        Library.load()
+        self.texture_set = Library.texture_set
+        self.tilemap = Tilemap(columns, rows, self.texture_set)
+        self.collideable_terrain_group = pg.sprite.Group()      # interactive objects that can be collided with
         self.interactive_objects_group = pg.sprite.Group()      # front layer
-
-        texture_set = TextureSet()
-
-        background_layer = map_dict["background"]
-        for y in range(len(background_layer)):
-            for x in range(len(background_layer[0])):
-                code = background_layer[y][x]
-
-                if code != "  ":
-                    self.background_terrain_group.add(Block(texture_set.get_texture_from_code(code),
-                                                            x * Block.BLOCK_SIZE,
-                                                            y * Block.BLOCK_SIZE))
-
-        decorations_layer = map_dict["decorations"]
-        for y in range(len(decorations_layer)):
-            for x in range(len(decorations_layer[0])):
-                code = decorations_layer[y][x]
-
-                if code != "  ":
-                    self.middle_ground_terrain_group.add(Block(texture_set.get_texture_from_code(code),
-                                                               x * Block.BLOCK_SIZE,
-                                                               y * Block.BLOCK_SIZE))
-
+        self.collideable_rects = None                           # see get_collideable_rects()
+        self.blocks = []                                        # every interactive object, see release()
+
+    def add_layers(self, map_dict, column_offset=0, row_offset=0, include_interactive_objects=True) -> list:
+        """Sets the tiles of all three layers in the given dict, and instantiates the interactive objects
+        of the terrain layer and adds them to the groups of this map.
+
+        :param map_dict:                    A dict containing the background, decorations and terrain layers.
+        :param column_offset:               The column of the map at which the layers begin.
+        :param row_offset:                  The row of the map at which the layers begin.
+        :param include_interactive_objects: If False, coins, ladders, spikes, gateways, falling blocks and
+                                            pushable blocks in the terrain layer are skipped.
+        :return:                            A list of all interactive objects that were instantiated.
+        """
+
+        self.tilemap.set_layer("background", map_dict["background"], column_offset, row_offset)
+        self.tilemap.set_layer("decorations", map_dict["decorations"], column_offset, row_offset)
+        self.tilemap.set_layer("terrain", map_dict["terrain"], column_offset, row_offset, INTERACTIVE_CODES)
+        if not include_interactive_objects:
+            return []
+
+        texture_set = self.texture_set
+        new_blocks = []
+        self.collideable_rects = None
         terrain_layer = map_dict["terrain"]
         for y in range(len(terrain_layer)):
             for x in range(len(terrain_layer[0])):
                 code = terrain_layer[y][x]
-
-                if code != "  ":
-                    if code == "FB":
-                        new_block = FallingBlock(texture_set.get_texture_from_code(code),
-                                                  x * Block.BLOCK_SIZE,
-                                                  y * Block.BLOCK_SIZE)
-                        self.interactive_objects_group.add(new_block)
-                        self.collideable_terrain_group.add(new_block)
-                    elif code == "LB":
-                        new_block = LadderBlock(texture_set.get_texture_from_code(code),
-                                                                       x * Block.BLOCK_SIZE,
-                                                                       y * Block.BLOCK_SIZE)
-                        self.interactive_objects_group.add(new_block)
-                    elif code == "PB":
-                        new_block = PushableBlock(texture_set.get_texture_from_code(code),
-                                                  x * Block.BLOCK_SIZE,
-                                                  y * Block.BLOCK_SIZE)
-                        self.interactive_objects_group.add(new_block)
-                        self.collideable_terrain_group.add(new_block)
-                    elif code == "SP":
-                        new_block = SpikeBlock(texture_set.get_texture_from_code(code),
-                                                                      x * Block.BLOCK_SIZE,
-                                                                      y * Block.BLOCK_SIZE)
-                        self.interactive_objects_group.add(new_block)
-                        self.collideable_terrain_group.add(new_block)
-                    elif code == "GW":
-                        self.interactive_objects_group.add(GatewayBlock(texture_set.get_texture_from_code(code),
-                                                                        x * Block.BLOCK_SIZE,
-                                                                        y * Block.BLOCK_SIZE)
-                                                           )
-                    elif code == "CN":
-                        new_block = Coin(texture_set.get_texture_from_code(code),
-                                                                x * Block.BLOCK_SIZE,
-                                                                y * Block.BLOCK_SIZE)
-                        self.interactive_objects_group.add(new_block)
-                    else:
-                        new_block = Block(texture_set.get_texture_from_code(code),
-                                                                 x * Block.BLOCK_SIZE,
-                                                                 y * Block.BLOCK_SIZE)
-                        self.collideable_terrain_group.add(new_block)
-
-        self.rect = pg.Rect(0,
-                            0,
-                            len(terrain_layer[0]) * Block.BLOCK_SIZE,
-                            len(terrain_layer) * Block.BLOCK_SIZE)
+                if code not in INTERACTIVE_CODES:
+                    continue
+
+                block_x = (x + column_offset) * Block.BLOCK_SIZE
+                block_y = (y + row_offset) * Block.BLOCK_SIZE
+                if code == "FB":
+                    new_block = block_pools[FallingBlock].acquire(texture_set.get_texture_from_code(code), block_x, block_y)
+                    self.interactive_objects_group.add(new_block)
+                    self.collideable_terrain_group.add(new_block)
+                elif code == "LB":
+                    new_block = block_pools[LadderBlock].acquire(texture_set.get_texture_from_code(code), block_x, block_y)
+                    self.interactive_objects_group.add(new_block)
+                elif code == "PB":
+                    new_block = block_pools[PushableBlock].acquire(texture_set.get_texture_from_code(code), block_x, block_y)
+                    self.interactive_objects_group.add(new_block)
+                    self.collideable_terrain_group.add(new_block)
+                elif code == "SP":
+                    new_block = block_pools[SpikeBlock].acquire(texture_set.get_texture_from_code(code), block_x, block_y)
+                    self.interactive_objects_group.add(new_block)
+                    self.collideable_terrain_group.add(new_block)
+                elif code == "GW":
+                    new_block = block_pools[GatewayBlock].acquire(texture_set.get_texture_from_code(code), block_x, block_y)
+                    self.interactive_objects_group.add(new_block)
+                else:
+                    new_block = block_pools[Coin].acquire(texture_set.get_texture_from_code(code), block_x, block_y)
+                    self.interactive_objects_group.add(new_block)
+                new_blocks.append(new_block)
+
+        self.blocks.extend(new_blocks)
+        return new_blocks
+
+    def release(self):
+        """Removes every interactive object from the map and releases it to its pool. The map must not be
+        used afterwards, as the objects may be handed out to the next map right away."""
+        for block in self.blocks:
+            block.kill()
+            block_pools[type(block)].release(block)
+        self.blocks = []
+        self.collideable_rects = None
+
+    def save_state(self) -> list:
+        """Returns the state of every interactive object, which restore_state() brings back. Static tiles
+        never change, so they are not saved."""
+        return [self.get_block_state(block) for block in self.blocks]
+
+    def get_block_state(self, block) -> tuple:
+        """Returns the block with its position, the groups it is in and its STATE_ATTRIBUTES"""
+        return (block, tuple(block.rect), self.get_block_groups(block),
+                tuple(getattr(block, name) for name in block.STATE_ATTRIBUTES))
+
+    def get_block_groups(self, block) -> tuple:
+        return tuple(block.groups())
+
+    def restore_state(self, state: list):
+        """Brings back every interactive object as it was when the state was saved. The groups are refilled
+        in the order in which the objects were instantiated, as they were when the map was loaded."""
+        self.clear_groups()
+        self.restore_blocks(state)
+        for block, rect, groups, attributes in state:
+            if groups:
+                self.place_block(block, groups)
+        self.collideable_rects = None
+
+    def restore_blocks(self, state: list):
+        """Brings back the position and STATE_ATTRIBUTES of the given interactive objects, but leaves their
+        groups as they are, so it is only enough if none of them has been added to or removed from a group"""
+        for block, rect, groups, attributes in state:
+            block.rect.update(rect)
+            for name, value in zip(block.STATE_ATTRIBUTES, attributes):
+                setattr(block, name, value)
+
+    def clear_groups(self):
+        self.interactive_objects_group.empty()
+        self.collideable_terrain_group.empty()
+
+    def place_block(self, block, groups: tuple):
+        block.add(*groups)
+
+    def get_collideable_rects(self) -> tuple:
+        """Returns the collideable interactive objects and a list of their rects in the same order, so that
+        they can be tested with a single Rect.collidelistall(). Blocks move their rects in place, so the
+        lists only change when blocks are added to or removed from the collideable group, which clears them."""
+        if self.collideable_rects is None:
+            sprites = self.collideable_terrain_group.sprites()
+            self.collideable_rects = (sprites, [sprite.rect for sprite in sprites])
+        return self.collideable_rects
+
+    def get_colliding_rects(self, rect, include_spikes=True, ignored_object=None) -> list:
+        """Returns the rects of the terrain tiles and the collideable interactive objects that overlap the
+        given rect, leaving out spikes if include_spikes is False, and the ignored object if given. The list
+        is reused by the next call, see Tilemap.get_colliding_rects()."""
+        colliding_rects = self.tilemap.get_colliding_rects(rect)
+        sprites, sprite_rects = self.get_collideable_rects()
+        for index in rect.collidelistall(sprite_rects):
+            sprite = sprites[index]
+            if sprite is not ignored_object and (include_spikes or not sprite.is_spike):
+                colliding_rects.append(sprite.rect)
+        return colliding_rects
+
+    def count_collision_candidates(self, rect) -> int:
+        """Returns the number of cells and sprites searched by get_colliding_rects(). Only used by the counters."""
+        return self.tilemap.count_cells("terrain", rect) + len(self.collideable_terrain_group)
+
+    def stream(self, camera):
+        """Maps loaded from a single file are always fully resident, so there is nothing to stream"""
+        pass
+
+    def get_layout(self):
+        """Returns what a state saved by save_state() depends on besides the objects themselves, which is
+        nothing, as every object is instantiated when the map is loaded. See StreamingMap.get_layout()."""
+        return None
+
+    def restore_layout(self, layout):
+        pass
+
+    def is_resident(self, rect) -> bool:
+        """Returns True if the terrain under the given rect is loaded and can be collided with"""
+        return True
 
     def update(self, player):
-        self.interactive_objects_group.update(player, self.collideable_terrain_group)
+        self.interactive_objects_group.update(player, self)
+        if __debug__ and counters.enabled:
+            counters.add(INTERACTIVE_UPDATES, len(self.interactive_objects_group))
 
     def render(self, camera, surface):
-        for sprite in self.background_terrain_group:
-            if camera.rect.colliderect(sprite.rect):
-                surface.blit(sprite.image, (sprite.rect.x - camera.rect.x, sprite.rect.y - camera.rect.y))
+        layers = TILEMAP_LAYERS if quality_governor.tier.draw_decorations else UNDECORATED_TILEMAP_LAYERS
+        for layer in layers:
+            self.tilemap.render(layer, camera.rect, surface)
 
-        for sprite in self.middle_ground_terrain_group:
+        for sprite in self.interactive_objects_group:
             if camera.rect.colliderect(sprite.rect):
                 surface.blit(sprite.image, (sprite.rect.x - camera.rect.x, sprite.rect.y - camera.rect.y))
 
-        for sprite in self.collideable_terrain_group:
-            if camera.rect.colliderect(sprite.rect):
-                surface.blit(sprite.image, (sprite.rect.x - camera.rect.x, sprite.rect.y - camera.rect.y))
+        if __debug__ and counters.enabled:
+            counters.add(BLITS, self.count_visible_sprites(camera))
+
+    def count_visible_sprites(self, camera) -> int:
+        """Returns the number of tiles and sprites blitted by render(). Only used by the counters, so that
+        render() itself does not pay for counting."""
+        return self.tilemap.count_visible_tiles(camera.rect) + \
+            sum(1 for sprite in self.interactive_objects_group if camera.rect.colliderect(sprite.rect))
+
+
+class MapChunk:
+    """A square region of a StreamingMap, which is loaded from its own file on disk"""
+
+    def __init__(self, column, row):
+        self.column = column
+        self.row = row
+        self.blocks = []            # the interactive objects of the chunk, in the order of its file
+        self.initial_states = []    # the state of each interactive object when it was instantiated
+        self.has_enemies = False    # whether any enemies were placed in the chunk when it was loaded
+
+
+class ChunkRecord:
+    """What changed in a chunk of a StreamingMap before it was evicted, which is applied when it is loaded
+    again, so that collected coins, moved blocks and killed enemies stay that way"""
+    __slots__ = ("changed_blocks", "enemies")
+
+    def __init__(self, changed_blocks: tuple, enemies: tuple):
+        """Creates a ChunkRecord.
+
+        :param changed_blocks:      The (index, rect, groups, STATE_ATTRIBUTES) of every interactive object of
+                                    the chunk whose state differs from its file, by index in the chunk.
+        :param enemies:             The enemies of the chunk that were alive, see EnemyManager.remove_chunk().
+        """
+
+        self.changed_blocks = changed_blocks
+        self.enemies = enemies
+
+
+class StreamingMap(Map):
+    """A Map that is split into fixed-size chunks on disk. Chunks are loaded as the camera approaches them
+    and evicted once it moves away, so the load time of a level does not depend on the size of the map.
+    Only the tiles, interactive objects and enemies of resident chunks are in the tilemap, the sprite
+    groups and the EnemyManager, so collisions, triggers and the systems of the enemies never see the rest
+    of the map. The tilemap spans the whole map, at a cost of one byte per cell and layer.
+
+    The interactive objects of a chunk are released to their pools when it is evicted, and its enemies are
+    removed from the EnemyManager. Only a ChunkRecord of what changed in the chunk is kept, and only if
+    anything did. Loading the chunk again instantiates it from its file, then applies the record.
+
+    The look-ahead is the number of chunks beyond those under the camera that are kept loaded. Chunks are
+    only evicted once they are more than one chunk beyond the look-ahead, so that the camera does not load
+    and evict the same chunk when moving back and forth across a boundary. As the largest textures span
+    less than a chunk, a look-ahead of at least 1 ensures that every block overlapping the camera is drawn.
+    """
+
+    def __init__(self, directory: str, manifest: dict, starting_position, enemies, look_ahead=1):
+        # The blocks are only those of the resident chunks, see update_layout()
+        self.init_tiles(manifest["columns"], manifest["rows"])
+
+        self.directory = directory
+        self.chunk_size = manifest["chunk_size"]
+        self.chunk_pixel_size = self.chunk_size * Block.BLOCK_SIZE
+        self.stored_chunks = set(tuple(chunk) for chunk in manifest["chunks"])
+        self.look_ahead = look_ahead
+        self.enemies = enemies      # the EnemyManager to which the enemies of resident chunks are added
+
+        self.resident_chunks = {}   # (column, row) -> MapChunk of every chunk that is loaded
+        # (column, row) -> ChunkRecord of evicted chunks. The dict is replaced rather than changed, so that
+        # the layouts saved by snapshots can share it.
+        self.chunk_records = {}
+        self.layout = ((), self.chunk_records)     # see get_layout()
+        self.last_chunk_range = None
+
+        self.stream_around(pg.Rect(starting_position, (0, 0)))
+
+    def get_chunk_range(self, rect, margin):
+        """Returns the (first column, first row, last column, last row) of the chunks
+        overlapping the given rect, extended by the given number of chunks on every side"""
+        return (max(rect.left // self.chunk_pixel_size - margin, 0),
+                max(rect.top // self.chunk_pixel_size - margin, 0),
+                min((rect.right - 1) // self.chunk_pixel_size + margin, (self.rect.right - 1) // self.chunk_pixel_size),
+                min((rect.bottom - 1) // self.chunk_pixel_size + margin, (self.rect.bottom - 1) // self.chunk_pixel_size))
+
+    def stream(self, camera):
+        """Loads the chunks around the camera and evicts those that are far away from it"""
+        self.stream_around(camera.rect)
+
+    def stream_around(self, rect):
+        chunk_range = self.get_chunk_range(rect, self.look_ahead)
+        if chunk_range == self.last_chunk_range:
+            return
+        self.last_chunk_range = chunk_range
+
+        first_column, first_row, last_column, last_row = self.get_chunk_range(rect, self.look_ahead + 1)
+        evicted_chunks = [(column, row) for (column, row) in self.resident_chunks
+                          if not (first_column <= column <= last_column and first_row <= row <= last_row)]
+        if evicted_chunks:
+            # Replaced rather than changed, see __init__()
+            self.chunk_records = dict(self.chunk_records)
+            for column, row in evicted_chunks:
+                self.evict_chunk(column, row)
+
+        first_column, first_row, last_column, last_row = chunk_range
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                if (column, row) not in self.resident_chunks:
+                    self.load_chunk(column, row)
+
+        self.update_layout()
+
+    def load_chunk(self, column, row, include_enemies=True):
+        """Loads the tiles and instantiates the interactive objects of the chunk, applying its record if it
+        has been evicted before, and adds its enemies to the EnemyManager if include_enemies is True"""
+        chunk = MapChunk(column, row)
+        self.resident_chunks[(column, row)] = chunk
+        if (column, row) not in self.stored_chunks:
+            return
 
-        for sprite in self.interactive_objects_group:
-            if camera.rect.colliderect(sprite.rect):
-                surface.blit(sprite.image, (sprite.rect.x - camera.rect.x, sprite.rect.y - camera.rect.y))
+        data = load_json(self.directory + "/" + get_chunk_filename(column, row))
+        chunk.blocks = self.add_layers(data, column * self.chunk_size, row * self.chunk_size)
+        chunk.initial_states = [self.get_block_state(block)[1:] for block in chunk.blocks]
+
+        record = self.chunk_records.get((column, row))
+        if record is not None:
+            for index, rect, groups, attributes in record.changed_blocks:
+                block = chunk.blocks[index]
+                self.restore_blocks(((block, rect, groups, attributes),))
+                if groups != chunk.initial_states[index][1]:
+                    block.kill()
+                    self.place_block(block, groups)
+
+        enemies = data.get("enemies", ())
+        chunk.has_enemies = bool(enemies)
+        if include_enemies and chunk.has_enemies:
+            if record is None:
+                self.enemies.add_enemies(enemies, (column, row))
+            else:
+                self.enemies.add_saved(record.enemies)
+
+    def evict_chunk(self, column, row, save_record=True):
+        """Clears the tiles of the chunk and releases its interactive objects to their pools. If save_record
+        is True, its enemies are removed from the EnemyManager, and what changed in the chunk is recorded in
+        chunk_records, which must have been replaced beforehand."""
+        chunk = self.resident_chunks.pop((column, row))
+        self.tilemap.clear_region(column * self.chunk_size, row * self.chunk_size, self.chunk_size, self.chunk_size)
+
+        if save_record:
+            changed_blocks = []
+            for index, (block, initial_state) in enumerate(zip(chunk.blocks, chunk.initial_states)):
+                state = self.get_block_state(block)[1:]
+                if state != initial_state:
+                    changed_blocks.append((index,) + state)
+            enemies = self.enemies.remove_chunk((column, row)) if chunk.has_enemies else ()
+            if changed_blocks or chunk.has_enemies:
+                self.chunk_records[(column, row)] = ChunkRecord(tuple(changed_blocks), enemies)
+            else:
+                self.chunk_records.pop((column, row), None)
+
+        for block in chunk.blocks:
+            block.kill()
+            block_pools[type(block)].release(block)
+
+    def update_layout(self):
+        """Lists the interactive objects of the resident chunks in the order of the chunks, so that a state
+        saved with the same layout can be restored by position"""
+        self.blocks = [block for key in sorted(self.resident_chunks) for block in self.resident_chunks[key].blocks]
+        self.collideable_rects = None
+        self.layout = (tuple(sorted(self.resident_chunks)), self.chunk_records)
+
+    def get_layout(self) -> tuple:
+        """Returns the resident chunks and the records of the evicted chunks, which restore_layout() brings
+        back. Snapshots save the layout along with save_state(), as the interactive objects of the state are
+        only those of the resident chunks."""
+        return self.layout
+
+    def restore_layout(self, layout: tuple):
+        """Loads and evicts chunks until the resident chunks and the records of the evicted chunks are those
+        of the layout. Enemies are neither added nor removed, as they are restored along with the layout."""
+        if layout is self.layout:
+            return
+        resident_keys, self.chunk_records = layout
+        for column, row in list(self.resident_chunks):
+            if (column, row) not in resident_keys:
+                self.evict_chunk(column, row, save_record=False)
+        for column, row in resident_keys:
+            if (column, row) not in self.resident_chunks:
+                self.load_chunk(column, row, include_enemies=False)
+        self.update_layout()
+        self.layout = layout
+        # The chunks around the camera are found again on the next stream()
+        self.last_chunk_range = None
+
+    def restore_state(self, state: list):
+        """Brings back every interactive object of the resident chunks as it was when the state was saved.
+        The objects are matched by position, as they may have been released and instantiated again since,
+        so the layout must have been restored first."""
+        super().restore_state([(block,) + block_state[1:] for block, block_state in zip(self.blocks, state)])
+
+    def release(self):
+        super().release()
+        self.resident_chunks = {}
+        self.chunk_records = {}
+        self.layout = ((), self.chunk_records)
+
+    def is_resident(self, rect) -> bool:
+        first_column, first_row, last_column, last_row = self.get_chunk_range(rect, 0)
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                if (column, row) not in self.resident_chunks:
+                    return False
+        return True
 
 
 class EnemyManager:
     def __init__(self, enemies_list: list):
-        self.enemies = pg.sprite.Group()
-        self.enemies_list = self.enemies.sprites()
-
         # takes in a list of dictionaries representing enemies
         self.enemy_type = {"Pink Guy": PinkGuy(),
                             "Trash Monster": TrashMonster(),
                             "Tooth Walker": ToothWalker()
                            }
-        self.renderer = RenderComponent()
-
+        self.enemies = Archetype("enemies", ENEMY_COMPONENTS)
+        self.add_enemies(enemies_list)
+
+        self.world = World(self.enemies, [AISystem(),
+                                          GravitySystem(),
+                                          CombatSystem(),
+                                          RigidBodySystem(),
+                                          AnimationSystem(),
+                                          DeathSystem()])
+        self.renderer = RenderSystem()
+
+    def add_enemies(self, enemies_list: list, chunk=None):
+        """Adds the enemies of the given list of dictionaries, as stored in level files, which belong to the
+        given chunk of a StreamingMap if not None"""
         for enemy_dict in enemies_list:
-            self.enemies.add(Enemy(self.enemy_type[enemy_dict["type"]],
-                                   AIControlComponent(enemy_dict["coordinates"]),
-                                   self.renderer,
-                                   enemy_dict["coordinates"])
-                             )
+            add_enemy(self.enemies, self.enemy_type[enemy_dict["type"]], enemy_dict["coordinates"], chunk=chunk)
+
+    def remove_chunk(self, chunk) -> tuple:
+        """Removes the enemies of the given chunk and releases their rects to their pool. Returns the
+        components of those that are alive, one tuple per enemy, which add_saved() brings back."""
+        columns = self.enemies.columns
+        indices = [index for index, enemy_chunk in enumerate(columns["chunk"]) if enemy_chunk == chunk]
+        saved_enemies = []
+        for index in indices:
+            rect = columns["rect"][index]
+            if columns["state"][index] is not EntityState.DEAD:
+                # The rect is saved as a tuple, as it goes back to the pool
+                saved_enemies.append(tuple(tuple(rect) if component_name == "rect" else columns[component_name][index]
+                                           for component_name in self.enemies.component_names))
+            rect_pool.release(rect)
+        self.enemies.remove(indices)
+        return tuple(saved_enemies)
+
+    def add_saved(self, saved_enemies: tuple):
+        """Adds back the enemies returned by remove_chunk()"""
+        component_names = self.enemies.component_names
+        for saved_enemy in saved_enemies:
+            components = dict(zip(component_names, saved_enemy))
+            components["rect"] = rect_pool.acquire(components["rect"])
+            self.enemies.add(**components)
+
+    def release(self):
+        """Releases the rects of the enemies to their pool, after which the enemies must not be used"""
+        rect_pool.release_all(self.enemies.columns["rect"])
+        self.enemies = Archetype("enemies", ENEMY_COMPONENTS)
+        self.world.entities = self.enemies
+
+    def save_state(self) -> dict:
+        """Returns the components of every enemy, which restore_state() brings back"""
+        return self.enemies.save(ENEMY_MUTABLE_COMPONENTS)
+
+    def restore_state(self, state: dict):
+        self.enemies.restore(state, ENEMY_MUTABLE_COMPONENTS)
+        self.world.messages.take()
 
     def update(self, delta_time, map, player):
-        for entity in self.enemies:
-            if entity.state == EntityState.DEAD:
-                entity.kill()
-            else:
-                entity.update(delta_time, map, player)
+        self.world.remove_dead()
+        # Enemies on terrain that has not been streamed in are frozen, so that they do not fall through it
+        active_indices = [index for index, rect in enumerate(self.enemies.columns["rect"]) if map.is_resident(rect)]
+        # Enemies far away from the player are also frozen at the lowest quality tiers
+        simulation_area = quality_governor.tier.simulation_area
+        if simulation_area is not None:
+            simulation_rect = get_area_around(player.rect, simulation_area)
+            rects = self.enemies.columns["rect"]
+            active_indices = [index for index in active_indices if simulation_rect.colliderect(rects[index])]
+        self.world.update(active_indices, delta_time, map, player)
 
     def render(self, camera, surface):
-        for entity in self.enemies:
-            entity.render(camera, surface)
+        self.renderer.render(self.enemies, camera, surface)
@@ -1,66 +1,95 @@
-import pygame as pg
 from .spritesheet import SpriteSheet
 from .animation import Animation
 from .entitystate import EntityState
-pg.mixer.init()
+from .sound import sound_bank
+from .textureset import TextureSet
 
 
 class Library:
+    """Holds the sprite sheets, animations, sounds and textures shared by all
+    entities and levels. Nothing is loaded until load() is called, which must
+    happen after the mixer has been initialised."""
 
-    adventurer_sprite_sheets = {
-        "IDLE": SpriteSheet("assets/textures/player/adventurer-idle.png", 1, 4),
-        "WALKING": SpriteSheet("assets/textures/player/adventurer-run.png", 1, 6),
-        "JUMPING": SpriteSheet("assets/textures/player/adventurer-jump.png", 1, 1),
-        "CLIMBING": SpriteSheet("assets/textures/player/adventurer-climb.png", 1, 4)
-    }
-
-    player_animations = {
-        EntityState.IDLE: Animation.of_directory("assets/textures/player/individual/idle1"),
-        EntityState.WALKING: Animation.of_directory("assets/textures/player/individual/run"),
-        EntityState.JUMPING: Animation.of_directory("assets/textures/player/individual/jump"),
-        EntityState.HANGING: Animation.of_selected_images(adventurer_sprite_sheets["CLIMBING"], 0, 0),
-        EntityState.CLIMBING: Animation.of_entire_sheet(adventurer_sprite_sheets["CLIMBING"])
-    }
-
-    entity_sounds = {
-        "JUMP": pg.mixer.Sound("assets/sound/sfx/jump.ogg"),
-        "DECREMENT_HEALTH": pg.mixer.Sound("assets/sound/sfx/hitdamage.ogg")
-    }
-
-    pink_guy_sprite_sheets = {
-        "IDLE": SpriteSheet("assets/textures/enemies/Pink Guy/Idle.png", 1, 11),
-        "WALKING": SpriteSheet("assets/textures/enemies/Pink Guy/Run.png", 1, 12),
-        "JUMPING": SpriteSheet("assets/textures/enemies/Pink Guy/Jump.png", 1, 1)
-    }
-
-    pink_guy_animations = {
-        EntityState.IDLE: Animation.of_entire_sheet(pink_guy_sprite_sheets["IDLE"]),
-        EntityState.WALKING: Animation.of_entire_sheet(pink_guy_sprite_sheets["WALKING"]),
-        EntityState.JUMPING: Animation.of_entire_sheet(pink_guy_sprite_sheets["JUMPING"]),
-        EntityState.DEAD: Animation.of_selected_images(pink_guy_sprite_sheets["IDLE"], 0, 0)
-    }
-
-    trash_monster_sprite_sheets = {
-        "IDLE": SpriteSheet("assets/textures/enemies/Trash Monster/Trash Monster-Idle.png", 1, 6).scale(44, 32),
-        "WALKING": SpriteSheet("assets/textures/enemies/Trash Monster/Trash Monster-Run.png", 1, 6).scale(44, 32),
-        "JUMPING": SpriteSheet("assets/textures/enemies/Trash Monster/Trash Monster-Jump.png", 1, 1).scale(44, 32)
-    }
-
-    trash_monster_animations = {
-        EntityState.IDLE: Animation.of_entire_sheet(trash_monster_sprite_sheets["IDLE"], flip=True),
-        EntityState.WALKING: Animation.of_entire_sheet(trash_monster_sprite_sheets["WALKING"], flip=True),
-        EntityState.JUMPING: Animation.of_entire_sheet(trash_monster_sprite_sheets["JUMPING"], flip=True),
-        EntityState.DEAD: Animation.of_selected_images(trash_monster_sprite_sheets["IDLE"], 0, 0, flip=True)
-    }
-
-    tooth_walker_sprite_sheets = {
-        "WALKING": SpriteSheet("assets/textures/enemies/Tooth Walker/tooth walker walk.png", 1, 6).scale(100, 65),
-        "DEAD": SpriteSheet("assets/textures/enemies/Tooth Walker/tooth walker dead.png", 1, 1).scale(100, 65)
-    }
-
-    tooth_walker_animations = {
-        EntityState.IDLE: Animation.of_selected_images(tooth_walker_sprite_sheets["WALKING"], 0, 0),
-        EntityState.WALKING: Animation.of_entire_sheet(tooth_walker_sprite_sheets["WALKING"]),
-        EntityState.JUMPING: Animation.of_selected_images(tooth_walker_sprite_sheets["WALKING"], 0, 0),
-        EntityState.DEAD: Animation.of_entire_sheet(tooth_walker_sprite_sheets["DEAD"])
-    }
+    is_loaded = False
+
+    adventurer_sprite_sheets = {}
+    player_animations = {}
+    entity_sounds = {}
+    pink_guy_sprite_sheets = {}
+    pink_guy_animations = {}
+    trash_monster_sprite_sheets = {}
+    trash_monster_animations = {}
+    tooth_walker_sprite_sheets = {}
+    tooth_walker_animations = {}
+    coin_images = []
+    texture_set = None
+
+    @classmethod
+    def load(cls):
+        """Loads every asset in the library. Does nothing if the library has already been loaded."""
+        if cls.is_loaded:
+            return
+        cls.is_loaded = True
+
+        cls.adventurer_sprite_sheets = {
+            "IDLE": SpriteSheet("assets/textures/player/adventurer-idle.png", 1, 4),
+            "WALKING": SpriteSheet("assets/textures/player/adventurer-run.png", 1, 6),
+            "JUMPING": SpriteSheet("assets/textures/player/adventurer-jump.png", 1, 1),
+            "CLIMBING": SpriteSheet("assets/textures/player/adventurer-climb.png", 1, 4)
+        }
+
+        cls.player_animations = {
+            EntityState.IDLE: Animation.of_directory("assets/textures/player/individual/idle1"),
+            EntityState.WALKING: Animation.of_directory("assets/textures/player/individual/run"),
+            EntityState.JUMPING: Animation.of_directory("assets/textures/player/individual/jump"),
+            EntityState.HANGING: Animation.of_selected_images(cls.adventurer_sprite_sheets["CLIMBING"], 0, 0),
+            EntityState.CLIMBING: Animation.of_entire_sheet(cls.adventurer_sprite_sheets["CLIMBING"])
+        }
+
+        cls.entity_sounds = {
+            "JUMP": sound_bank.get("assets/sound/sfx/jump.ogg"),
+            "DECREMENT_HEALTH": sound_bank.get("assets/sound/sfx/hitdamage.ogg")
+        }
+
+        cls.pink_guy_sprite_sheets = {
+            "IDLE": SpriteSheet("assets/textures/enemies/Pink Guy/Idle.png", 1, 11),
+            "WALKING": SpriteSheet("assets/textures/enemies/Pink Guy/Run.png", 1, 12),
+            "JUMPING": SpriteSheet("assets/textures/enemies/Pink Guy/Jump.png", 1, 1)
+        }
+
+        cls.pink_guy_animations = {
+            EntityState.IDLE: Animation.of_entire_sheet(cls.pink_guy_sprite_sheets["IDLE"]),
+            EntityState.WALKING: Animation.of_entire_sheet(cls.pink_guy_sprite_sheets["WALKING"]),
+            EntityState.JUMPING: Animation.of_entire_sheet(cls.pink_guy_sprite_sheets["JUMPING"]),
+            EntityState.DEAD: Animation.of_selected_images(cls.pink_guy_sprite_sheets["IDLE"], 0, 0)
+        }
+
+        cls.trash_monster_sprite_sheets = {
+            "IDLE": SpriteSheet("assets/textures/enemies/Trash Monster/Trash Monster-Idle.png", 1, 6).scale(44, 32),
+            "WALKING": SpriteSheet("assets/textures/enemies/Trash Monster/Trash Monster-Run.png", 1, 6).scale(44, 32),
+            "JUMPING": SpriteSheet("assets/textures/enemies/Trash Monster/Trash Monster-Jump.png", 1, 1).scale(44, 32)
+        }
+
+        cls.trash_monster_animations = {
+            EntityState.IDLE: Animation.of_entire_sheet(cls.trash_monster_sprite_sheets["IDLE"], flip=True),
+            EntityState.WALKING: Animation.of_entire_sheet(cls.trash_monster_sprite_sheets["WALKING"], flip=True),
+            EntityState.JUMPING: Animation.of_entire_sheet(cls.trash_monster_sprite_sheets["JUMPING"], flip=True),
+            EntityState.DEAD: Animation.of_selected_images(cls.trash_monster_sprite_sheets["IDLE"], 0, 0, flip=True)
+        }
+
+        cls.tooth_walker_sprite_sheets = {
+            "WALKING": SpriteSheet("assets/textures/enemies/Tooth Walker/tooth walker walk.png", 1, 6).scale(100, 65),
+            "DEAD": SpriteSheet("assets/textures/enemies/Tooth Walker/tooth walker dead.png", 1, 1).scale(100, 65)
+        }
+
+        cls.tooth_walker_animations = {
+            EntityState.IDLE: Animation.of_selected_images(cls.tooth_walker_sprite_sheets["WALKING"], 0, 0),
+            EntityState.WALKING: Animation.of_entire_sheet(cls.tooth_walker_sprite_sheets["WALKING"]),
+            EntityState.JUMPING: Animation.of_selected_images(cls.tooth_walker_sprite_sheets["WALKING"], 0, 0),
+            EntityState.DEAD: Animation.of_entire_sheet(cls.tooth_walker_sprite_sheets["DEAD"])
+        }
+
+        cls.coin_images = SpriteSheet("assets/textures/environment/animated/ruby.png", 1, 16).get_image_sequence()
+
+        # The textures of the terrain are shared by every Map, along with the images scaled from them
+        cls.texture_set = TextureSet()
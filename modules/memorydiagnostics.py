@@ -0,0 +1,135 @@
+import gc
+import os
+import sys
+import tracemalloc
+from collections import deque
+import pygame as pg
+
+"""
+* =============================================================== *
+* This module contains the memory diagnostics, which take a       *
+* snapshot of the memory in use and of the live objects of key    *
+* classes at every level boundary, and report how they grew.      *
+* =============================================================== *
+
+SNAPSHOTS
+-------------------------
+Set the TOWER_MEMORY environment variable to enable the diagnostics. LevelManager calls begin_level()
+before loading every level, including when a new game starts. Each call collects garbage, then records:
+    traced memory       ->          the memory allocated by Python, as measured by tracemalloc
+    live objects        ->          the number of live instances of each of the TRACKED_CLASSES
+
+and prints both to stderr with the change since the previous level, followed by the TOP_GROWTH_COUNT
+source lines whose allocations grew the most.
+
+Objects frozen by the GCPolicy of gcpolicy.py are unfrozen by every snapshot, so that they are counted,
+and stay unfrozen for the rest of the session.
+Surfaces are not tracked by the garbage collector, so they are counted among the objects referred to by
+the tracked objects. A Surface that only C code refers to is missed, as is the memory of its pixels.
+
+Enabling the diagnostics slows the game down, as tracemalloc traces every allocation, and each snapshot
+takes a noticeable pause. dev_modules/soaktest.py uses them to check that memory plateaus over many
+levels and restarts.
+"""
+
+MEMORY_VARIABLE = "TOWER_MEMORY"
+
+# Names of the classes whose live instances are counted, including instances of their subclasses
+TRACKED_CLASSES = ("Scene", "GameScene", "Level", "Block", "Archetype", "Surface")
+TOP_GROWTH_COUNT = 5
+SNAPSHOT_HISTORY = 24        # Older snapshots are dropped, so that the diagnostics do not grow themselves
+
+
+def get_tracked_classes() -> dict:
+    """Returns the tracked classes by name. Imported here, as the modules defining them import this one."""
+    from .gamescene import Scene, GameScene
+    from .leveljson import Level
+    from .block import Block
+    from .ecs import Archetype
+    return {"Scene": Scene, "GameScene": GameScene, "Level": Level, "Block": Block, "Archetype": Archetype,
+            "Surface": pg.Surface}
+
+
+def count_live_objects() -> dict:
+    """Returns the number of live instances of each of the TRACKED_CLASSES"""
+    classes = get_tracked_classes()
+    objects = gc.get_objects()
+    counted_ids = set()
+    counts = dict.fromkeys(TRACKED_CLASSES, 0)
+    # Untracked objects, such as Surfaces, can only be found through the objects that refer to them
+    for candidate in objects + gc.get_referents(*objects):
+        for name, cls in classes.items():
+            if isinstance(candidate, cls) and (name, id(candidate)) not in counted_ids:
+                counted_ids.add((name, id(candidate)))
+                counts[name] += 1
+    return counts
+
+
+class MemorySnapshot:
+    """The memory in use and the live objects at a point in time"""
+
+    def __init__(self, label: str, traced_bytes: int, object_counts: dict):
+        self.label = label
+        self.traced_bytes = traced_bytes
+        self.object_counts = object_counts
+
+
+class MemoryDiagnostics:
+    """Takes a MemorySnapshot at every level boundary and reports the growth since the previous one"""
+
+    def __init__(self, enabled=None):
+        """Creates a MemoryDiagnostics.
+
+        :param enabled:     Overrides the TOWER_MEMORY environment variable if not None.
+        """
+
+        self.enabled = False
+        self.snapshots = deque(maxlen=SNAPSHOT_HISTORY)
+        self.last_trace = None          # The tracemalloc snapshot of the last MemorySnapshot
+        if bool(os.environ.get(MEMORY_VARIABLE)) if enabled is None else enabled:
+            self.enable()
+
+    def enable(self):
+        self.enabled = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def begin_level(self, name: str):
+        """Takes a snapshot before the given level is loaded and reports it"""
+        if not self.enabled:
+            return
+        previous = self.snapshots[-1] if self.snapshots else None
+        previous_trace = self.last_trace
+        snapshot = self.take_snapshot(name)
+        self.report(snapshot, previous, previous_trace)
+
+    def take_snapshot(self, label: str) -> MemorySnapshot:
+        # Frozen objects are hidden from gc.get_objects(), so they are unfrozen to be counted
+        gc.unfreeze()
+        gc.collect()
+        self.last_trace = tracemalloc.take_snapshot()
+        snapshot = MemorySnapshot(label, tracemalloc.get_traced_memory()[0], count_live_objects())
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    def report(self, snapshot: MemorySnapshot, previous=None, previous_trace=None, stream=sys.stderr):
+        if previous is None:
+            print("[memory] %s: %.1f KB traced" % (snapshot.label, snapshot.traced_bytes / 1024), file=stream)
+        else:
+            print("[memory] %s: %.1f KB traced (%+.1f KB since %s)" % (
+                snapshot.label, snapshot.traced_bytes / 1024,
+                (snapshot.traced_bytes - previous.traced_bytes) / 1024, previous.label), file=stream)
+
+        for name, count in snapshot.object_counts.items():
+            change = "" if previous is None else " (%+d)" % (count - previous.object_counts.get(name, 0))
+            print("[memory]     %-12s %8d%s" % (name, count, change), file=stream)
+
+        if previous_trace is not None:
+            differences = [difference for difference in self.last_trace.compare_to(previous_trace, "lineno")
+                           if difference.size_diff > 0]
+            for difference in differences[:TOP_GROWTH_COUNT]:
+                print("[memory]     %+9.1f KB  %s" % (difference.size_diff / 1024, difference.traceback), file=stream)
+
+
+# The memory diagnostics shared by the whole game
+memory_diagnostics = MemoryDiagnostics()
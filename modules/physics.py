@@ -1,15 +1,19 @@
 import pygame as pg
 from .component import Component
 from .entitystate import EntityState, Direction, EntityMessage
+from .counters import counters, COLLISION_CALLS, SPRITES_TESTED
+from .inputstate import input_state
 
 
 class UserControlComponent(Component):
     # TODO: Implement an EntityStateManager which handles the state changes.
-    #  UserControlComponent and AIControlComponent should only handle the velocities.
+    #  UserControlComponent and AISystem should only handle the velocities.
     #  RigidBodyComponent should only handly collisions and should not be concerned with state.
 
     """Handles user input which modifies the state,
     velocity and direction of the Entity sprite."""
+    __slots__ = ("entity", "ZERO_VELOCITY", "WALK_LEFT_VELOCITY", "WALK_RIGHT_VELOCITY", "JUMP_VELOCITY",
+                 "CLIMB_UP_VELOCITY", "CLIMB_DOWN_VELOCITY")
 
     def __init__(self, entity):
         super().__init__()
@@ -24,7 +28,7 @@ class UserControlComponent(Component):
     def update(self):
         """Updates the state, direction and velocity
         of the entity based on the user input."""
-        is_pressed = pg.key.get_pressed()
+        is_pressed = input_state.held
         state = self.entity.get_state()
         if state is EntityState.IDLE:
             self.handle_idle_entity(is_pressed)
@@ -100,40 +104,9 @@ class UserControlComponent(Component):
             self.entity.set_state(EntityState.HANGING)
 
 
-class AIControlComponent(Component):
-    """Handles the back and forth movement of
-    the Enemy sprites between two points."""
-
-    def __init__(self, starting_position, walking_speed=90, patrol_radius=50):
-        super().__init__()
-        self.WALKING_SPEED = walking_speed
-        self.left_bound = starting_position[0] - patrol_radius
-        self.right_bound = starting_position[0] + patrol_radius
-
-    def update(self, enemy, map):
-        enemy.set_state(EntityState.WALKING)
-        if enemy.get_direction() is Direction.LEFT:
-            if enemy.rect.x > self.left_bound:
-                enemy.set_x_velocity(-self.WALKING_SPEED)
-            else:
-                enemy.reverse_direction()
-        elif enemy.get_direction() is Direction.RIGHT:
-            if enemy.rect.x < self.right_bound:
-                enemy.set_x_velocity(self.WALKING_SPEED)
-            else:
-                enemy.reverse_direction()
-
-    def receive(self, message, enemy):
-        if message is EntityMessage.AI_TURN_RIGHT:
-            enemy.set_direction(Direction.RIGHT)
-            enemy.reverse_x_velocity()
-        if message is EntityMessage.AI_TURN_LEFT:
-            enemy.set_direction(Direction.LEFT)
-            enemy.reverse_x_velocity()
-
-
 class EntityGravityComponent(Component):
     """Enables the entity to respond to the force of gravity."""
+    __slots__ = ("GRAVITY", "DISCRETE_TIMESTEP")
 
     def __init__(self, weight=30):
         super().__init__()
@@ -155,6 +128,7 @@ class EntityGravityComponent(Component):
 class EntityRigidBodyComponent(Component):
     """Enables the entity to move based on its velocity
     and respond to collisions with other sprites."""
+    __slots__ = ("DISCRETE_TIMESTEP",)
 
     def __init__(self):
         super().__init__()
@@ -178,35 +152,38 @@ class EntityRigidBodyComponent(Component):
     @staticmethod
     def handle_y_collisions(entity, map):
         """Handles collisions between entity and the terrain along the y-axis."""
-        colliding_sprites = pg.sprite.spritecollide(
-            entity, map.collideable_terrain_group, False)
-        for colliding_sprite in colliding_sprites:
-            if is_colliding_from_below(entity, colliding_sprite):
-                entity.rect.top = colliding_sprite.rect.bottom
+        colliding_rects = map.get_colliding_rects(entity.rect)
+        if __debug__ and counters.enabled:
+            counters.add(COLLISION_CALLS, 1)
+            counters.add(SPRITES_TESTED, map.count_collision_candidates(entity.rect))
+        for colliding_rect in colliding_rects:
+            if is_colliding_from_below(entity.rect, colliding_rect):
+                entity.rect.top = colliding_rect.bottom
                 entity.set_y_velocity(0)
-            if is_colliding_from_above(entity, colliding_sprite):
-                is_crushed = colliding_sprite.rect.bottom < entity.rect.centery
+            if is_colliding_from_above(entity.rect, colliding_rect):
+                is_crushed = colliding_rect.bottom < entity.rect.centery
                 if is_crushed:
                     entity.message(EntityMessage.DIE)
                 else:
                     if entity.get_state() is EntityState.JUMPING:
                         entity.set_state(EntityState.IDLE)
-                    entity.rect.bottom = colliding_sprite.rect.top
+                    entity.rect.bottom = colliding_rect.top
                     entity.set_y_velocity(0)
 
     @staticmethod
     def handle_x_collisions(entity, map):
         """Handles collisions between entity and the terrain along the x-axis."""
-        colliding_sprites = pg.sprite.spritecollide(
-            entity, map.collideable_terrain_group, False)
-        for colliding_sprite in colliding_sprites:
-            if not colliding_sprite.is_spike:
-                if is_colliding_from_right(entity, colliding_sprite):
-                    entity.rect.left = colliding_sprite.rect.right
-                    entity.message(EntityMessage.AI_TURN_RIGHT)
-                if is_colliding_from_left(entity, colliding_sprite):
-                    entity.rect.right = colliding_sprite.rect.left
-                    entity.message(EntityMessage.AI_TURN_LEFT)
+        colliding_rects = map.get_colliding_rects(entity.rect, include_spikes=False)
+        if __debug__ and counters.enabled:
+            counters.add(COLLISION_CALLS, 1)
+            counters.add(SPRITES_TESTED, map.count_collision_candidates(entity.rect))
+        for colliding_rect in colliding_rects:
+            if is_colliding_from_right(entity.rect, colliding_rect):
+                entity.rect.left = colliding_rect.right
+                entity.message(EntityMessage.AI_TURN_RIGHT)
+            if is_colliding_from_left(entity.rect, colliding_rect):
+                entity.rect.right = colliding_rect.left
+                entity.message(EntityMessage.AI_TURN_LEFT)
 
     @staticmethod
     def handle_map_boundary_collisions(entity, map):
@@ -220,18 +197,18 @@ class EntityRigidBodyComponent(Component):
             entity.rect.right = map_width
 
 
-def is_colliding_from_below(entity, colliding_sprite):
-    return colliding_sprite.rect.top <= entity.rect.top <= colliding_sprite.rect.bottom
+def is_colliding_from_below(rect, colliding_rect):
+    return colliding_rect.top <= rect.top <= colliding_rect.bottom
 
 
-def is_colliding_from_above(entity, colliding_sprite):
-    return colliding_sprite.rect.top <= entity.rect.bottom <= colliding_sprite.rect.bottom
+def is_colliding_from_above(rect, colliding_rect):
+    return colliding_rect.top <= rect.bottom <= colliding_rect.bottom
 
 
-def is_colliding_from_right(entity, colliding_sprite):
-    return colliding_sprite.rect.left <= entity.rect.left <= colliding_sprite.rect.right
+def is_colliding_from_right(rect, colliding_rect):
+    return colliding_rect.left <= rect.left <= colliding_rect.right
 
 
-def is_colliding_from_left(entity, colliding_sprite):
-    return colliding_sprite.rect.left <= entity.rect.right <= colliding_sprite.rect.right
+def is_colliding_from_left(rect, colliding_rect):
+    return colliding_rect.left <= rect.right <= colliding_rect.right
 
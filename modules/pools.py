@@ -0,0 +1,75 @@
+import pygame as pg
+
+"""
+* =============================================================== *
+* This module contains the ObjectPool, which keeps the objects    *
+* of a level once it is unloaded, so that the next level reuses   *
+* them instead of allocating new ones.                            *
+* =============================================================== *
+
+POOLING
+-------------------------
+A pool creates an object with its create function the first time it is acquired, and resets a released
+object with its reset function when it is acquired again. Both are called with the arguments given to
+acquire(), so a pooled object is set up exactly as a new one would be:
+    rect = rect_pool.acquire((x, y), (width, height))       # pg.Rect((x, y), (width, height)), or
+                                                            # rect.update((x, y), (width, height))
+
+Objects are released when the level that acquired them is unloaded. A released object must not be used
+by anything else, as it may be handed out again as soon as the next level loads. Each pool keeps at most
+MAX_FREE_OBJECTS, and drops the rest, so a single very large level does not hold on to its objects for
+the rest of the session.
+
+The pools of Blocks are in block.py. The numbers of objects created and reused by every pool are
+reported by the GCPolicy of gcpolicy.py after each level load.
+"""
+
+MAX_FREE_OBJECTS = 4096
+
+# Every pool, in the order in which they were created
+pools = []
+
+
+class ObjectPool:
+    """Hands out released objects of a single class before creating new ones"""
+
+    def __init__(self, name: str, create, reset):
+        """Creates an ObjectPool.
+
+        :param name:        The name under which the pool is reported.
+        :param create:      Called with the arguments of acquire() to create a new object.
+        :param reset:       Called with a released object and the arguments of acquire() to reuse it.
+        """
+
+        self.name = name
+        self.create = create
+        self.reset = reset
+        self.free_objects = []
+        self.created_count = 0
+        self.reused_count = 0
+        pools.append(self)
+
+    def acquire(self, *args):
+        if self.free_objects:
+            pooled_object = self.free_objects.pop()
+            self.reset(pooled_object, *args)
+            self.reused_count += 1
+            return pooled_object
+        self.created_count += 1
+        return self.create(*args)
+
+    def release(self, pooled_object):
+        if len(self.free_objects) < MAX_FREE_OBJECTS:
+            self.free_objects.append(pooled_object)
+
+    def release_all(self, pooled_objects):
+        self.free_objects.extend(pooled_objects[:MAX_FREE_OBJECTS - len(self.free_objects)])
+
+
+def count_pooled_objects() -> tuple:
+    """Returns the total numbers of objects created and reused by every pool so far"""
+    return sum(pool.created_count for pool in pools), sum(pool.reused_count for pool in pools)
+
+
+# Rects of entities, such as the rect column of the enemies
+rect_pool = ObjectPool("Rect", pg.Rect, pg.Rect.update)
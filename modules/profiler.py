@@ -0,0 +1,207 @@
+import atexit
+import os
+import sys
+import threading
+import time
+import pygame as pg
+from .runtime import get_user_data_path
+from .telemetry import telemetry
+from .inputstate import input_state
+
+"""
+* =============================================================== *
+* This module contains the sampling profiler, which periodically  *
+* records the call stack of the game loop during gameplay, and    *
+* attributes each sample to the phase of the frame it fell in.    *
+* =============================================================== *
+
+RECORDING
+-------------------------
+While recording, a background thread takes the Python call stack of the main thread every SAMPLE_INTERVAL
+seconds, which costs far less than tracing every call as cProfile does. Samples are only kept while the
+game loop is inside a frame of the scene passed to set_scope(), which is GameScene, so menus and the
+sleep between frames are left out.
+
+Each sample is attributed to the phase of the telemetry lap that follows it, so that the phases match
+those of the telemetry overlay. Recording therefore enables telemetry. As the sampler needs the GIL to
+run, the switch interval of the interpreter is shortened while recording.
+
+Set the TOWER_PROFILE environment variable to record from startup. If its value ends in .collapsed, the
+profile is written to that path when recording stops or the game exits, and to the user data directory
+otherwise.
+
+HOTKEYS
+-------------------------
+    F5                  ->          Starts or stops recording, writing the profile when stopping
+
+OUTPUT
+-------------------------
+Two files are written:
+    *.collapsed         ->          One line per distinct stack, as "phase;outermost;...;innermost count",
+                                    which flamegraph.pl and speedscope read directly
+    *-top.txt           ->          The TOP_COUNT functions of TOP_FILES with the most samples, both
+                                    inclusive and exclusive of the functions they call
+
+Functions are named "file.py:qualified name", using the file name alone so that the names are the
+same in a frozen build, where the code is loaded from a zip file.
+"""
+
+PROFILE_VARIABLE = "TOWER_PROFILE"
+PROFILE_SUFFIX = ".collapsed"
+
+SAMPLE_INTERVAL = 0.002
+SWITCH_INTERVAL = 0.001     # Interpreter switch interval while recording, so the sampler is not starved
+
+TOP_FILES = ("physics.py", "leveljson.py", "block.py")
+TOP_COUNT = 20
+
+
+def get_filename(label: str) -> str:
+    return label.partition(":")[0]
+
+
+class SamplingProfiler:
+    """Samples the call stack of the main thread on a background thread, and aggregates the samples
+    by phase and stack"""
+
+    def __init__(self, frame_telemetry, enabled=None):
+        """Creates a SamplingProfiler.
+
+        :param frame_telemetry: The FrameTelemetry whose laps delimit the phases.
+        :param enabled:         Overrides the TOWER_PROFILE environment variable if not None.
+        """
+
+        self.telemetry = frame_telemetry
+        self.output_path = os.environ.get(PROFILE_VARIABLE, "")
+        self.main_thread_id = threading.main_thread().ident
+        self.is_recording = False
+        self.is_in_scope = False
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.pending_samples = []       # (time, stack) of the samples taken since the last lap
+        self.stack_counts = {}          # (phase, stack) -> number of samples
+        self.labels = {}                # Code object -> name of its function
+        self.previous_switch_interval = sys.getswitchinterval()
+
+        if bool(self.output_path) if enabled is None else enabled:
+            self.start()
+            atexit.register(self.stop)
+
+    def set_scope(self, is_in_scope: bool):
+        """Sets whether the current frame is one to be profiled. Called by the game loop every frame."""
+        self.is_in_scope = is_in_scope
+
+    def start(self):
+        if self.is_recording:
+            return
+        self.is_recording = True
+        self.stack_counts = {}
+        self.pending_samples = []
+        self.telemetry.enable()
+        self.telemetry.add_lap_listener(self.attribute_samples)
+        self.previous_switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(SWITCH_INTERVAL)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.sample, name="profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops recording and writes the profile, if any samples were taken"""
+        if not self.is_recording:
+            return
+        self.is_recording = False
+        self.stop_event.set()
+        self.thread.join()
+        self.telemetry.remove_lap_listener(self.attribute_samples)
+        sys.setswitchinterval(self.previous_switch_interval)
+        if self.stack_counts:
+            self.export(self.get_output_path())
+
+    def toggle(self):
+        if self.is_recording:
+            self.stop()
+        else:
+            self.start()
+
+    def handle_hotkeys(self):
+        """Handles the hotkey if pressed during this tick, which must be done once the input state is sampled"""
+        if input_state.was_pressed(pg.K_F5):
+            self.toggle()
+
+    def get_label(self, code) -> str:
+        label = self.labels.get(code)
+        if label is None:
+            label = self.labels[code] = "%s:%s" % (os.path.basename(code.co_filename),
+                                                   getattr(code, "co_qualname", code.co_name))
+        return label
+
+    def sample(self):
+        """Runs on the profiler thread until recording stops"""
+        while not self.stop_event.wait(SAMPLE_INTERVAL):
+            if not (self.is_in_scope and self.telemetry.is_in_frame):
+                continue
+            frame = sys._current_frames().get(self.main_thread_id)
+            sample_time = time.perf_counter()
+            stack = []
+            while frame is not None:
+                stack.append(self.get_label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            with self.lock:
+                self.pending_samples.append((sample_time, tuple(stack)))
+
+    def attribute_samples(self, phase: str, lap_time: float):
+        """Attributes the samples taken before the lap to its phase. Called by the telemetry on every lap."""
+        with self.lock:
+            samples = self.pending_samples
+            self.pending_samples = [sample for sample in samples if sample[0] > lap_time]
+        for sample_time, stack in samples:
+            if sample_time <= lap_time:
+                key = (phase, stack)
+                self.stack_counts[key] = self.stack_counts.get(key, 0) + 1
+
+    def get_output_path(self) -> str:
+        if self.output_path.endswith(PROFILE_SUFFIX):
+            return self.output_path
+        return get_user_data_path(time.strftime("profile-%Y%m%d-%H%M%S" + PROFILE_SUFFIX))
+
+    def get_top_functions(self) -> list:
+        """Returns (label, inclusive samples, exclusive samples) of the functions of TOP_FILES with
+        the most inclusive samples"""
+        inclusive_counts = {}
+        exclusive_counts = {}
+        for (phase, stack), count in self.stack_counts.items():
+            for label in set(stack):
+                if get_filename(label) in TOP_FILES:
+                    inclusive_counts[label] = inclusive_counts.get(label, 0) + count
+            if stack and get_filename(stack[-1]) in TOP_FILES:
+                exclusive_counts[stack[-1]] = exclusive_counts.get(stack[-1], 0) + count
+        top_labels = sorted(inclusive_counts, key=inclusive_counts.get, reverse=True)[:TOP_COUNT]
+        return [(label, inclusive_counts[label], exclusive_counts.get(label, 0)) for label in top_labels]
+
+    def export(self, filepath: str):
+        """Writes the collapsed stacks to the given path, and the table of top functions next to it"""
+        with open(filepath, "w") as f:
+            for (phase, stack), count in sorted(self.stack_counts.items()):
+                f.write("%s %d\n" % (";".join((phase,) + stack), count))
+
+        total = sum(self.stack_counts.values())
+        phase_counts = {}
+        for (phase, stack), count in self.stack_counts.items():
+            phase_counts[phase] = phase_counts.get(phase, 0) + count
+
+        top_path = filepath[:-len(PROFILE_SUFFIX)] if filepath.endswith(PROFILE_SUFFIX) else filepath
+        with open(top_path + "-top.txt", "w") as f:
+            f.write("%d samples, one every %.1f ms\n\n" % (total, SAMPLE_INTERVAL * 1000))
+            f.write("%-20s %8s %8s\n" % ("phase", "samples", "%"))
+            for phase, count in sorted(phase_counts.items(), key=lambda item: item[1], reverse=True):
+                f.write("%-20s %8d %8.1f\n" % (phase, count, count / total * 100))
+            f.write("\n%-60s %10s %10s %8s\n" % ("function", "inclusive", "exclusive", "incl %"))
+            for label, inclusive, exclusive in self.get_top_functions():
+                f.write("%-60s %10d %10d %8.1f\n" % (label, inclusive, exclusive, inclusive / total * 100))
+        print("[profiler] wrote %d samples to %s" % (total, filepath), file=sys.stderr)
+
+
+# The profiler shared by the whole game
+profiler = SamplingProfiler(telemetry)
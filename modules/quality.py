@@ -0,0 +1,189 @@
+import os
+import sys
+import pygame as pg
+from .inputstate import input_state
+
+"""
+* =============================================================== *
+* This module contains the QualityGovernor, which drops the work  *
+* that matters least to the player, one tier at a time, when the  *
+* frames of gameplay run over budget.                             *
+* =============================================================== *
+
+TIERS
+-------------------------
+Each QualityTier in QUALITY_TIERS does less work than the one before it:
+    high                ->      everything is drawn and simulated
+    medium              ->      enemies outside NEAR_AREA around the player, which are out of sight, only
+                                advance their animations every few ticks
+    low                 ->      also skips the decorations layer of the map, and fills the screen with a
+                                flat colour instead of blitting the backgrounds
+    minimum             ->      also freezes the enemies outside the simulation area around the player
+
+The code that does the work reads the tier from quality_governor.tier on every frame, so a change of tier
+takes effect on the next frame.
+
+GOVERNOR
+-------------------------
+main.py records the time taken by every frame of gameplay, not counting the time spent waiting for the
+next frame. Every EVALUATION_FRAMES frames, the governor:
+    steps down a tier       ->      if the SLOW_FRAME_PERCENTILE of the last EVALUATION_FRAMES frames is
+                                    over FRAME_BUDGET
+    steps up a tier         ->      if the SLOW_FRAME_PERCENTILE of the frames since the last change is
+                                    under UPGRADE_HEADROOM of FRAME_BUDGET, over at least upgrade_frames
+
+If the tier above turns out to be too slow as soon as it is tried, the governor waits twice as long
+before trying it again, up to MAX_UPGRADE_FRAMES, so that it does not keep switching between two tiers.
+Every change of tier is reported to stderr.
+
+SELECTING A TIER BY HAND
+-------------------------
+Set the TOWER_QUALITY environment variable to the name of a tier to play at that tier throughout, and
+press F6 to cycle through the tiers and back to automatic selection.
+"""
+
+QUALITY_VARIABLE = "TOWER_QUALITY"
+
+FRAME_BUDGET = 1000 / 60                # Milliseconds
+SLOW_FRAME_PERCENTILE = 90
+EVALUATION_FRAMES = 60
+UPGRADE_HEADROOM = 0.6
+UPGRADE_FRAMES = 180
+MAX_UPGRADE_FRAMES = 3600
+
+# The area around the player in which enemies may be seen, which is larger than the screen
+NEAR_AREA = (480, 360)
+
+
+class QualityTier:
+    """The work done by the game at a level of quality"""
+    __slots__ = ("name", "draw_backgrounds", "draw_decorations", "distant_animation_interval", "simulation_area")
+
+    def __init__(self, name: str, draw_backgrounds=True, draw_decorations=True, distant_animation_interval=1,
+                 simulation_area=None):
+        """Creates a QualityTier.
+
+        :param name:                        The name under which the tier is reported and selected.
+        :param draw_backgrounds:            Whether the backgrounds are blitted behind the level.
+        :param draw_decorations:            Whether the decorations layer of the map is blitted.
+        :param distant_animation_interval:  The number of ticks between the animation updates of enemies
+                                            outside NEAR_AREA.
+        :param simulation_area:             The size of the area around the player outside which enemies are
+                                            frozen, or None to simulate every enemy.
+        """
+
+        self.name = name
+        self.draw_backgrounds = draw_backgrounds
+        self.draw_decorations = draw_decorations
+        self.distant_animation_interval = distant_animation_interval
+        self.simulation_area = simulation_area
+
+
+QUALITY_TIERS = (QualityTier("high"),
+                 QualityTier("medium", distant_animation_interval=4),
+                 QualityTier("low", draw_backgrounds=False, draw_decorations=False, distant_animation_interval=4),
+                 QualityTier("minimum", draw_backgrounds=False, draw_decorations=False, distant_animation_interval=8,
+                             simulation_area=(800, 600)))
+
+
+def get_percentile(values: list, percentile: float) -> float:
+    sorted_values = sorted(values)
+    return sorted_values[min(len(sorted_values) - 1, int(percentile / 100 * len(sorted_values)))]
+
+
+def get_area_around(rect, size: tuple) -> pg.Rect:
+    """Returns an area of the given size, centred on the given rect"""
+    area = pg.Rect((0, 0), size)
+    area.center = rect.center
+    return area
+
+
+class QualityGovernor:
+    """Steps through the quality tiers to keep the frames of gameplay within budget"""
+
+    def __init__(self, tiers=QUALITY_TIERS, tier_name=None):
+        """Creates a QualityGovernor.
+
+        :param tiers:       The tiers, from the highest quality to the lowest.
+        :param tier_name:   Overrides the TOWER_QUALITY environment variable if not None.
+        """
+
+        self.tiers = tiers
+        self.tier_index = 0
+        self.is_automatic = True
+        self.frame_times = []               # Milliseconds taken by the frames since the last change of tier
+        self.upgrade_frames = UPGRADE_FRAMES
+        self.is_trying_upgrade = False      # Whether the tier was stepped up at the last evaluation
+
+        tier_name = os.environ.get(QUALITY_VARIABLE) if tier_name is None else tier_name
+        if tier_name:
+            self.select_tier(self.get_tier_index(tier_name))
+
+    @property
+    def tier(self) -> QualityTier:
+        return self.tiers[self.tier_index]
+
+    def get_tier_index(self, tier_name: str) -> int:
+        for index, tier in enumerate(self.tiers):
+            if tier.name == tier_name:
+                return index
+        raise ValueError("unknown quality tier %r, expected one of %s" % (
+            tier_name, ", ".join(tier.name for tier in self.tiers)))
+
+    def select_tier(self, tier_index):
+        """Plays at the given tier until select_automatic() is called"""
+        self.is_automatic = False
+        self.set_tier(tier_index, "selected by hand")
+
+    def select_automatic(self):
+        self.is_automatic = True
+        self.frame_times = []
+        self.is_trying_upgrade = False
+        print("[quality] %s: automatic" % self.tier.name, file=sys.stderr)
+
+    def set_tier(self, tier_index: int, reason: str):
+        print("[quality] %s -> %s: %s" % (self.tier.name, self.tiers[tier_index].name, reason), file=sys.stderr)
+        self.tier_index = tier_index
+        self.frame_times = []
+
+    def record_frame(self, frame_time: float):
+        """Records the milliseconds taken by a frame of gameplay, and changes tier if needed"""
+        if not self.is_automatic:
+            return
+        self.frame_times.append(frame_time)
+        if len(self.frame_times) % EVALUATION_FRAMES != 0:
+            return
+
+        slow_frame_time = get_percentile(self.frame_times[-EVALUATION_FRAMES:], SLOW_FRAME_PERCENTILE)
+        if slow_frame_time > FRAME_BUDGET and self.tier_index < len(self.tiers) - 1:
+            if self.is_trying_upgrade:
+                # The tier above could not keep up either, so it is not tried again as soon
+                self.upgrade_frames = min(self.upgrade_frames * 2, MAX_UPGRADE_FRAMES)
+                self.is_trying_upgrade = False
+            self.set_tier(self.tier_index + 1, "%.1f ms at p%d" % (slow_frame_time, SLOW_FRAME_PERCENTILE))
+            return
+        self.is_trying_upgrade = False
+
+        if len(self.frame_times) >= self.upgrade_frames:
+            slow_frame_time = get_percentile(self.frame_times, SLOW_FRAME_PERCENTILE)
+            if self.tier_index > 0 and slow_frame_time < FRAME_BUDGET * UPGRADE_HEADROOM:
+                self.set_tier(self.tier_index - 1, "%.1f ms at p%d" % (slow_frame_time, SLOW_FRAME_PERCENTILE))
+                self.is_trying_upgrade = True
+            else:
+                self.frame_times = []
+
+    def handle_hotkeys(self):
+        """Cycles through the tiers and back to automatic selection if F6 was pressed during this tick, which
+        must be done once the input state is sampled"""
+        if not input_state.was_pressed(pg.K_F6):
+            return
+        if self.is_automatic:
+            self.select_tier(0)
+        elif self.tier_index < len(self.tiers) - 1:
+            self.select_tier(self.tier_index + 1)
+        else:
+            self.select_automatic()
+
+
+# The quality governor shared by the whole game
+quality_governor = QualityGovernor()
@@ -0,0 +1,231 @@
+import sys
+from array import array
+import pygame as pg
+from .entities import ENEMY_MUTABLE_COMPONENTS
+
+"""
+* =============================================================== *
+* This module contains the RewindBuffer, which records the state  *
+* of a level and its player every tick, so that the last seconds  *
+* of play can be rewound one tick at a time.                      *
+* =============================================================== *
+
+RECORDING
+-------------------------
+Every tick, the state saved by the snapshots of modules/snapshot.py is flattened into a list of fields:
+    player              ->          the fields of Player.save_state()
+    enemies             ->          every component of every enemy, one component at a time, with the rects
+                                    of ENEMY_MUTABLE_COMPONENTS split into x, y, width and height
+    interactive objects ->          the position, groups and STATE_ATTRIBUTES of every Block of the map
+
+Each field is stored as a code into a table of the values seen since the level started, so that a field
+takes 4 bytes however large its value is. Values that cannot be hashed, such as the dicts of animations,
+are told apart by identity, which is safe as the table keeps them alive.
+
+Most ticks are stored as a delta, i.e. the positions and codes of the fields that changed since the
+previous tick, in a single array. A keyframe holding every field is stored every KEYFRAME_INTERVAL ticks,
+and whenever the number of enemies or interactive objects changes, as the positions of the fields do too,
+or the chunks of a StreamingMap are loaded or evicted, as the fields then belong to other objects.
+
+The buffer is a ring of a fixed number of ticks. Once it is full, every new tick overwrites the oldest,
+and the deltas that followed an overwritten keyframe are dropped with it, as they can no longer be
+decoded. The buffer therefore always holds between capacity - KEYFRAME_INTERVAL and capacity ticks.
+
+REWINDING
+-------------------------
+rewind() drops the newest tick, then decodes the tick before it from the last keyframe and the deltas
+after it, and restores it with the restore_state() methods of the player, the enemies and the map, once
+the layout of the map has been restored if it differs, see modules/snapshot.py. A step therefore decodes
+at most KEYFRAME_INTERVAL ticks, whatever the length of the buffer.
+
+Refilling the groups of the map is the slowest part of a restore, so it is only done when an object was
+added to or removed from a group during the dropped tick. Otherwise, only the objects that moved or
+changed are restored, with Map.restore_blocks(). This relies on the level being left in the state of the
+newest tick, which GameScene ensures by either recording or rewinding every tick.
+
+GameScene records every tick of a level started from the level selection screen, and rewinds while
+REWIND_KEY is held.
+"""
+
+DEFAULT_CAPACITY = 600      # 10 seconds at 60 ticks per second
+KEYFRAME_INTERVAL = 60
+REWIND_KEY = pg.K_r
+
+
+class RewindBuffer:
+    """A ring of the states of a level and its player over the last ticks"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, keyframe_interval=KEYFRAME_INTERVAL):
+        self.capacity = capacity
+        self.keyframe_interval = keyframe_interval
+        self.frames = [None] * capacity     # (layout, is_keyframe, fields or changes) of each tick
+        self.first = 0                      # The slot of the oldest tick
+        self.count = 0
+        self.level = None                   # The level whose ticks are recorded
+        self.last_fields = None             # The fields of the newest tick
+        self.last_layout = None
+        self.deltas_since_keyframe = 0
+        self.values = []                    # Code -> value
+        self.codes = {}                     # Key of a value -> code, see get_code()
+
+    def __len__(self):
+        return self.count
+
+    def clear(self, level=None):
+        """Drops every tick, and starts recording the given level"""
+        self.frames = [None] * self.capacity
+        self.first = 0
+        self.count = 0
+        self.level = level
+        self.last_fields = None
+        self.last_layout = None
+        self.deltas_since_keyframe = 0
+        self.values = []
+        self.codes = {}
+
+    def get_code(self, value) -> int:
+        try:
+            key = (value.__class__, value)
+            code = self.codes.get(key)
+        except TypeError:
+            key = id(value)
+            code = self.codes.get(key)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[key] = code
+        return code
+
+    def encode(self, level, player) -> tuple:
+        """Returns the layout of the level, which is its number of enemies and interactive objects and the
+        layout of its map, and the codes of its fields"""
+        get_code = self.get_code
+        fields = [get_code(value) for value in player.save_state()]
+
+        enemies = level.enemies.enemies
+        for component_name, column in enemies.columns.items():
+            if component_name in ENEMY_MUTABLE_COMPONENTS:
+                for rect in column:
+                    fields.extend(get_code(value) for value in rect)
+            else:
+                fields.extend(get_code(value) for value in column)
+
+        for block, rect, groups, attributes in level.map.save_state():
+            fields.extend(get_code(value) for value in rect)
+            fields.append(get_code(groups))
+            fields.extend(get_code(value) for value in attributes)
+
+        return (len(enemies), len(level.map.blocks), level.map.get_layout()), fields
+
+    def decode(self, layout: tuple, fields: list, level, player, previous_fields=None):
+        """Restores the level and the player to the state of the given fields. If the level is in the state
+        of previous_fields, which have the same layout, only the interactive objects that differ are
+        restored, and their groups are only refilled if any of them was added to or removed from one."""
+        values = self.values
+        decoded = [values[code] for code in fields]
+
+        player_field_count = len(player.save_state())
+        player.restore_state(tuple(decoded[:player_field_count]))
+        position = player_field_count
+
+        enemy_count, block_count, map_layout = layout
+        level.map.restore_layout(map_layout)
+        columns = {}
+        for component_name in level.enemies.enemies.component_names:
+            if component_name in ENEMY_MUTABLE_COMPONENTS:
+                columns[component_name] = [pg.Rect(decoded[start:start + 4])
+                                           for start in range(position, position + 4 * enemy_count, 4)]
+                position += 4 * enemy_count
+            else:
+                columns[component_name] = decoded[position:position + enemy_count]
+                position += enemy_count
+        level.enemies.restore_state(columns)
+
+        map_state = []
+        changed_state = []
+        groups_changed = previous_fields is None
+        for block in level.map.blocks[:block_count]:
+            end = position + 5 + len(block.STATE_ATTRIBUTES)
+            block_state = (block, tuple(decoded[position:position + 4]), decoded[position + 4],
+                           tuple(decoded[position + 5:end]))
+            map_state.append(block_state)
+            if not groups_changed and fields[position:end] != previous_fields[position:end]:
+                changed_state.append(block_state)
+                groups_changed = fields[position + 4] != previous_fields[position + 4]
+            position = end
+
+        if groups_changed:
+            level.map.restore_state(map_state)
+        else:
+            level.map.restore_blocks(changed_state)
+
+    def record(self, level, player):
+        """Records the state of the level and the player at the end of a tick"""
+        if level is not self.level:
+            self.clear(level)
+        layout, fields = self.encode(level, player)
+        if layout == self.last_layout:
+            layout = self.last_layout
+
+        if self.count == 0 or layout != self.last_layout or self.deltas_since_keyframe >= self.keyframe_interval - 1:
+            self.push((layout, True, array("i", fields)))
+            self.deltas_since_keyframe = 0
+        else:
+            changes = array("i")
+            for position, (code, last_code) in enumerate(zip(fields, self.last_fields)):
+                if code != last_code:
+                    changes.append(position)
+                    changes.append(code)
+            self.push((layout, False, changes))
+            self.deltas_since_keyframe += 1
+        self.last_fields = fields
+        self.last_layout = layout
+
+    def push(self, frame: tuple):
+        if self.count == self.capacity:
+            # Drops the oldest keyframe, and the deltas that can no longer be decoded without it
+            self.drop_oldest()
+            while self.count > 0 and not self.frames[self.first][1]:
+                self.drop_oldest()
+        self.frames[(self.first + self.count) % self.capacity] = frame
+        self.count += 1
+
+    def drop_oldest(self):
+        self.frames[self.first] = None
+        self.first = (self.first + 1) % self.capacity
+        self.count -= 1
+
+    def rewind(self, level, player) -> bool:
+        """Steps the level and the player back by one tick. Returns False, leaving them as they are, if the
+        buffer holds no earlier tick of this level."""
+        if level is not self.level or self.count < 2:
+            return False
+        self.frames[(self.first + self.count - 1) % self.capacity] = None
+        self.count -= 1
+
+        # Finds the keyframe that the newest tick is decoded from
+        newest = self.first + self.count - 1
+        keyframe = newest
+        while not self.frames[keyframe % self.capacity][1]:
+            keyframe -= 1
+
+        layout, _, keyframe_fields = self.frames[keyframe % self.capacity]
+        fields = keyframe_fields.tolist()
+        for slot in range(keyframe + 1, newest + 1):
+            changes = self.frames[slot % self.capacity][2]
+            for index in range(0, len(changes), 2):
+                fields[changes[index]] = changes[index + 1]
+
+        # The level is still in the state of the tick that was dropped, unless it was recorded with another layout
+        previous_fields = self.last_fields if layout == self.last_layout else None
+        self.decode(layout, fields, level, player, previous_fields)
+        self.last_fields = fields
+        self.last_layout = layout
+        self.deltas_since_keyframe = newest - keyframe
+        return True
+
+    def get_size(self) -> int:
+        """Returns the number of bytes taken by the recorded ticks and the table of values, apart from the
+        values themselves, which are shared with the level"""
+        return (sys.getsizeof(self.frames) + sys.getsizeof(self.values) + sys.getsizeof(self.codes) +
+                sum(sys.getsizeof(frame) + sys.getsizeof(frame[2]) for frame in self.frames if frame is not None))
@@ -0,0 +1,172 @@
+import os
+import sys
+import time
+import pygame as pg
+import pygame.freetype as ft
+from .assets import load_font
+from .sound import sound_bank
+
+"""
+* =============================================================== *
+* This module contains the explicit initialisation steps that     *
+* bring up PyGame, the mixer and the fonts. Nothing in here runs  *
+* at import time, so that main() can open a window before any of  *
+* the slower subsystems are touched.                              *
+* =============================================================== *
+
+STARTUP ORDER
+-------------------------
+main() is expected to call the functions below in this order:
+    init_display()      ->      Initialises the video subsystem and opens the window
+    init_audio()        ->      Initialises the mixer with the settings used by the game
+    get_font()          ->      Loads the game font on first use
+
+Any other PyGame modules are initialised by pg.init() afterwards, which is a no-op for the
+modules that have already been brought up.
+
+Set the TOWER_STARTUP_TRACE environment variable to print the time taken by each phase up
+to the first frame.
+
+IDLING
+-------------------------
+Screens that only change when an event arrives, such as menus, are not redrawn every frame. While one is
+shown and nothing has changed, main() sleeps in wait_for_event() instead, and wakes at least every
+IDLE_WAKE_INTERVAL milliseconds to keep the music and the background tasks going, or every
+MUSIC_WAKE_INTERVAL milliseconds while the music is switching tracks, so that the next track starts as
+soon as the previous one has faded out. A scene is redrawn once any event is left in the queue for it,
+whether it arrived during the wait or not.
+
+USER DATA
+-------------------------
+Files written by the game, such as cached leaderboards, are kept in a .thetower directory in the
+home directory of the player, or in the directory given by the TOWER_DATA_DIR environment variable.
+"""
+
+FONT_PATH = "assets/fonts/pixChicago.ttf"
+FONT_SIZE = 8
+
+# Mixer settings: frequency, size, channels, buffer
+MIXER_SETTINGS = (44100, 16, 2, 512)
+
+# Longest time that the game loop sleeps for on a screen that has not changed
+IDLE_WAKE_INTERVAL = 250
+# Longest time that it sleeps for while the music player is switching tracks, see MusicPlayer.update()
+MUSIC_WAKE_INTERVAL = 10
+
+STARTUP_TRACE_VARIABLE = "TOWER_STARTUP_TRACE"
+USER_DATA_VARIABLE = "TOWER_DATA_DIR"
+
+# Images and sounds decoded in parallel by main() while the window and mixer are being brought up.
+# Anything missing from here is still loaded on first use, just on the main thread.
+STARTUP_IMAGES = ("assets/textures/background/01_background.png",
+                  "assets/textures/background/03 background B.png",
+                  "assets/textures/background/04 background.png",
+                  "assets/textures/environment/animated/ruby.png",
+                  "assets/textures/environment/static/decorations.png",
+                  "assets/textures/environment/static/terrain.png",
+                  "assets/textures/hud/health_bar.png",
+                  "assets/textures/hud/health_bar_decoration.png",
+                  "assets/textures/player/adventurer-climb.png",
+                  "assets/textures/player/adventurer-idle.png",
+                  "assets/textures/player/adventurer-jump.png",
+                  "assets/textures/player/adventurer-run.png",
+                  "assets/textures/player/individual/idle1",
+                  "assets/textures/player/individual/jump",
+                  "assets/textures/player/individual/run",
+                  "assets/textures/enemies/Pink Guy/Idle.png",
+                  "assets/textures/enemies/Pink Guy/Jump.png",
+                  "assets/textures/enemies/Pink Guy/Run.png",
+                  "assets/textures/enemies/Tooth Walker/tooth walker dead.png",
+                  "assets/textures/enemies/Tooth Walker/tooth walker walk.png",
+                  "assets/textures/enemies/Trash Monster/Trash Monster-Idle.png",
+                  "assets/textures/enemies/Trash Monster/Trash Monster-Jump.png",
+                  "assets/textures/enemies/Trash Monster/Trash Monster-Run.png")
+
+STARTUP_SOUNDS = ("assets/sound/sfx",)
+
+_font = None
+
+
+def init_display(window_size, caption) -> pg.Surface:
+    """Initialises the video subsystem and returns the window surface"""
+    pg.display.init()
+    window = pg.display.set_mode(window_size)
+    pg.display.set_caption(caption, caption)
+    return window
+
+
+def init_audio():
+    """Initialises the mixer, unless something else already has, and sets up its channels. Safe to call more
+    than once."""
+    if pg.mixer.get_init() is None:
+        pg.mixer.init(*MIXER_SETTINGS)
+    sound_bank.reserve_channels()
+
+
+def wait_for_event(timeout: int) -> bool:
+    """Sleeps until an event arrives or the timeout, in milliseconds, elapses. Returns whether an event
+    arrived, which is left in the queue for the scene to process."""
+    event = pg.event.wait(timeout)
+    if event.type == pg.NOEVENT:
+        return False
+    pg.event.post(event)
+    return True
+
+
+def get_font() -> ft.Font:
+    """Returns the shared game font, loading it on first use"""
+    global _font
+    if _font is None:
+        if not ft.get_init():
+            ft.init()
+        _font = load_font(FONT_PATH, FONT_SIZE)   # size must be set to 8, otherwise AA kicks in
+        _font.antialiased = False
+    return _font
+
+
+def get_user_data_path(filename: str) -> str:
+    """Returns the path to the given file in the user data directory, creating the directory if needed"""
+    directory = os.environ.get(USER_DATA_VARIABLE) or os.path.join(os.path.expanduser("~"), ".thetower")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+class StartupTrace:
+    """Records the time taken by each phase of startup and prints a summary once the first
+    frame has been presented. Does nothing unless TOWER_STARTUP_TRACE is set."""
+
+    def __init__(self, start_time: float, enabled=None):
+        """Creates a StartupTrace.
+
+        :param start_time:  The time.perf_counter() value taken before the first import in main.py.
+        :param enabled:     Overrides the TOWER_STARTUP_TRACE environment variable if not None.
+        """
+
+        self.enabled = bool(os.environ.get(STARTUP_TRACE_VARIABLE)) if enabled is None else enabled
+        self.start_time = start_time
+        self.last_time = start_time
+        self.phases = []
+        self.is_reported = False
+
+    def mark(self, phase: str):
+        """Ends the current phase, attributing the time since the previous mark to it"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last_time))
+        self.last_time = now
+
+    def get_total_time(self) -> float:
+        return self.last_time - self.start_time
+
+    def report(self, stream=sys.stdout):
+        """Prints the duration of every phase, followed by the time to first frame.
+        Only the first call has any effect."""
+        if self.is_reported:
+            return
+        self.is_reported = True
+        if not self.enabled:
+            return
+        for phase, duration in self.phases:
+            print("[startup] %-16s %8.1f ms" % (phase, duration * 1000), file=stream)
+        print("[startup] %-16s %8.1f ms" % ("total", self.get_total_time() * 1000), file=stream)
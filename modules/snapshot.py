@@ -0,0 +1,48 @@
+"""
+* =============================================================== *
+* This module contains the WorldSnapshot, which saves the state   *
+* of a level and its player in memory, so that the level can be   *
+* retried without being loaded again.                             *
+* =============================================================== *
+
+SNAPSHOTS
+-------------------------
+Only the state that changes while a level is played is saved:
+    player              ->          position, velocities, state, direction and health, see Player.save_state()
+    enemies             ->          a copy of every component of every enemy, including those killed since,
+                                    see Archetype.save()
+    interactive objects ->          position, groups and STATE_ATTRIBUTES of every Block, so that collected
+                                    coins come back, see Map.save_state()
+    layout              ->          the chunks of a StreamingMap that are resident, and the records of those
+                                    that were evicted, see StreamingMap.get_layout()
+
+The layout is restored first, as it decides which enemies and interactive objects the rest of the state
+is restored to.
+
+Static tiles, textures and animations never change, so they are shared rather than saved. Restoring a
+snapshot only writes these values back, so it does not load files or create sprites, and it can be
+restored any number of times.
+
+GameScene takes a snapshot when a level starts, and restores it when the level is restarted from the
+game over screen.
+"""
+
+
+class WorldSnapshot:
+    """The state of a level and its player at the time the snapshot was taken"""
+
+    def __init__(self, level, player):
+        self.level = level
+        self.player_state = player.save_state()
+        self.enemy_state = level.enemies.save_state()
+        self.map_layout = level.map.get_layout()
+        self.map_state = level.map.save_state()
+
+    def restore(self, level, player):
+        """Brings the level and the player back to the time the snapshot was taken"""
+        if level is not self.level:
+            raise ValueError("the snapshot was taken of another level")
+        level.map.restore_layout(self.map_layout)
+        player.restore_state(self.player_state)
+        level.enemies.restore_state(self.enemy_state)
+        level.map.restore_state(self.map_state)
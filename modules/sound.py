@@ -0,0 +1,281 @@
+import io
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+import pygame as pg
+from .assets import load_sound, open_asset, normalise_path
+
+"""
+* =============================================================== *
+* This module contains the SoundBank, through which every sound   *
+* effect in the game is played, and the MusicPlayer, which plays  *
+* the background music. Each file is decoded once and shared, and *
+* the number of voices playing at once is capped so that bursts   *
+* of sounds cannot use up the mixer channels.                     *
+* =============================================================== *
+
+VOICES AND CHANNELS
+-------------------------
+The mixer plays each voice on one of CHANNEL_COUNT channels. The first RESERVED_CHANNEL_COUNT channels
+are reserved for sounds that must always be heard, such as menu feedback, and never used by other sounds.
+Music is streamed separately, and does not take up a channel. Every other sound plays on the remaining channels, so at most CHANNEL_COUNT - RESERVED_CHANNEL_COUNT
+gameplay voices play at once.
+
+Each sound also has its own voice limit. When a sound is already playing on that many channels, or
+every channel is busy, the new voice is dropped rather than cutting off another sound.
+
+STATISTICS
+-------------------------
+begin_level() starts a new set of statistics, recording the voices played, dropped and at peak, and
+the memory taken by the decoded sounds that were used. Set the TOWER_SOUND_STATS environment variable
+to print the statistics of each level when the next one begins.
+
+MUSIC
+-------------------------
+Music is streamed with pg.mixer.music, which decodes the track bit by bit as it plays. The compressed
+file is read into memory on a background thread first, so that switching tracks never waits on the
+disk during a frame. Only the file of the track that is playing, and of the track that is to be played
+next, are kept in memory, at a few MB each, whereas a fully decoded track would take about 10 MB per
+minute.
+
+Scenes call music_player.play() with the track they want. If it is already playing, nothing happens.
+Otherwise, the current track keeps playing until the new one has been read, then fades out over
+FADE_MS, and the new one fades in over FADE_MS, as only one track can be streamed at a time. preload()
+starts reading a track that is likely to be played next, such as the game music while the title screen
+is shown. update() must be called once per frame to carry on with the switch, and is_switching() tells
+the game loop not to sleep for long while it does.
+
+A track that cannot be read is reported to stderr and dropped, and the track that was playing carries on.
+"""
+
+CHANNEL_COUNT = 16
+RESERVED_CHANNEL_COUNT = 2
+DEFAULT_VOICE_LIMIT = 2
+
+FADE_MS = 500
+
+SOUND_STATS_VARIABLE = "TOWER_SOUND_STATS"
+LEVEL_STATS_HISTORY = 24     # Statistics of older levels are dropped, so that long sessions do not grow
+
+
+class BankedSound:
+    """A decoded sound owned by the SoundBank, which enforces its voice limit when played"""
+
+    def __init__(self, bank, path: str, sound: pg.mixer.Sound, voice_limit: int, is_reserved: bool):
+        self.bank = bank
+        self.path = path
+        self.sound = sound
+        self.voice_limit = voice_limit
+        self.is_reserved = is_reserved
+        self.channels = []
+
+    def play(self):
+        return self.bank.play(self)
+
+    def get_active_voices(self) -> int:
+        """Returns the number of channels currently playing this sound"""
+        self.channels = [channel for channel in self.channels
+                         if channel.get_busy() and channel.get_sound() is self.sound]
+        return len(self.channels)
+
+    def get_memory_size(self) -> int:
+        """Returns the number of bytes taken by the decoded samples"""
+        frequency, size, channel_count = pg.mixer.get_init()
+        return int(self.sound.get_length() * frequency * channel_count * abs(size) // 8)
+
+
+class SoundStats:
+    """Sound usage over a single level"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.plays = 0
+        self.drops = 0
+        self.peak_voices = 0
+        self.sounds_used = set()
+
+    def get_memory_size(self) -> int:
+        return sum(sound.get_memory_size() for sound in self.sounds_used)
+
+    def to_dict(self) -> dict:
+        return {"level": self.name,
+                "plays": self.plays,
+                "drops": self.drops,
+                "peak_voices": self.peak_voices,
+                "sounds": len(self.sounds_used),
+                "memory_bytes": self.get_memory_size()}
+
+
+class SoundBank:
+    """Decodes each sound once and plays it within the voice limits"""
+
+    def __init__(self):
+        self.sounds = {}
+        self.stats = SoundStats("startup")
+        self.level_stats = deque(maxlen=LEVEL_STATS_HISTORY)
+        self.print_stats = bool(os.environ.get(SOUND_STATS_VARIABLE))
+
+    def reserve_channels(self):
+        """Sets up the mixer channels. Must be called once the mixer has been initialised."""
+        pg.mixer.set_num_channels(CHANNEL_COUNT)
+        pg.mixer.set_reserved(RESERVED_CHANNEL_COUNT)
+
+    def get(self, path: str, voice_limit=DEFAULT_VOICE_LIMIT, is_reserved=False) -> BankedSound:
+        """Returns the BankedSound for the given file, decoding it on first use.
+        The voice limit and reservation given on first use apply from then on."""
+        banked_sound = self.sounds.get(path)
+        if banked_sound is None:
+            banked_sound = BankedSound(self, path, load_sound(path), voice_limit, is_reserved)
+            self.sounds[path] = banked_sound
+        return banked_sound
+
+    def play(self, banked_sound: BankedSound):
+        """Plays the sound on a free channel, returning the Channel, or None if the voice was dropped"""
+        self.stats.sounds_used.add(banked_sound)
+
+        channel = None
+        if banked_sound.get_active_voices() < banked_sound.voice_limit:
+            if banked_sound.is_reserved:
+                channel = self.find_free_channel(0, RESERVED_CHANNEL_COUNT)
+            else:
+                channel = self.find_free_channel(RESERVED_CHANNEL_COUNT, CHANNEL_COUNT)
+
+        if channel is None:
+            self.stats.drops += 1
+            return None
+
+        channel.play(banked_sound.sound)
+        banked_sound.channels.append(channel)
+        self.stats.plays += 1
+        self.stats.peak_voices = max(self.stats.peak_voices, self.get_active_voices())
+        return channel
+
+    @staticmethod
+    def find_free_channel(first, last):
+        """Returns the first idle channel in the range, or None if they are all busy. The range is cut short
+        if the mixer has fewer channels, as it does until reserve_channels() is called.
+        pg.mixer.find_channel() is not used, as it also returns reserved channels."""
+        for i in range(first, min(last, pg.mixer.get_num_channels())):
+            channel = pg.mixer.Channel(i)
+            if not channel.get_busy():
+                return channel
+        return None
+
+    @staticmethod
+    def get_active_voices() -> int:
+        """Returns the number of sound effects playing"""
+        return sum(1 for i in range(pg.mixer.get_num_channels())
+                   if pg.mixer.Channel(i).get_busy())
+
+    def begin_level(self, name: str):
+        """Closes the statistics of the previous level and starts recording a new one"""
+        self.level_stats.append(self.stats.to_dict())
+        if self.print_stats:
+            print("[sound] %(level)s: %(plays)d plays, %(drops)d dropped, %(peak_voices)d peak voices, "
+                  "%(sounds)d sounds using %(memory_bytes)d bytes" % self.level_stats[-1], file=sys.stderr)
+        self.stats = SoundStats(name)
+
+
+def read_track(path: str) -> bytes:
+    with open_asset(path) as f:
+        return f.read()
+
+
+class MusicPlayer:
+    """Streams looping background music, reading tracks in the background and fading between them"""
+
+    def __init__(self):
+        self.executor = None
+        self.tracks = {}            # Path -> Future of the contents of the file
+        self.current_path = None    # The track that is playing or, once read, will be
+        self.current_volume = 1.0
+        self.next_path = None       # The track preloaded to be played next
+        self.playing_path = None    # The track that is actually playing
+        self.is_fading_out = False  # Whether the playing track is fading out to make way for the current one
+        self.is_paused = False
+
+    def load(self, path: str):
+        """Starts reading the track in the background, if it has not been read yet"""
+        if path in self.tracks:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="music-loader")
+        self.tracks[path] = self.executor.submit(read_track, path)
+        self.forget_unused_tracks()
+
+    def forget_unused_tracks(self):
+        """Drops every track that is neither playing, requested nor preloaded"""
+        for path in list(self.tracks):
+            if path not in (self.current_path, self.next_path, self.playing_path):
+                del self.tracks[path]
+
+    def preload(self, path: str):
+        """Starts reading the track in the background, as the next track to be played"""
+        self.next_path = normalise_path(path)
+        self.load(self.next_path)
+
+    def play(self, path: str, volume=1.0):
+        """Loops the track, fading over from the current one as soon as it has been read.
+        Does nothing but set the volume if the track is already playing."""
+        path = normalise_path(path)
+        self.current_volume = volume
+        if path == self.current_path:
+            if path == self.playing_path and not self.is_fading_out:
+                pg.mixer.music.set_volume(volume)
+            return
+        self.current_path = path
+        if path == self.next_path:
+            self.next_path = None
+        self.load(path)
+        self.update()
+
+    def is_switching(self) -> bool:
+        """Returns whether update() has yet to carry on with a switch to the requested track"""
+        return not self.is_paused and (self.current_path != self.playing_path or self.is_fading_out)
+
+    def update(self):
+        """Carries on with the switch to the requested track: fades out the playing track once the requested
+        one has been read, then starts the requested one once the fade is over"""
+        if not self.is_switching():
+            return
+        future = self.tracks[self.current_path]
+        if not future.done():
+            return
+        if future.exception() is not None:
+            print("[music] could not read %s: %s" % (self.current_path, future.exception()), file=sys.stderr)
+            del self.tracks[self.current_path]
+            self.current_path = self.playing_path
+            return
+
+        if pg.mixer.music.get_busy():
+            if not self.is_fading_out:
+                pg.mixer.music.fadeout(FADE_MS)
+                self.is_fading_out = True
+            return
+
+        # Loading another track closes the file of the previous one, so every track is given a new one
+        pg.mixer.music.load(io.BytesIO(future.result()))
+        pg.mixer.music.set_volume(self.current_volume)
+        pg.mixer.music.play(loops=-1, fade_ms=FADE_MS if self.playing_path else 0)
+        self.playing_path = self.current_path
+        self.is_fading_out = False
+        self.forget_unused_tracks()
+
+    def join(self):
+        """Waits for every track being read, so that reading does not compete with measurements. Tracks that
+        could not be read are reported by update()."""
+        wait(list(self.tracks.values()))
+
+    def pause(self):
+        self.is_paused = True
+        pg.mixer.music.pause()
+
+    def unpause(self):
+        self.is_paused = False
+        pg.mixer.music.unpause()
+
+
+# The sound bank and music player shared by the whole game
+sound_bank = SoundBank()
+music_player = MusicPlayer()
@@ -1,4 +1,5 @@
 import pygame as pg
+from .assets import load_image
 
 
 class SpriteSheet:
@@ -16,7 +17,7 @@ class SpriteSheet:
 
         self.rows = rows
         self.columns = columns
-        self.sprite_sheet = pg.image.load(filepath)
+        self.sprite_sheet = load_image(filepath)
 
         # Dimensions of an image in the sprite sheet
         self.width = int(self.sprite_sheet.get_width() / columns)
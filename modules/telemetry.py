@@ -0,0 +1,239 @@
+import atexit
+import json
+import os
+import time
+import pygame as pg
+from .runtime import get_font, get_user_data_path
+from .inputstate import input_state
+
+"""
+* =============================================================== *
+* This module contains the frame telemetry, which times each      *
+* phase of every frame, and the overlay that displays it.         *
+* =============================================================== *
+
+RECORDING
+-------------------------
+The game loop calls begin_frame() before handling events and end_frame() once the frame has been
+presented. In between, lap(phase) attributes the time since the previous lap to the given phase, so
+the phases of a frame always add up to its total time. Laps can be taken anywhere, such as inside
+GameScene.update(), in which case the lap taken by the game loop afterwards gets the remainder.
+
+The timings of the last FRAME_CAPACITY frames are kept in a ring buffer. When telemetry is disabled,
+every call returns straight away, so the only cost is that of the call itself.
+
+Lap listeners are called with the phase and the time of every lap, which is how the sampling profiler in
+modules/profiler.py attributes its samples to phases.
+
+Set the TOWER_TELEMETRY environment variable to record from startup. If its value ends in .csv or
+.jsonl, the ring buffer is also written to that file when the game exits.
+
+HOTKEYS
+-------------------------
+    F3                  ->          Shows or hides the overlay, starting to record if needed
+    F2                  ->          Writes the ring buffer to a CSV file in the user data directory
+
+The overlay shows a graph of the frame times, and the 50th, 95th and 99th percentile of the frame
+time and of each phase, in milliseconds.
+"""
+
+TELEMETRY_VARIABLE = "TOWER_TELEMETRY"
+TRACE_SUFFIXES = (".csv", ".jsonl")
+
+FRAME_CAPACITY = 600
+PERCENTILES = (50, 95, 99)
+
+OVERLAY_REFRESH_INTERVAL = 0.5
+GRAPH_SIZE = (200, 40)
+GRAPH_SCALE_MS = 33.3   # Frame time at the top of the graph
+FRAME_BUDGET_MS = 1000 / 60
+TEXT_COLUMNS = (4, 104, 140, 176)
+
+
+def get_percentile(sorted_values: list, percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(percentile / 100 * len(sorted_values)))]
+
+
+class FrameTelemetry:
+    """Ring buffer of the time taken by each phase of the last FRAME_CAPACITY frames"""
+
+    def __init__(self, capacity=FRAME_CAPACITY, enabled=None):
+        """Creates a FrameTelemetry.
+
+        :param capacity:    The number of frames kept.
+        :param enabled:     Overrides the TOWER_TELEMETRY environment variable if not None.
+        """
+
+        self.enabled = bool(os.environ.get(TELEMETRY_VARIABLE)) if enabled is None else enabled
+        self.capacity = capacity
+        self.phases = {}                        # Phase -> duration in each slot, in the order first seen
+        self.frame_times = [0.0] * capacity
+        self.frame_starts = [0.0] * capacity
+        self.frame_count = 0                    # Number of frames recorded so far
+        self.frame_start = 0.0
+        self.last_time = 0.0
+        self.is_in_frame = False
+        self.lap_listeners = []
+
+    def add_lap_listener(self, listener):
+        """Calls the listener with the phase and the time.perf_counter() value of every lap"""
+        self.lap_listeners.append(listener)
+
+    def remove_lap_listener(self, listener):
+        self.lap_listeners.remove(listener)
+
+    def enable(self):
+        self.enabled = True
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        # Clear the slot of the oldest frame, as this frame may not go through every phase
+        slot = self.frame_count % self.capacity
+        for durations in self.phases.values():
+            durations[slot] = 0.0
+        self.frame_start = self.last_time = time.perf_counter()
+        self.is_in_frame = True
+
+    def lap(self, phase: str):
+        """Attributes the time since the previous lap, or the start of the frame, to the phase"""
+        if not self.enabled or not self.is_in_frame:
+            return
+        now = time.perf_counter()
+        durations = self.phases.get(phase)
+        if durations is None:
+            durations = self.phases[phase] = [0.0] * self.capacity
+        durations[self.frame_count % self.capacity] += now - self.last_time
+        self.last_time = now
+        for listener in self.lap_listeners:
+            listener(phase, now)
+
+    def end_frame(self):
+        if not self.enabled or not self.is_in_frame:
+            return
+        self.is_in_frame = False
+        slot = self.frame_count % self.capacity
+        self.frame_times[slot] = self.last_time - self.frame_start
+        self.frame_starts[slot] = self.frame_start
+        self.frame_count += 1
+
+    def get_slots(self) -> list:
+        """Returns the slots of the recorded frames in the ring buffer, from the oldest to the newest"""
+        count = min(self.frame_count, self.capacity)
+        first = self.frame_count - count
+        return [i % self.capacity for i in range(first, self.frame_count)]
+
+    def get_percentiles(self) -> dict:
+        """Returns the percentiles of the frame time and of each phase, in seconds, keyed by "frame" and
+        the name of each phase"""
+        slots = self.get_slots()
+        series = {"frame": self.frame_times}
+        series.update(self.phases)
+        return {name: [get_percentile(sorted(values[slot] for slot in slots), percentile)
+                       for percentile in PERCENTILES]
+                for name, values in series.items()}
+
+    def export(self, filepath: str):
+        """Writes the recorded frames as CSV, or as JSON lines if the path ends in .jsonl.
+        All times are in milliseconds, with the start of each frame relative to the first."""
+        slots = self.get_slots()
+        if not slots:
+            return
+        first_start = self.frame_starts[slots[0]]
+        frame_number = self.frame_count - len(slots)
+        with open(filepath, "w") as f:
+            if filepath.endswith(".jsonl"):
+                for slot in slots:
+                    record = {"frame": frame_number,
+                              "start": (self.frame_starts[slot] - first_start) * 1000,
+                              "total": self.frame_times[slot] * 1000}
+                    record.update((phase, durations[slot] * 1000) for phase, durations in self.phases.items())
+                    f.write(json.dumps(record) + "\n")
+                    frame_number += 1
+            else:
+                f.write(",".join(["frame", "start", "total"] + list(self.phases)) + "\n")
+                for slot in slots:
+                    values = [self.frame_starts[slot] - first_start, self.frame_times[slot]]
+                    values += [durations[slot] for durations in self.phases.values()]
+                    f.write(",".join([str(frame_number)] + ["%.4f" % (value * 1000) for value in values]) + "\n")
+                    frame_number += 1
+
+
+class TelemetryOverlay:
+    """Draws the frame time graph and percentiles of a FrameTelemetry, and handles its hotkeys"""
+
+    def __init__(self, frame_telemetry: FrameTelemetry):
+        self.telemetry = frame_telemetry
+        self.is_visible = False
+        self.time_counter = OVERLAY_REFRESH_INTERVAL
+        self.text_lines = []
+        self.name_texts = {}        # The rendered names of the phases, which never change
+        self.panel = None
+
+        trace_path = os.environ.get(TELEMETRY_VARIABLE, "")
+        if trace_path.endswith(TRACE_SUFFIXES):
+            atexit.register(self.telemetry.export, trace_path)
+
+    def handle_hotkeys(self):
+        """Handles the hotkeys pressed during this tick, which must be done once the input state is sampled"""
+        if input_state.was_pressed(pg.K_F3):
+            self.telemetry.enable()
+            self.is_visible = not self.is_visible
+        if input_state.was_pressed(pg.K_F2) and self.telemetry.frame_count > 0:
+            self.telemetry.export(get_user_data_path(time.strftime("telemetry-%Y%m%d-%H%M%S.csv")))
+
+    def update(self, delta_time):
+        """Recomputes the percentiles every OVERLAY_REFRESH_INTERVAL seconds while the overlay is shown"""
+        if not self.is_visible:
+            return
+        self.time_counter += delta_time
+        if self.time_counter < OVERLAY_REFRESH_INTERVAL:
+            return
+        self.time_counter = 0
+
+        font = get_font()
+        self.text_lines = [[self.get_name_text(text) for text in ("ms", "p50", "p95", "p99")]]
+        for name, values in self.telemetry.get_percentiles().items():
+            self.text_lines.append([self.get_name_text(name)] +
+                                   [font.render("%.2f" % (value * 1000), (255, 255, 255))[0] for value in values])
+
+    def get_name_text(self, name: str) -> pg.Surface:
+        text = self.name_texts.get(name)
+        if text is None:
+            text = self.name_texts[name] = get_font().render(name, (255, 255, 255))[0]
+        return text
+
+    def render(self, surface: pg.Surface):
+        """Renders the overlay at the top-left corner of the window, at twice the size of the game pixels"""
+        if not self.is_visible:
+            return
+
+        line_height = 10
+        height = GRAPH_SIZE[1] + 8 + line_height * len(self.text_lines)
+        if self.panel is None or self.panel.get_height() != height:
+            self.panel = pg.Surface((GRAPH_SIZE[0] + 8, height))
+            self.panel.set_alpha(200)
+        self.panel.fill((20, 20, 20))
+
+        # Frame time graph, one column per frame, with a line at the 60 FPS budget
+        slots = self.telemetry.get_slots()[-GRAPH_SIZE[0]:]
+        graph_bottom = 4 + GRAPH_SIZE[1]
+        for x, slot in enumerate(slots):
+            frame_ms = self.telemetry.frame_times[slot] * 1000
+            bar_height = min(GRAPH_SIZE[1], int(frame_ms / GRAPH_SCALE_MS * GRAPH_SIZE[1]))
+            colour = (90, 200, 90) if frame_ms <= FRAME_BUDGET_MS else (220, 80, 60)
+            pg.draw.line(self.panel, colour, (4 + x, graph_bottom), (4 + x, graph_bottom - bar_height))
+        budget_y = graph_bottom - int(FRAME_BUDGET_MS / GRAPH_SCALE_MS * GRAPH_SIZE[1])
+        pg.draw.line(self.panel, (200, 200, 200), (4, budget_y), (4 + GRAPH_SIZE[0], budget_y))
+
+        for i, text_line in enumerate(self.text_lines):
+            for text, x in zip(text_line, TEXT_COLUMNS):
+                self.panel.blit(text, (x, graph_bottom + 4 + i * line_height))
+
+        surface.blit(pg.transform.scale(self.panel, (self.panel.get_width() * 2, height * 2)), (0, 0))
+
+
+# The telemetry shared by the whole game
+telemetry = FrameTelemetry()
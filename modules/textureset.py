@@ -1,4 +1,5 @@
 import pygame as pg
+from .assets import load_image
 
 """
 ADDING NEW TEXTURES TO THE TEXTURESET
@@ -15,6 +16,8 @@ ADDING NEW TEXTURES TO THE TEXTURESET
 
 class TerrainType:
     """Stores a texture and its corresponding hitbox dimensions"""
+    __slots__ = ("image", "block_pos_x", "block_pos_y", "block_width", "block_height", "scaled_images")
+
     def __init__(self, image: pg.Surface, block_pos_x=0, block_pos_y=0, block_width=1, block_height=1):
         # All numbers are relative to the size of a normal block
         # (i.e. must be between 0 and 1, where 1 is the size of an actual block)
@@ -23,12 +26,24 @@ class TerrainType:
         self.block_pos_y = block_pos_y
         self.block_width = block_width
         self.block_height = block_height
+        self.scaled_images = {}         # Size -> the texture scaled to it, see get_scaled_image()
+
+    def get_scaled_image(self, block_size: int) -> pg.Surface:
+        """Returns the texture scaled to its hitbox for blocks of the given size. The texture is only scaled
+        once per size, and the image is shared by every block of this type, so it must not be drawn on."""
+        scaled_image = self.scaled_images.get(block_size)
+        if scaled_image is None:
+            scaled_image = pg.transform.scale(self.image.convert_alpha(),
+                                              (int(self.block_width * block_size),
+                                               int(self.block_height * block_size)))
+            self.scaled_images[block_size] = scaled_image
+        return scaled_image
 
 
 class Tileset:
     """Utility class to load static textures from a spritesheet"""
     def __init__(self, filepath):
-        self.spritesheet = pg.image.load(filepath)
+        self.spritesheet = load_image(filepath)
 
     def get_image_at(self, rectangle, colorkey=None) -> pg.Surface:
         """Loads the image at the area specified by the given rectangle"""
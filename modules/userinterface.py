@@ -1,16 +1,12 @@
 import pygame as pg
-import pygame.freetype as ft
 
 from modules.entitystate import GameEvent
-
-ft.init()
-freetype = ft.Font("assets/fonts/pixChicago.ttf")
-freetype.antialiased = False
+from modules.runtime import get_font
 
 
 class MenuButton:
     def __init__(self, text, action, position, fontsize = 8, color = (235, 235, 235)):
-        self.text = freetype.render(text, color, None, 0, 0, fontsize)
+        self.text = get_font().render(text, color, None, 0, 0, fontsize)
         self.action = action
         self.rect = pg.Rect(position, (self.text[0].get_width(),
                                        self.text[0].get_height()))
@@ -35,7 +31,7 @@ class Menu:
         self.length = len(self.button_list)
         self.current_index = 0
 
-        self.caret = freetype.render(">>>", color, None, 0, 0, fontsize)
+        self.caret = get_font().render(">>>", color, None, 0, 0, fontsize)
         self.current_caret_position = [self.button_list[self.current_index].rect.left
                                        - self.caret[0].get_width()
                                        - self.fontsize,
@@ -61,6 +57,16 @@ class Menu:
                                        ((self.button_list[self.current_index].rect.height - self.caret[0].get_height())
                                         / 2)]
 
+    def reset(self):
+        """Moves the caret back to the first button"""
+        self.current_index = 0
+        self.current_caret_position = [self.button_list[self.current_index].rect.left
+                                       - self.caret[0].get_width()
+                                       - self.fontsize,
+                                       self.button_list[self.current_index].rect.top +
+                                       ((self.button_list[self.current_index].rect.height - self.caret[0].get_height())
+                                        / 2)]
+
     def click(self, point):
         for button in self.button_list:
             if button.collidepoint(point):
@@ -78,7 +84,7 @@ class Menu:
 
 class LevelSelectButton:
     def __init__(self, text, level_num, position, fontsize = 8, color = (235, 235, 235)):
-        self.text = freetype.render(text, color, None, 0, 0, fontsize)
+        self.text = get_font().render(text, color, None, 0, 0, fontsize)
         self.level_num = level_num
         self.rect = pg.Rect(position, (self.text[0].get_width(),
                                        self.text[0].get_height()))
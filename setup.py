@@ -1,18 +1,36 @@
+import sys
 from cx_Freeze import setup, Executable
+from dev_modules.archivebuilder import build_archive
+from modules.assets import DEFAULT_ARCHIVE_PATH
 
 options = {
     "build_exe": {
         "includes": ["modules.__init__",
+                     "modules.assets",
                      "modules.background",
                      "modules.block",
                      "modules.camera",
                      "modules.components",
+                     "modules.counters",
+                     "modules.ecs",
                      "modules.entities",
                      "modules.entitystate",
                      "modules.gamescene",
+                     "modules.gcpolicy",
                      "modules.headsupdisplay",
+                     "modules.inputstate",
+                     "modules.leaderboard",
                      "modules.leveljson",
+                     "modules.memorydiagnostics",
+                     "modules.pools",
+                     "modules.profiler",
+                     "modules.quality",
+                     "modules.rewind",
+                     "modules.runtime",
+                     "modules.snapshot",
+                     "modules.sound",
                      "modules.spritesheet",
+                     "modules.telemetry",
                      "modules.textureset",
                      "dev_modules.__init__",
                      "dev_modules.editorcamera",
@@ -22,11 +40,23 @@ options = {
                      "dev_modules.events"
                      ],
 
-        "include_files": ["assets/",
-                          "Level Editor Instructions.md"]
+        # The game reads its assets from the archive, which is built below. Only the files that the level
+        # editor opens directly, or edits, are also shipped as loose files.
+        "include_files": [DEFAULT_ARCHIVE_PATH,
+                          ("assets/fonts", "assets/fonts"),
+                          ("assets/levels", "assets/levels"),
+                          ("assets/textures", "assets/textures"),
+                          "Level Editor Instructions.md"],
+
+        # Compiles out the debug counters in modules/counters.py
+        "optimize": 1
     }
 }
 
+# Packs the assets before they are copied, so that the build never ships a stale archive
+if "build" in sys.argv or "build_exe" in sys.argv or any(command.startswith("bdist") for command in sys.argv):
+    build_archive("assets", DEFAULT_ARCHIVE_PATH)
+
 executables = [Executable("main.py", targetName = "The Tower"),
                Executable("level_editor.py", targetName = "The Tower - Level Editor")
                ]